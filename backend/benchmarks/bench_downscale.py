@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: full decode + LANCZOS thumbnail vs. JPEG draft() decode + LANCZOS.
+
+Each (method, target size) pair runs in a fresh interpreter so peak RSS is measured
+in isolation, as growth over the interpreter's own footprint. Pass phone photos to
+benchmark real uploads; without arguments a synthetic 12 MP (4032x3024) q90 JPEG
+with a portrait EXIF orientation is generated.
+
+    cd backend
+    python benchmarks/bench_downscale.py [photo.jpg ...] [--iterations 10]
+"""
+
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from PIL import Image, ImageOps  # noqa: E402
+
+from utils.image_resize import downscale  # noqa: E402
+
+_TARGETS = [(1024, 1024), (768, 768), (256, 256)]
+
+
+def _full_decode(data: bytes, max_size) -> Image.Image:
+    """The previous code path: decode everything, transpose, then thumbnail."""
+    img = ImageOps.exif_transpose(Image.open(io.BytesIO(data)))
+    img.load()
+    img = img.copy()
+    img.thumbnail(max_size, Image.Resampling.LANCZOS)
+    return img
+
+
+def _draft_decode(data: bytes, max_size) -> Image.Image:
+    return downscale(Image.open(io.BytesIO(data)), max_size)
+
+
+_METHODS = {"full": _full_decode, "draft": _draft_decode}
+
+
+def _synthetic_photo(path: str) -> None:
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:3024, 0:4032]
+    pixels = np.stack([(x / 16) % 255, (y / 12) % 255, ((x + y) / 20) % 255], axis=-1)
+    pixels = (pixels * 0.8 + rng.random(pixels.shape) * 50).astype("uint8")
+    exif = Image.Exif()
+    exif[0x0112] = 6    # portrait phone shot: stored landscape, rotated on display
+    Image.fromarray(pixels).save(path, format="JPEG", quality=90, exif=exif.tobytes())
+
+
+def _worker(path: str, method: str, width: int, height: int, iterations: int) -> None:
+    with open(path, "rb") as f:
+        data = f.read()
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    fn = _METHODS[method]
+    fn(data, (width, height))   # warm-up
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    for _ in range(iterations):
+        size = fn(data, (width, height)).size
+    cpu_ms = (time.process_time() - cpu0) * 1000 / iterations
+    wall_ms = (time.perf_counter() - wall0) * 1000 / iterations
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({
+        "cpu_ms": cpu_ms,
+        "wall_ms": wall_ms,
+        "peak_rss_delta_mb": (peak_kb - baseline_kb) / 1024,
+        "size": size,
+    }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="*", help="JPEG files (default: synthetic 12 MP photo)")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--worker", nargs=4, metavar=("PATH", "METHOD", "W", "H"), help=argparse.SUPPRESS)
+    parser.add_argument("--synthetic", metavar="PATH", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        _synthetic_photo(args.synthetic)
+        return
+    if args.worker:
+        path, method, width, height = args.worker
+        _worker(path, method, int(width), int(height), args.iterations)
+        return
+
+    images = args.images
+    tmp = None
+    if not images:
+        tmp = tempfile.NamedTemporaryFile(suffix=".jpg", delete=False)
+        tmp.close()
+        # In a child process: ru_maxrss survives fork/exec, so the parent must stay small
+        subprocess.run([sys.executable, __file__, "--synthetic", tmp.name], check=True)
+        images = [tmp.name]
+
+    try:
+        print(f"{'image':<28} {'target':>9} {'method':>6} {'cpu ms':>8} {'wall ms':>8} {'peak RSS MB':>12} {'out':>10}")
+        for path in images:
+            with Image.open(path) as img:
+                label = f"{os.path.basename(path)[:16]} {img.size[0]}x{img.size[1]}"
+            for width, height in _TARGETS:
+                for method in _METHODS:
+                    out = subprocess.run(
+                        [sys.executable, __file__, "--worker", path, method, str(width), str(height),
+                         "--iterations", str(args.iterations)],
+                        check=True, capture_output=True, text=True,
+                    ).stdout
+                    r = json.loads(out)
+                    print(
+                        f"{label:<28} {width:>9} {method:>6} {r['cpu_ms']:>8.1f} {r['wall_ms']:>8.1f} "
+                        f"{r['peak_rss_delta_mb']:>12.1f} {'x'.join(map(str, r['size'])):>10}"
+                    )
+    finally:
+        if tmp is not None:
+            os.unlink(tmp.name)
+
+
+if __name__ == "__main__":
+    main()
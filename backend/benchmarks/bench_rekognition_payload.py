@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: Rekognition payload preparation, previous quality loop vs. one
+downscaled encode (utils.image_ops.rekognition_payload).
+
+The previous path sent uploads up to 5 MB unchanged and re-encoded larger ones at full
+resolution at quality 85, 70, 55, 40, then halved the resolution. The upright (EXIF
+rotated, metadata stripped) bytes both paths start from are computed once up front, as
+PreparedImage.prepare() does in the service, and not timed. Reported per image:
+CPU time, number of JPEG encodes and payload size. Pass phone photos to benchmark real
+uploads; without arguments synthetic photo-like JPEGs at common phone sensor sizes
+(8, 12, 48 and 50 MP) are generated.
+
+    cd backend
+    python benchmarks/bench_rekognition_payload.py [photo.jpg ...] [--iterations 5]
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from PIL import Image, ImageOps  # noqa: E402
+
+from utils.image_ops import rekognition_payload, upright  # noqa: E402
+
+_MAX_BYTES = 5 * 1024 * 1024
+_MAX_SIDE = 1920
+_SENSOR_SIZES = [(3264, 2448), (4032, 3024), (8000, 6000), (8160, 6120)]
+
+
+def _quality_loop(data: bytes, normalized: bytes):
+    """The previous code path; returns (payload, JPEG encodes)."""
+    if len(normalized) <= _MAX_BYTES:
+        return normalized, 0
+    img = ImageOps.exif_transpose(Image.open(io.BytesIO(data))).convert("RGB")
+    encodes = 0
+    for quality in (85, 70, 55, 40):
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=quality)
+        encodes += 1
+        if buf.tell() <= _MAX_BYTES:
+            return buf.getvalue(), encodes
+    img.thumbnail((img.size[0] // 2, img.size[1] // 2), Image.Resampling.LANCZOS)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=70)
+    return buf.getvalue(), encodes + 1
+
+
+def _single_encode(data: bytes, normalized: bytes):
+    with Image.open(io.BytesIO(data)) as header:
+        if max(header.size) <= _MAX_SIDE and len(normalized) <= _MAX_BYTES:
+            return normalized, 0
+    return rekognition_payload(data, _MAX_SIDE, _MAX_BYTES), 1
+
+
+_METHODS = {"loop": _quality_loop, "single": _single_encode}
+
+
+def _synthetic_photo(width: int, height: int) -> bytes:
+    """Smooth gradients plus sensor-like noise, q95 — phone-sized files (~0.4-0.6 bytes/px)."""
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    pixels = np.stack([(x / 16) % 255, (y / 12) % 255, ((x + y) / 20) % 255], axis=-1)
+    pixels = (pixels * 0.85 + rng.normal(0, 6, pixels.shape) + 20).clip(0, 255).astype("uint8")
+    exif = Image.Exif()
+    exif[0x0112] = 6    # portrait phone shot: stored landscape, rotated on display
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, format="JPEG", quality=95, exif=exif.tobytes())
+    return buf.getvalue()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="*", help="JPEG/PNG files (default: synthetic phone photos)")
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.images:
+        inputs = []
+        for path in args.images:
+            with open(path, "rb") as f:
+                inputs.append((os.path.basename(path)[:16], f.read()))
+    else:
+        inputs = [(f"synthetic {w * h / 1e6:.0f}MP", _synthetic_photo(w, h)) for w, h in _SENSOR_SIZES]
+
+    print(f"{'image':<20} {'in MB':>6} {'method':>7} {'cpu ms':>8} {'encodes':>8} {'payload MB':>11} {'payload px':>11}")
+    for label, data in inputs:
+        normalized = upright(data)
+        for method, fn in _METHODS.items():
+            fn(data, normalized)   # warm-up
+            cpu0 = time.process_time()
+            for _ in range(args.iterations):
+                payload, encodes = fn(data, normalized)
+            cpu_ms = (time.process_time() - cpu0) * 1000 / args.iterations
+            with Image.open(io.BytesIO(payload)) as out:
+                size = "x".join(map(str, out.size))
+            print(
+                f"{label:<20} {len(data) / 2**20:>6.1f} {method:>7} {cpu_ms:>8.1f} {encodes:>8} "
+                f"{len(payload) / 2**20:>11.2f} {size:>11}"
+            )
+
+
+if __name__ == "__main__":
+    main()
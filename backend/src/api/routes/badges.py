@@ -3,13 +3,13 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Optional
-import boto3
 import jwt
 import os
 
 from models.badge import Badge
 from models.user import User
 from models.user_badge import UserBadge
+from utils.aws_clients import get_aws_clients
 from utils.database import get_db
 
 router = APIRouter()
@@ -20,8 +20,6 @@ ALGORITHM = "HS256"
 BUCKET = os.getenv("AWS_BUCKET_NAME", "carid-images")
 REGION = os.getenv("AWS_REGION", "us-west-2")
 
-s3_client = boto3.client("s3", region_name=REGION)
-
 PRESIGN_EXPIRY = 60 * 60 * 24 * 7  # 7 days
 
 
@@ -76,7 +74,7 @@ async def get_my_badges(
         image_url = None
         if badge.s3_key:
             try:
-                image_url = s3_client.generate_presigned_url(
+                image_url = get_aws_clients().client("s3", region=REGION).generate_presigned_url(
                     "get_object",
                     Params={"Bucket": BUCKET, "Key": badge.s3_key},
                     ExpiresIn=PRESIGN_EXPIRY,
@@ -1,42 +1,54 @@
 from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Form, Request
 from fastapi.responses import StreamingResponse, JSONResponse
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Callable, List, Optional
 import asyncio
-import io
+import copy
+import dataclasses
 import json
 import logging
 import os
 import re as _re
 import time
-import boto3
-from PIL import Image as _PIL_Image, ImageOps as _PIL_ImageOps
+import uuid
 from datetime import datetime, timezone
 
 logger = logging.getLogger("carid.car_id")
 
 from models.badge import Badge
-from models.car import CarIdentification
+from models.car import IMAGE_BLUR_PENDING, IMAGE_UNAVAILABLE, CarIdentification
 from models.user import User
 from models.user_camera_stats import UserCameraStats
 from services.storage_service import CarStorageService
 from services.badge_service import check_and_award_badges
 from services.license_plate_service import LicensePlateBlurService
-from utils.database import get_db
+from services.identification_cache import get_identification_cache
+from services.near_duplicate_index import get_near_duplicate_index
+from services.blur_retry_queue import get_blur_retry_queue
+from services.usage_accounting import pipeline_usage, record_stage_usage
+from utils.database import SessionLocal, get_db
 from utils.rate_limit import limiter
-from utils.image_redaction import blur_license_plates
+from utils.prepared_image import PreparedImage
+from utils.perceptual_hash import to_hex
+from utils import metrics
+from utils.circuit_breaker import CircuitOpenError
+from utils.single_flight import SingleFlight
+from utils.upload_intake import read_image_upload
+from utils.usage_tracker import StageUsage, track_usage
 from api.routes.users import get_current_user_optional
 from dotenv import load_dotenv
-from image_identification import AnthropicCarIdentifier, CarIdentificationResult
+from image_identification import AnthropicCarIdentifier, CarIdentificationResult, IdentifierBackend
+from local_identification import LocalCarIdentifier
 
 load_dotenv()
 
 router = APIRouter()
 
 # S3 / Anthropic config
-s3_client = boto3.client('s3', region_name=os.getenv('AWS_REGION', 'us-west-2'))
 aws_bucket_name = os.getenv("AWS_BUCKET_NAME")
 _anthropic_key = os.getenv("ANTHROPIC_API_KEY")
+# "anthropic" (default) or "local" — a deterministic offline stand-in for load tests
+_identifier_backend = os.getenv("IDENTIFIER_BACKEND", "anthropic").lower()
 
 _PLATE_KEYWORDS = ('license', 'licence', 'plate number', 'registration', 'number plate')
 _PLATE_CANDIDATE_RE = _re.compile(r'[A-Z0-9]{2,6}(?:[\ \-][A-Z0-9]{1,6})+|[A-Z0-9]{4,10}', _re.IGNORECASE)
@@ -54,25 +66,573 @@ def _extract_plate_texts_from_features(features) -> list:
     return texts
 
 
-def _normalize_exif(image_data: bytes) -> bytes:
-    """Physically rotate image pixels to match EXIF orientation tag, then strip the tag.
-    Returns original bytes unchanged on any error."""
+def _result_from_near_duplicate(record: Optional[CarIdentification], fields: list) -> Optional[tuple]:
+    """
+    Rebuild (make_result, result) from a stored near-duplicate identification,
+    or None when it does not cover every requested field.
+    """
+    if record is None or not record.is_car:
+        return None
+    data = record.identification_data or {}
+    if not all(data.get(f) is not None for f in (fields or ['make', 'model'])):
+        return None
+    result = CarIdentificationResult(**{
+        f.name: data.get(f.name) for f in dataclasses.fields(CarIdentificationResult)
+    })
+    result.make_source = "near_duplicate"
+    metrics.increment("near_duplicate.reused")
+    return {"make": result.make, "confidence": result.confidence}, result
+
+
+# Stage layout for uncached identifications:
+#   sequential  — find_make, then identify_car with the make hint (two round trips)
+#   speculative — find_make and an unhinted identify_car in parallel; re-run with the
+#                 hint only when a high-confidence badge disagrees with the inferred make
+#   single_pass — identify_car alone, no badge detection
+PIPELINE_MODES = ("sequential", "speculative", "single_pass")
+_pipeline_mode = os.getenv("IDENTIFY_PIPELINE_MODE", "sequential").lower()
+if _pipeline_mode not in PIPELINE_MODES:
+    logger.warning("Unknown IDENTIFY_PIPELINE_MODE %r — falling back to sequential", _pipeline_mode)
+    _pipeline_mode = "sequential"
+
+
+def _makes_disagree(make_result: dict, result: CarIdentificationResult) -> bool:
+    """True when find_make saw a badge with high confidence that contradicts identify_car's make."""
+    badge_make = (make_result.get("make") or "").strip().lower()
+    inferred_make = (result.make or "").strip().lower()
+    if not badge_make or make_result.get("confidence") != "high" or not result.is_car:
+        return False
+    return inferred_make in ("", "unknown") or (badge_make not in inferred_make and inferred_make not in badge_make)
+
+
+# Progress callback: emit(event, payload) is called as each pipeline stage completes.
+# Used by /identify/stream to push events to the client; None everywhere else.
+StageEmitter = Callable[[str, dict], None]
+
+
+def _emit_make(emit: Optional[StageEmitter], make_result: dict, source: str) -> None:
+    if emit is not None:
+        emit("make_detected", {
+            "make": make_result.get("make"),
+            "confidence": make_result.get("confidence"),
+            "source": source,
+        })
+
+
+def _emit_identified(emit: Optional[StageEmitter], result: CarIdentificationResult, fields: list) -> None:
+    if emit is not None:
+        emit("identified", _identified_fields(result, fields))
+
+
+async def _run_identification_stages(
+    identifier: IdentifierBackend,
+    blur_service: LicensePlateBlurService,
+    prepared: PreparedImage,
+    fields: list,
+    mode: str,
+    prefill: Optional[dict] = None,
+    log_extra: Optional[dict] = None,
+    emit: Optional[StageEmitter] = None,
+) -> tuple:
+    """
+    Run the Claude stages (and plate blurring alongside them) in the given pipeline mode.
+    prefill is a known make_result (e.g. from a near-duplicate upload) that replaces find_make.
+
+    Returns (make_result, result, blur_result, pipeline) where pipeline records the
+    mode, the path actually taken and how many Claude calls it cost.
+    """
+    log_extra = log_extra or {}
+    blur_task = blur_service.blur_license_plates(prepared, prepared.content_type)
+
+    async def _find_make() -> dict:
+        make_result = await identifier.find_make(prepared)
+        _emit_make(emit, make_result, "find_make")
+        return make_result
+
+    if prefill is not None:
+        make_result = prefill
+        _emit_make(emit, make_result, "near_duplicate")
+        path, claude_calls = "near_duplicate_prefill", 1
+    elif mode == "single_pass":
+        make_result = {"make": None, "confidence": None}
+        path, claude_calls = "single_pass", 1
+    elif mode == "speculative":
+        t0 = time.perf_counter()
+        make_result, result, blur_result = await asyncio.gather(
+            _find_make(),
+            identifier.identify_car(prepared, fields),
+            blur_task,
+        )
+        path, claude_calls = "speculative_accepted", 2
+        if _makes_disagree(make_result, result):
+            result = await identifier.identify_car(
+                prepared, fields, make_result.get("make"), make_result.get("confidence")
+            )
+            path, claude_calls = "speculative_rerun", 3
+        _emit_identified(emit, result, fields)
+        logger.info(
+            "anthropic_identify_car",
+            extra={
+                **log_extra,
+                "make_hint": make_result.get("make"),
+                "make_confidence": make_result.get("confidence"),
+                "is_car": result.is_car,
+                "make": result.make,
+                "model": result.model,
+                "confidence": result.confidence,
+                "plates_detected": blur_result.plates_detected,
+                "pipeline_path": path,
+                "duration_ms": round((time.perf_counter() - t0) * 1000, 1),
+            },
+        )
+        return make_result, result, blur_result, {"mode": mode, "path": path, "claude_calls": claude_calls}
+    else:
+        # Stage 1: detect car make from badge / logo (fast model)
+        t0 = time.perf_counter()
+        make_result = await _find_make()
+        logger.info(
+            "anthropic_find_make",
+            extra={
+                **log_extra,
+                "make_hint": make_result.get("make"),
+                "make_confidence": make_result.get("confidence"),
+                "duration_ms": round((time.perf_counter() - t0) * 1000, 1),
+            },
+        )
+        path, claude_calls = "sequential", 2
+
+    async def _identify() -> CarIdentificationResult:
+        result = await identifier.identify_car(
+            prepared, fields, make_result.get("make"), make_result.get("confidence")
+        )
+        if mode == "single_pass" and prefill is None:
+            # No badge stage ran: the make comes from the identification itself
+            _emit_make(emit, {"make": result.make, "confidence": result.confidence}, "identify_car")
+        _emit_identified(emit, result, fields)
+        return result
+
+    # Stage 2 + 3 in parallel: identify car (model cascade, with make hint) & blur license plates
+    t1 = time.perf_counter()
+    result, blur_result = await asyncio.gather(_identify(), blur_task)
+    logger.info(
+        "anthropic_identify_car",
+        extra={
+            **log_extra,
+            "is_car": result.is_car,
+            "make": result.make,
+            "model": result.model,
+            "confidence": result.confidence,
+            "plates_detected": blur_result.plates_detected,
+            "pipeline_path": path,
+            "duration_ms": round((time.perf_counter() - t1) * 1000, 1),
+        },
+    )
+    return make_result, result, blur_result, {"mode": mode, "path": path, "claude_calls": claude_calls}
+
+
+# One identifier per worker process so every request shares its connection pool and concurrency cap
+_car_identifier: Optional[IdentifierBackend] = None
+
+
+def get_car_identifier() -> IdentifierBackend:
+    """
+    Dependency: returns the app-wide identifier — AnthropicCarIdentifier (fast → full model
+    cascade), or LocalCarIdentifier when IDENTIFIER_BACKEND=local.
+    """
+    global _car_identifier
+    if _car_identifier is None:
+        if _identifier_backend == "local":
+            logger.warning("IDENTIFIER_BACKEND=local — identifications are synthetic")
+            _car_identifier = LocalCarIdentifier()
+        else:
+            if not _anthropic_key:
+                raise HTTPException(status_code=500, detail="Anthropic API key not configured")
+            _car_identifier = AnthropicCarIdentifier(api_key=_anthropic_key)
+    return _car_identifier
+
+
+async def close_car_identifier() -> None:
+    """Close the shared identifier's HTTP client. Called on app shutdown."""
+    global _car_identifier
+    if _car_identifier is not None:
+        await _car_identifier.close()
+        _car_identifier = None
+
+
+_ALLOWED_TYPES = ['image/jpeg', 'image/jpg', 'image/png']
+BATCH_MAX_IMAGES = int(os.getenv("IDENTIFY_BATCH_MAX_IMAGES", 20))
+_BATCH_CONCURRENCY = int(os.getenv("IDENTIFY_BATCH_CONCURRENCY", 4))
+
+
+def _parse_requested_fields(requested_fields) -> list:
+    """Accepts a JSON array, a comma-separated string, or (form default) a list."""
+    if not requested_fields:
+        return []
+    if isinstance(requested_fields, list):
+        return [str(f).strip() for f in requested_fields if str(f).strip()]
     try:
-        pil = _PIL_Image.open(io.BytesIO(image_data))
-        orig_format = pil.format or 'JPEG'
-        pil = _PIL_ImageOps.exif_transpose(pil)
-        buf = io.BytesIO()
-        pil.save(buf, format=orig_format)
-        return buf.getvalue()
-    except Exception:
-        return image_data
+        parsed = json.loads(requested_fields)
+        if isinstance(parsed, list):
+            return [str(f).strip() for f in parsed if str(f).strip()]
+    except (json.JSONDecodeError, TypeError):
+        pass
+    return [f.strip() for f in requested_fields.split(',') if f.strip()]
+
+
+def _get_camera_stats(db: Session, user: User) -> UserCameraStats:
+    """Return the user's weekly usage row, creating it on first identification."""
+    stats = db.query(UserCameraStats).filter(UserCameraStats.user_id == user.id).first()
+    if stats is None:
+        stats = UserCameraStats(user_id=user.id, weekly_count=0, week_start=datetime.now(timezone.utc))
+        db.add(stats)
+        db.commit()
+        db.refresh(stats)
+    return stats
 
 
-def get_car_identifier() -> AnthropicCarIdentifier:
-    """Dependency: returns a configured AnthropicCarIdentifier (Sonnet for identification)."""
-    if not _anthropic_key:
-        raise HTTPException(status_code=500, detail="Anthropic API key not configured")
-    return AnthropicCarIdentifier(api_key=_anthropic_key)
+def _new_s3_key(filename: Optional[str]) -> str:
+    ext = (filename or "car.jpg").split('.')[-1].lower()
+    return f"car-images/{datetime.utcnow().strftime('%Y/%m/%d')}/{uuid.uuid4()}.{ext}"
+
+
+@dataclasses.dataclass
+class _IdentifyOutcome:
+    prepared: PreparedImage
+    make_result: dict
+    result: CarIdentificationResult
+    final_image_data: bytes
+    pipeline: dict
+    cached: bool = False
+    near_duplicate_of: Optional[int] = None
+    # Rekognition was unavailable: final_image_data is NOT redacted and must not be uploaded
+    blur_deferred: bool = False
+    plates_detected: int = 0
+    # External calls made for this request, then one "pipeline" row with its wall time and total cost
+    usage: List[StageUsage] = dataclasses.field(default_factory=list)
+
+
+# Concurrent identical uploads (client double-submits) share one pipeline run,
+# keyed like the identification cache: content hash + requested fields + model/prompt version
+_identify_flights: SingleFlight = SingleFlight("identify")
+
+
+async def _identify_prepared(
+    prepared: PreparedImage,
+    fields: list,
+    identifier: IdentifierBackend,
+    blur_service: LicensePlateBlurService,
+    db: Session,
+    user: User,
+    log_extra: dict,
+    emit: Optional[StageEmitter] = None,
+) -> _IdentifyOutcome:
+    """
+    Identify one prepared image: cache → near-duplicate → Claude stages, with plate blurring
+    alongside. Shared by the single-image, batch and streaming endpoints. Nothing is stored here.
+
+    A request arriving while an identical one is in flight awaits that pipeline instead of
+    starting its own, then replays its stage events; it is charged no external calls.
+    """
+    t0 = time.perf_counter()
+    # Upright bytes and both hashes, computed in the image process pool
+    await prepared.prepare()
+    cache_key = get_identification_cache().key_for(prepared, fields, identifier.cache_version)
+    outcome, shared = await _identify_flights.do(
+        cache_key,
+        lambda: _tracked(_run_identify_pipeline(
+            prepared, fields, identifier, blur_service, db, user, log_extra, emit, cache_key,
+        )),
+    )
+    duration_ms = (time.perf_counter() - t0) * 1000
+    if not shared:
+        outcome.usage.append(pipeline_usage(outcome.usage, duration_ms))
+        return outcome
+
+    logger.info("identify_coalesced", extra={**log_extra, "path": outcome.pipeline.get("path")})
+    outcome = dataclasses.replace(
+        outcome,
+        prepared=prepared,
+        make_result=dict(outcome.make_result),
+        result=copy.deepcopy(outcome.result),
+        pipeline={**outcome.pipeline, "coalesced": True},
+        # The match was looked up for the first requester, who may be another user
+        near_duplicate_of=None,
+        usage=[pipeline_usage([], duration_ms)],
+    )
+    _emit_make(emit, outcome.make_result, "coalesced")
+    _emit_identified(emit, outcome.result, fields)
+    if emit is not None:
+        emit("plates_blurred", {"plates_detected": outcome.plates_detected, "deferred": outcome.blur_deferred})
+    return outcome
+
+
+async def _tracked(pipeline) -> _IdentifyOutcome:
+    """Await the pipeline coroutine with a usage tracker open; its stages land on outcome.usage."""
+    with track_usage() as tracker:
+        outcome = await pipeline
+    outcome.usage = list(tracker.stages)
+    return outcome
+
+
+async def _run_identify_pipeline(
+    prepared: PreparedImage,
+    fields: list,
+    identifier: IdentifierBackend,
+    blur_service: LicensePlateBlurService,
+    db: Session,
+    user: User,
+    log_extra: dict,
+    emit: Optional[StageEmitter],
+    cache_key: str,
+) -> _IdentifyOutcome:
+    # Repeat uploads of the same image (retries, gallery re-uploads) skip both Claude calls
+    id_cache = get_identification_cache()
+    cached = id_cache.get(db, cache_key)
+
+    # Same car shot again a moment later, or recompressed by the phone: reuse the earlier
+    # upload's identification when it covers the requested fields, else pre-fill its make
+    near_duplicate = None
+    reused = None
+    if cached is None:
+        near_duplicate = get_near_duplicate_index().find(db, prepared.perceptual_hash, user.id)
+        reused = _result_from_near_duplicate(near_duplicate, fields)
+
+    t_pipeline = time.perf_counter()
+    if cached is not None or reused is not None:
+        make_result, result = cached or reused
+        _emit_make(emit, make_result, "cache" if cached is not None else "near_duplicate")
+        _emit_identified(emit, result, fields)
+        blur_result = await blur_service.blur_license_plates(prepared, prepared.content_type)
+        pipeline = {
+            "mode": _pipeline_mode,
+            "path": "cache" if cached is not None else "near_duplicate",
+            "claude_calls": 0,
+        }
+        logger.info(
+            "identification_reused",
+            extra={
+                **log_extra,
+                "source": pipeline["path"],
+                "near_duplicate_of": near_duplicate.id if near_duplicate is not None else None,
+                "make": result.make,
+                "model": result.model,
+                "plates_detected": blur_result.plates_detected,
+            },
+        )
+    else:
+        prefill = None
+        if near_duplicate is not None and near_duplicate.make:
+            # Pre-fill: the earlier upload's make replaces badge detection
+            prefill = {"make": near_duplicate.make, "confidence": "high"}
+            metrics.increment("near_duplicate.prefilled")
+        make_result, result, blur_result, pipeline = await _run_identification_stages(
+            identifier, blur_service, prepared, fields, _pipeline_mode, prefill,
+            log_extra=log_extra, emit=emit,
+        )
+        id_cache.put(db, cache_key, identifier.cache_version, make_result, result)
+
+    # Per-mode latency and per-path counts let p50/p95 and cost be compared across modes
+    pipeline["duration_ms"] = round((time.perf_counter() - t_pipeline) * 1000, 1)
+    metrics.increment(f"identify_pipeline.path.{pipeline['path']}")
+    metrics.observe(f"identify_pipeline.{pipeline['mode']}", pipeline["duration_ms"])
+    logger.info("identify_pipeline", extra={**log_extra, **pipeline})
+
+    # If Rekognition missed the plate but Claude found it in features, do a targeted re-blur
+    final_image_data = blur_result.image_data
+    plates_detected = blur_result.plates_detected
+    blur_deferred = blur_result.detection_method == "deferred"
+    if blur_deferred:
+        pipeline["blur_deferred"] = True
+    elif result.is_car and blur_result.plates_detected == 0:
+        plate_texts = _extract_plate_texts_from_features(getattr(result, 'features', None))
+        if plate_texts:
+            retry = await blur_service.blur_with_known_text(prepared, plate_texts)
+            if retry.plates_detected > 0:
+                final_image_data = retry.image_data
+                plates_detected = retry.plates_detected
+    if emit is not None:
+        emit("plates_blurred", {"plates_detected": plates_detected, "deferred": blur_deferred})
+
+    return _IdentifyOutcome(
+        prepared=prepared,
+        make_result=make_result,
+        result=result,
+        final_image_data=final_image_data,
+        pipeline=pipeline,
+        cached=cached is not None,
+        near_duplicate_of=near_duplicate.id if reused is not None else None,
+        blur_deferred=blur_deferred,
+        plates_detected=plates_detected,
+    )
+
+
+def _identified_fields(result: CarIdentificationResult, fields: list) -> dict:
+    """Response keys describing the identification itself (no third-party statistics)."""
+    if not result.is_car:
+        response_data = {
+            "is_car": False,
+            "message": "No car detected in the image",
+            "confidence": result.confidence,
+        }
+        if result.description:
+            response_data["description"] = result.description
+        return response_data
+
+    car_data: dict = {}
+    for field_name in ['make', 'model', 'description', 'year', 'length',
+                        'car_type', 'body_type', 'features', 'car_rarity']:
+        value = getattr(result, field_name)
+        if value is not None and (not fields or field_name in fields):
+            car_data[field_name] = value
+    if result.make_source:
+        car_data["make_source"] = result.make_source
+    return {"is_car": True, "car_details": car_data, "confidence": result.confidence}
+
+
+def _statistics_key(result: CarIdentificationResult) -> Optional[tuple]:
+    """Make/model pair statistics are looked up by (case-insensitive, like car_details), or None."""
+    if not (result.is_car and result.make and result.model):
+        return None
+    return result.make.lower(), result.model.lower()
+
+
+def _fetch_car_statistics(make: str, model: str) -> Optional[dict]:
+    """
+    Third-party statistics for make/model, or None. Blocking (car_details lookup, then
+    an API-Ninjas call on a miss) and uses its own session: run it via asyncio.to_thread.
+    """
+    db = SessionLocal()
+    try:
+        stats_service = CarStorageService(
+            db_session=db,
+            s3_bucket=aws_bucket_name or "carid-images",
+        )
+        return stats_service.get_or_fetch_car_details(make, model)
+    except Exception as _stats_exc:
+        logger.warning("Car statistics fetch failed: %s", _stats_exc)
+        return None
+    finally:
+        db.close()
+
+
+async def _car_statistics(results: List[CarIdentificationResult]) -> dict:
+    """
+    Statistics for the identified cars in results, keyed by _statistics_key. Each distinct
+    make/model is fetched once, off the event loop, IDENTIFY_BATCH_CONCURRENCY at a time.
+    """
+    pairs: dict = {}
+    for result in results:
+        key = _statistics_key(result)
+        if key is not None:
+            pairs.setdefault(key, (result.make, result.model))
+    semaphore = asyncio.Semaphore(_BATCH_CONCURRENCY)
+
+    async def _fetch(make: str, model: str) -> Optional[dict]:
+        async with semaphore:
+            return await asyncio.to_thread(_fetch_car_statistics, make, model)
+
+    fetched = await asyncio.gather(*(_fetch(make, model) for make, model in pairs.values()))
+    return dict(zip(pairs, fetched))
+
+
+def _result_response_fields(result: CarIdentificationResult, fields: list, statistics: dict) -> dict:
+    """Response keys that depend on the identification result (car details, statistics)."""
+    response_data = _identified_fields(result, fields)
+    if result.is_car:
+        response_data["car_statistics"] = statistics.get(_statistics_key(result))
+    return response_data
+
+
+def _image_status(outcome: _IdentifyOutcome) -> Optional[str]:
+    """image_status to insert the row with: images whose blurring was deferred wait for it."""
+    return IMAGE_BLUR_PENDING if outcome.blur_deferred else None
+
+
+def _image_uploads(db: Session, entries: list) -> list:
+    """
+    S3 upload kwargs for (outcome, identification_id, s3_key, filename) entries. Images
+    whose blurring was deferred (Rekognition circuit open) go to the blur retry queue
+    instead of S3; one the queue cannot take is not stored at all (IMAGE_UNAVAILABLE).
+    """
+    uploads = []
+    for outcome, identification_id, s3_key, filename in entries:
+        if outcome.blur_deferred:
+            queued = get_blur_retry_queue().enqueue(
+                db, identification_id, outcome.prepared.original, outcome.prepared.content_type,
+            )
+            if not queued:
+                CarStorageService(
+                    db_session=db,
+                    s3_bucket=aws_bucket_name or "carid-images",
+                ).update_identification_record(identification_id, image_status=IMAGE_UNAVAILABLE)
+            continue
+        uploads.append({
+            "s3_key": s3_key,
+            "image_data": outcome.final_image_data,
+            "image_filename": filename or "car_image.jpg",
+            "result": outcome.result,
+            "identification_id": identification_id,
+        })
+    return uploads
+
+
+def _upload_and_award_badges(db: Session, uploads: list, user: User) -> None:
+    """Background work after identification: S3 uploads, then one badge check."""
+    storage = CarStorageService(
+        db_session=db,
+        s3_bucket=aws_bucket_name or "carid-images",
+    )
+    for upload in uploads:
+        storage.upload_image_to_s3(**upload)
+    try:
+        awarded_ids = check_and_award_badges(db, user.id)
+        if awarded_ids:
+            logger.info("badges_awarded: user=%s badges=%s", user.id, awarded_ids)
+    except Exception as _badge_exc:
+        logger.warning("Badge award failed in background: %s", _badge_exc)
+
+
+def _store_outcome(
+    request: Request,
+    db: Session,
+    background_tasks: BackgroundTasks,
+    outcome: _IdentifyOutcome,
+    filename: Optional[str],
+    user: User,
+    latitude: Optional[float],
+    longitude: Optional[float],
+) -> tuple:
+    """
+    Insert the identification row now and queue its S3 upload + badge check for after the
+    response. Returns (identification_id, image_url); both None when there is no car to store.
+    """
+    if not outcome.result.is_car:
+        return None, None
+
+    s3_key = _new_s3_key(filename)
+    storage_service = CarStorageService(
+        db_session=db,
+        s3_bucket=aws_bucket_name or "carid-images",
+    )
+    identification_id = storage_service.insert_identification_record(
+        s3_key=s3_key,
+        image_filename=filename or "car_image.jpg",
+        result=outcome.result,
+        user_id=user.id,
+        latitude=latitude,
+        longitude=longitude,
+        image_phash=to_hex(outcome.prepared.perceptual_hash),
+        image_status=_image_status(outcome),
+    )
+    if not identification_id:
+        return None, None
+
+    get_near_duplicate_index().add(identification_id, user.id, outcome.prepared.perceptual_hash)
+    background_tasks.add_task(
+        _upload_and_award_badges, db, _image_uploads(db, [(outcome, identification_id, s3_key, filename)]), user,
+    )
+    base_url = str(request.base_url).rstrip('/')
+    return identification_id, f"{base_url}/api/v1/cars/identifications/{identification_id}/image"
 
 
 @router.post("/identify")
@@ -88,14 +648,14 @@ async def identify_car_from_image(
     store_results: bool = Form(True, description="Whether to store results in database"),
     latitude: Optional[float] = Form(None, description="Latitude of where the photo was taken"),
     longitude: Optional[float] = Form(None, description="Longitude of where the photo was taken"),
-    identifier: AnthropicCarIdentifier = Depends(get_car_identifier),
+    identifier: IdentifierBackend = Depends(get_car_identifier),
     db: Session = Depends(get_db),
     current_user: Optional[User] = Depends(get_current_user_optional),
 ):
     """
     Three-stage car identification pipeline:
-      1. find_make  — Haiku detects manufacturer from badge/logo (fast, cheap)
-      2. identify_car — Sonnet identifies full details, constrained by make hint when confident
+      1. find_make  — fast model detects manufacturer from badge/logo (fast, cheap)
+      2. identify_car — fast model identifies full details (escalating to Sonnet when unsure), constrained by make hint when confident
       3. blur_license_plates — runs in parallel with stage 2; only stored to S3 if is_car=true
     """
 
@@ -108,13 +668,7 @@ async def identify_car_from_image(
         )
 
     # Enforce weekly usage limits
-    stats = db.query(UserCameraStats).filter(UserCameraStats.user_id == current_user.id).first()
-    if stats is None:
-        stats = UserCameraStats(user_id=current_user.id, weekly_count=0, week_start=datetime.now(timezone.utc))
-        db.add(stats)
-        db.commit()
-        db.refresh(stats)
-
+    stats = _get_camera_stats(db, current_user)
     if current_user.user_type == 'basic' and stats.weekly_count >= 1:
         raise HTTPException(
             status_code=429,
@@ -123,142 +677,41 @@ async def identify_car_from_image(
         )
 
     # Validate file type
-    allowed_types = ['image/jpeg', 'image/jpg', 'image/png']
-    if image.content_type not in allowed_types:
+    if image.content_type not in _ALLOWED_TYPES:
         raise HTTPException(
             status_code=400,
-            detail=f"Invalid file type. Supported types: {', '.join(allowed_types)}",
+            detail=f"Invalid file type. Supported types: {', '.join(_ALLOWED_TYPES)}",
         )
 
-    # Validate file size (10 MB limit)
-    max_size = 10 * 1024 * 1024
-    if image.size and image.size > max_size:
-        raise HTTPException(status_code=400, detail="File too large. Maximum size is 10MB.")
+    # Stream the part under the byte cap; reject non-images and bombs from the header alone
+    image_data = await read_image_upload(image)
 
     try:
-        image_data = await image.read()
-
-        # Normalize EXIF orientation once — all downstream code (blur, Claude, S3) sees upright pixels
-        image_data = _normalize_exif(image_data)
-
-        # Parse requested fields — accepts JSON array or comma-separated string
-        fields: list[str] = []
-        if requested_fields:
-            try:
-                parsed = json.loads(requested_fields)
-                if isinstance(parsed, list):
-                    fields = [str(f).strip() for f in parsed if str(f).strip()]
-                else:
-                    fields = [f.strip() for f in requested_fields.split(',') if f.strip()]
-            except (json.JSONDecodeError, TypeError):
-                fields = [f.strip() for f in requested_fields.split(',') if f.strip()]
-
-        request_id = getattr(request.state, "request_id", None)
-        user_id_str = str(current_user.id) if current_user else None
-
-        # Stage 1: detect car make from badge / logo (Haiku)
-        t0 = time.perf_counter()
-        make_result = await identifier.find_make(image_data)
-        make_hint = make_result.get("make")
-        make_confidence = make_result.get("confidence")
-        logger.info(
-            "anthropic_find_make",
-            extra={
-                "request_id": request_id,
-                "user_id": user_id_str,
-                "make_hint": make_hint,
-                "make_confidence": make_confidence,
-                "duration_ms": round((time.perf_counter() - t0) * 1000, 1),
-            },
-        )
+        # Decode once and apply EXIF orientation — blur, Claude and S3 all share the upright
+        # pixels and the memoized variants derived from them
+        prepared = PreparedImage(image_data, image.content_type or "image/jpeg")
+        fields = _parse_requested_fields(requested_fields)
 
-        # Stage 2 + 3 in parallel: identify car (Sonnet, with make hint) & blur license plates
         blur_service = LicensePlateBlurService(aws_region=os.getenv("AWS_REGION", "us-west-2"))
-        t1 = time.perf_counter()
-        result, blur_result = await asyncio.gather(
-            identifier.identify_car(image_data, fields, make_hint, make_confidence),
-            blur_service.blur_license_plates(image_data, image.content_type or "image/jpeg"),
-        )
-        logger.info(
-            "anthropic_identify_car",
-            extra={
-                "request_id": request_id,
-                "user_id": user_id_str,
-                "is_car": result.is_car,
-                "make": result.make,
-                "model": result.model,
-                "confidence": result.confidence,
-                "plates_detected": blur_result.plates_detected,
-                "duration_ms": round((time.perf_counter() - t1) * 1000, 1),
-            },
-        )
-
-        # If Rekognition missed the plate but Claude found it in features, do a targeted re-blur
-        final_image_data = blur_result.image_data
-        if result.is_car and blur_result.plates_detected == 0:
-            plate_texts = _extract_plate_texts_from_features(getattr(result, 'features', None))
-            if plate_texts:
-                retry = await blur_service.blur_with_known_text(final_image_data, plate_texts)
-                if retry.plates_detected > 0:
-                    final_image_data = retry.image_data
+        log_extra = {
+            "request_id": getattr(request.state, "request_id", None),
+            "user_id": str(current_user.id),
+        }
+        outcome = await _identify_prepared(prepared, fields, identifier, blur_service, db, current_user, log_extra)
+        result = outcome.result
 
         # Stage 4a (foreground, fast): DB insert only — gets identification_id immediately
-        identification_id = None
-        image_url = None
-        _s3_key = None
-        if store_results and result.is_car:
-            import uuid as _uuid_mod
-            _ts = datetime.utcnow().strftime("%Y/%m/%d")
-            _ext = (image.filename or "car.jpg").split('.')[-1].lower()
-            _s3_key = f"car-images/{_ts}/{_uuid_mod.uuid4()}.{_ext}"
-            storage_service = CarStorageService(
-                db_session=db,
-                s3_bucket=aws_bucket_name or "carid-images",
-            )
-            identification_id = storage_service.insert_identification_record(
-                s3_key=_s3_key,
-                image_filename=image.filename or "car_image.jpg",
-                result=result,
-                user_id=current_user.id if current_user else None,
-                latitude=latitude,
-                longitude=longitude,
-            )
-            if identification_id:
-                base_url = str(request.base_url).rstrip('/')
-                image_url = f"{base_url}/api/v1/cars/identifications/{identification_id}/image"
+        # Stage 4b (background): S3 upload + badge check — does not block the response
+        identification_id, image_url = _store_outcome(
+            request, db, background_tasks, outcome, image.filename, current_user, latitude, longitude,
+        ) if store_results else (None, None)
+        record_stage_usage(db, [(identification_id, outcome.usage)], current_user, log_extra["request_id"])
 
         # Increment weekly camera usage counter
         stats.weekly_count += 1
         db.commit()
 
-        # Stage 4b (background): S3 upload + badge check — does not block the response
         newly_awarded_badges: list[dict] = []
-        if store_results and result.is_car and _s3_key and identification_id:
-            _bg_storage = CarStorageService(
-                db_session=db,
-                s3_bucket=aws_bucket_name or "carid-images",
-            )
-            _captured_result = result
-            _captured_image_data = final_image_data
-            _captured_filename = image.filename or "car_image.jpg"
-            _captured_user = current_user
-
-            def _background_work():
-                _bg_storage.upload_image_to_s3(
-                    s3_key=_s3_key,
-                    image_data=_captured_image_data,
-                    image_filename=_captured_filename,
-                    result=_captured_result,
-                )
-                if _captured_user:
-                    try:
-                        awarded_ids = check_and_award_badges(db, _captured_user.id)
-                        if awarded_ids:
-                            logger.info("badges_awarded: user=%s badges=%s", _captured_user.id, awarded_ids)
-                    except Exception as _badge_exc:
-                        logger.warning("Badge award failed in background: %s", _badge_exc)
-
-            background_tasks.add_task(_background_work)
 
         # Build response
         response_data: dict = {
@@ -268,45 +721,20 @@ async def identify_car_from_image(
             "filename": image.filename,
             "is_car": result.is_car,
             "newly_awarded_badges": newly_awarded_badges,
+            "cached": outcome.cached,
+            "near_duplicate_of": outcome.near_duplicate_of,
+            "pipeline": outcome.pipeline,
         }
-
-        if result.is_car:
-            car_data: dict = {}
-            for field_name in ['make', 'model', 'description', 'year', 'length',
-                                'car_type', 'body_type', 'features', 'car_rarity']:
-                value = getattr(result, field_name)
-                if value is not None and (not fields or field_name in fields):
-                    car_data[field_name] = value
-            if result.make_source:
-                car_data["make_source"] = result.make_source
-
-            # Fetch third-party statistics for the identified make/model
-            car_statistics = None
-            if result.make and result.model:
-                try:
-                    stats_service = CarStorageService(
-                        db_session=db,
-                        s3_bucket=aws_bucket_name or "carid-images",
-                    )
-                    car_statistics = stats_service.get_or_fetch_car_details(result.make, result.model)
-                except Exception as _stats_exc:
-                    logger.warning("Car statistics fetch failed: %s", _stats_exc)
-
-            response_data.update({
-                "car_details": car_data,
-                "confidence": result.confidence,
-                "car_statistics": car_statistics,
-            })
-        else:
-            response_data.update({
-                "message": "No car detected in the image",
-                "confidence": result.confidence,
-            })
-            if result.description:
-                response_data["description"] = result.description
+        response_data.update(_result_response_fields(result, fields, await _car_statistics([result])))
 
         return JSONResponse(content=response_data, status_code=200)
 
+    except CircuitOpenError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(int(e.retry_after) + 1)},
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except RuntimeError as e:
@@ -315,10 +743,179 @@ async def identify_car_from_image(
         raise HTTPException(status_code=500, detail="Unexpected error during identification")
 
 
+@router.post("/identify/batch")
+@limiter.limit("5/minute")
+async def identify_cars_batch(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    images: List[UploadFile] = File(..., description="Image files to analyze"),
+    requested_fields: Optional[str] = Form(
+        ['make', 'model', 'description', 'year', 'length', 'car_type', 'body_type', 'features'],
+        description="Comma-separated list of fields to return (applies to every image)",
+    ),
+    store_results: bool = Form(True, description="Whether to store results in database"),
+    latitude: Optional[float] = Form(None, description="Latitude of where the photos were taken"),
+    longitude: Optional[float] = Form(None, description="Longitude of where the photos were taken"),
+    identifier: IdentifierBackend = Depends(get_car_identifier),
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(get_current_user_optional),
+):
+    """
+    Identify up to IDENTIFY_BATCH_MAX_IMAGES images in one multipart request.
+
+    Every image runs through the same pipeline as POST /identify, at most
+    IDENTIFY_BATCH_CONCURRENCY at a time. The weekly quota is checked and charged
+    once for the whole batch, stored rows are bulk-inserted, and per-image results
+    come back in input order — a failed image yields {"success": false, "error": ...}
+    without failing the rest.
+    """
+    if current_user is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Authentication required",
+            headers={"X-Error-Code": "auth_required"},
+        )
+
+    if not images:
+        raise HTTPException(status_code=400, detail="No images provided")
+    if len(images) > BATCH_MAX_IMAGES:
+        raise HTTPException(status_code=400, detail=f"Too many images. Maximum per batch is {BATCH_MAX_IMAGES}.")
+
+    # Quota applies to the batch as a whole: all images must fit in what is left this week
+    stats = _get_camera_stats(db, current_user)
+    if current_user.user_type == 'basic' and stats.weekly_count + len(images) > 1:
+        raise HTTPException(
+            status_code=429,
+            detail="Weekly identification limit reached",
+            headers={"X-Error-Code": "limit_exceeded"},
+        )
+
+    for upload in images:
+        if upload.content_type not in _ALLOWED_TYPES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid file type for {upload.filename}. Supported types: {', '.join(_ALLOWED_TYPES)}",
+            )
+
+    # Read every part up front: one bad image rejects the batch before any identification starts
+    image_datas = [await read_image_upload(upload) for upload in images]
+
+    fields = _parse_requested_fields(requested_fields)
+    blur_service = LicensePlateBlurService(aws_region=os.getenv("AWS_REGION", "us-west-2"))
+    request_id = getattr(request.state, "request_id", None)
+    semaphore = asyncio.Semaphore(_BATCH_CONCURRENCY)
+
+    async def _identify_one(index: int, upload: UploadFile):
+        async with semaphore:
+            try:
+                prepared = PreparedImage(image_datas[index], upload.content_type or "image/jpeg")
+                log_extra = {"request_id": request_id, "user_id": str(current_user.id), "batch_index": index}
+                return await _identify_prepared(prepared, fields, identifier, blur_service, db, current_user, log_extra)
+            except Exception as exc:
+                logger.warning("Batch item %d (%s) failed: %s", index, upload.filename, exc)
+                return exc
+
+    outcomes = await asyncio.gather(*(_identify_one(i, upload) for i, upload in enumerate(images)))
+
+    # Bulk-insert every stored car in one round trip
+    to_store = [
+        i for i, outcome in enumerate(outcomes)
+        if store_results and isinstance(outcome, _IdentifyOutcome) and outcome.result.is_car
+    ]
+    s3_keys = {i: _new_s3_key(images[i].filename) for i in to_store}
+    identification_ids: dict = {}
+    if to_store:
+        storage_service = CarStorageService(
+            db_session=db,
+            s3_bucket=aws_bucket_name or "carid-images",
+        )
+        try:
+            ids = storage_service.insert_identification_records([
+                {
+                    "s3_key": s3_keys[i],
+                    "image_filename": images[i].filename or "car_image.jpg",
+                    "result": outcomes[i].result,
+                    "user_id": current_user.id,
+                    "latitude": latitude,
+                    "longitude": longitude,
+                    "image_phash": to_hex(outcomes[i].prepared.perceptual_hash),
+                    "image_status": _image_status(outcomes[i]),
+                }
+                for i in to_store
+            ])
+        except RuntimeError as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        identification_ids = dict(zip(to_store, ids))
+        for i, identification_id in identification_ids.items():
+            get_near_duplicate_index().add(identification_id, current_user.id, outcomes[i].prepared.perceptual_hash)
+
+    record_stage_usage(
+        db,
+        [
+            (identification_ids.get(i), outcome.usage)
+            for i, outcome in enumerate(outcomes) if isinstance(outcome, _IdentifyOutcome)
+        ],
+        current_user,
+        request_id,
+    )
+
+    # Charge the quota once, for the images actually identified
+    succeeded = sum(1 for outcome in outcomes if isinstance(outcome, _IdentifyOutcome))
+    stats.weekly_count += succeeded
+    db.commit()
+
+    if identification_ids:
+        background_tasks.add_task(
+            _upload_and_award_badges,
+            db,
+            _image_uploads(db, [
+                (outcomes[i], identification_id, s3_keys[i], images[i].filename)
+                for i, identification_id in identification_ids.items()
+            ]),
+            current_user,
+        )
+
+    statistics = await _car_statistics([
+        outcome.result for outcome in outcomes if isinstance(outcome, _IdentifyOutcome)
+    ])
+    base_url = str(request.base_url).rstrip('/')
+    results = []
+    for i, (upload, outcome) in enumerate(zip(images, outcomes)):
+        if not isinstance(outcome, _IdentifyOutcome):
+            results.append({"index": i, "filename": upload.filename, "success": False, "error": str(outcome)})
+            continue
+        identification_id = identification_ids.get(i)
+        item = {
+            "index": i,
+            "success": True,
+            "identification_id": identification_id,
+            "image_url": f"{base_url}/api/v1/cars/identifications/{identification_id}/image" if identification_id else None,
+            "filename": upload.filename,
+            "is_car": outcome.result.is_car,
+            "cached": outcome.cached,
+            "near_duplicate_of": outcome.near_duplicate_of,
+            "pipeline": outcome.pipeline,
+        }
+        item.update(_result_response_fields(outcome.result, fields, statistics))
+        results.append(item)
+
+    return JSONResponse(
+        content={"success": True, "count": len(results), "succeeded": succeeded, "results": results},
+        status_code=200,
+    )
+
+
+def _format_stream_event(event: str, data: dict, ndjson: bool) -> str:
+    if ndjson:
+        return json.dumps({"event": event, "data": data}, default=str) + "\n"
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
 @router.post("/identify/stream", response_class=StreamingResponse)
 @limiter.limit("20/minute")
 async def identify_car_from_image_streaming(
     request: Request,
+    background_tasks: BackgroundTasks,
     image: UploadFile = File(..., description="Image file to analyze"),
     requested_fields: Optional[str] = Form(
         ['make', 'model', 'description', 'year', 'length', 'car_type', 'body_type', 'features'],
@@ -327,80 +924,117 @@ async def identify_car_from_image_streaming(
     store_results: bool = Form(True, description="Whether to store results in database"),
     latitude: Optional[float] = Form(None, description="Latitude of where the photo was taken"),
     longitude: Optional[float] = Form(None, description="Longitude of where the photo was taken"),
-    identifier: AnthropicCarIdentifier = Depends(get_car_identifier),
+    identifier: IdentifierBackend = Depends(get_car_identifier),
     db: Session = Depends(get_db),
     current_user: Optional[User] = Depends(get_current_user_optional),
 ):
     """
-    Legacy single-pass identify endpoint (no make-hint pipeline).
-    Kept for backwards compatibility; prefer POST /identify.
+    Same pipeline as POST /identify, streamed as server-sent events while it runs:
+
+      make_detected  — badge make (from find_make, the cache or a near-duplicate upload)
+      identified     — car details, as soon as identify_car returns
+      plates_blurred — number of plates redacted; deferred=true when Rekognition is unavailable
+      stored         — identification_id / image_url (null when nothing was stored)
+      statistics     — third-party car statistics
+      complete       — the full /identify response body
+      error          — {"detail": ...}; the stream ends after it
+
+    Send "Accept: application/x-ndjson" to receive one JSON object per line instead.
+    Validation, auth and quota errors are returned as ordinary HTTP errors before streaming.
     """
+    if current_user is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Authentication required",
+            headers={"X-Error-Code": "auth_required"},
+        )
 
-    allowed_types = ['image/jpeg', 'image/jpg', 'image/png']
-    if image.content_type not in allowed_types:
+    stats = _get_camera_stats(db, current_user)
+    if current_user.user_type == 'basic' and stats.weekly_count >= 1:
         raise HTTPException(
-            status_code=400,
-            detail=f"Invalid file type. Supported types: {', '.join(allowed_types)}",
+            status_code=429,
+            detail="Weekly identification limit reached",
+            headers={"X-Error-Code": "limit_exceeded"},
         )
 
-    max_size = 10 * 1024 * 1024
-    if image.size and image.size > max_size:
-        raise HTTPException(status_code=400, detail="File too large. Maximum size is 10MB.")
+    if image.content_type not in _ALLOWED_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid file type. Supported types: {', '.join(_ALLOWED_TYPES)}",
+        )
 
-    try:
-        image_data = await image.read()
+    # Read before the response starts: the upload is not guaranteed to outlive the handler
+    prepared = PreparedImage(await read_image_upload(image), image.content_type or "image/jpeg")
+    fields = _parse_requested_fields(requested_fields)
+    filename = image.filename
+    ndjson = "application/x-ndjson" in request.headers.get("accept", "")
+    log_extra = {
+        "request_id": getattr(request.state, "request_id", None),
+        "user_id": str(current_user.id),
+    }
 
-        fields: list[str] = []
-        if requested_fields:
-            fields = [f.strip() for f in requested_fields.split(',') if f.strip()]
+    events: asyncio.Queue = asyncio.Queue()
 
-        result = await identifier.identify_car(image_data, fields)
+    def emit(event: str, data: dict) -> None:
+        events.put_nowait((event, data))
 
-        identification_id = None
-        if store_results:
-            if result.is_car:
-                image_data = blur_license_plates(image_data)
-            storage_service = CarStorageService(
-                db_session=db,
-                s3_bucket=aws_bucket_name or "carid-images",
-            )
-            identification_id = await storage_service.store_identification_result(
-                image_filename=image.filename or "car_image.jpg",
-                image_data=image_data,
-                result=result,
-                user_id=current_user.id if current_user else None,
-                latitude=latitude,
-                longitude=longitude,
+    async def run_pipeline() -> None:
+        try:
+            blur_service = LicensePlateBlurService(aws_region=os.getenv("AWS_REGION", "us-west-2"))
+            outcome = await _identify_prepared(
+                prepared, fields, identifier, blur_service, db, current_user, log_extra, emit=emit,
             )
+            result = outcome.result
 
-        response_data: dict = {
-            "success": True,
-            "identification_id": identification_id,
-            "filename": image.filename,
-            "is_car": result.is_car,
-        }
+            identification_id, image_url = _store_outcome(
+                request, db, background_tasks, outcome, filename, current_user, latitude, longitude,
+            ) if store_results else (None, None)
+            record_stage_usage(db, [(identification_id, outcome.usage)], current_user, log_extra["request_id"])
+            stats.weekly_count += 1
+            db.commit()
+            emit("stored", {"identification_id": identification_id, "image_url": image_url})
 
-        if result.is_car:
-            car_data: dict = {}
-            for field_name in ['make', 'model', 'description', 'year', 'length',
-                                'car_type', 'body_type', 'features']:
-                value = getattr(result, field_name)
-                if value is not None and (not fields or field_name in fields):
-                    car_data[field_name] = value
-            response_data.update({"car_details": car_data, "confidence": result.confidence})
-        else:
-            response_data.update({
-                "message": "No car detected in the image",
-                "confidence": result.confidence,
-            })
-            if result.description:
-                response_data["description"] = result.description
+            response_data: dict = {
+                "success": True,
+                "identification_id": identification_id,
+                "image_url": image_url,
+                "filename": filename,
+                "newly_awarded_badges": [],
+                "cached": outcome.cached,
+                "near_duplicate_of": outcome.near_duplicate_of,
+                "pipeline": outcome.pipeline,
+                **_identified_fields(result, fields),
+            }
+            if result.is_car:
+                car_statistics = (await _car_statistics([result])).get(_statistics_key(result))
+                emit("statistics", {"car_statistics": car_statistics})
+                response_data["car_statistics"] = car_statistics
+            emit("complete", response_data)
+        except ValueError as e:
+            emit("error", {"detail": str(e)})
+        except RuntimeError as e:
+            emit("error", {"detail": str(e)})
+        except Exception:
+            logger.exception("identify_stream_failed", extra=log_extra)
+            emit("error", {"detail": "Unexpected error during identification"})
+        finally:
+            events.put_nowait(None)
 
-        return JSONResponse(content=response_data, status_code=200)
+    async def event_stream():
+        task = asyncio.create_task(run_pipeline())
+        try:
+            while True:
+                item = await events.get()
+                if item is None:
+                    break
+                yield _format_stream_event(*item, ndjson=ndjson)
+        finally:
+            # Client went away mid-pipeline: stop spending Claude / Rekognition calls on it
+            if not task.done():
+                task.cancel()
 
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    except RuntimeError as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    except Exception:
-        raise HTTPException(status_code=500, detail="Unexpected error during identification")
+    return StreamingResponse(
+        event_stream(),
+        media_type="application/x-ndjson" if ndjson else "text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
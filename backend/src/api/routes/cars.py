@@ -6,15 +6,18 @@ from sqlalchemy import and_, func
 from typing import Optional, List, Dict, Any
 import json
 import os
-import boto3
 import io
 from botocore.exceptions import ClientError, NoCredentialsError
-from models.car import CarIdentification
+from models.car import IMAGE_BLUR_PENDING, IMAGE_UNAVAILABLE, CarIdentification
 from models.user import User
 from models.car_popularity import CarPopularity
 from models.liked_car import LikedCar
+from models.pending_blur import PendingBlur
+from services.blur_retry_queue import get_blur_retry_queue
 from services.storage_service import CarStorageService
+from utils.aws_clients import get_aws_clients
 from utils.database import get_db
+from utils.image_derivatives import ImageSize, all_keys, derivative_key
 from utils.rate_limit import limiter
 from api.routes.users import get_current_user, get_current_user_optional
 from dotenv import load_dotenv
@@ -26,10 +29,10 @@ load_dotenv()
 router = APIRouter()
 security = HTTPBearer()
 
-# Initialize S3 client
-s3_client = boto3.client('s3', region_name=os.getenv('AWS_REGION', 'us-west-2'))
 aws_bucket_name = os.getenv("AWS_BUCKET_NAME")
 
+_SIZE_DESCRIPTION = "Image variant for image_url: thumb (320px WebP), preview (1080px WebP) or full (original)"
+
 
 # for uploading files to s3 bucket
 @router.post("/upload", summary="Upload file to S3")
@@ -38,16 +41,16 @@ async def upload_file_to_s3(request: Request, file: UploadFile | None = None):
     if file is None:
         return {"error": "No file provided"}
     try:
-        s3_client.upload_fileobj(file.file, aws_bucket_name, file.filename)
+        get_aws_clients().s3.upload_fileobj(file.file, aws_bucket_name, file.filename)
         return {"message": "File uploaded successfully"}
     except Exception as e:
         return {"error": str(e)}
 
 
-def get_car_image_from_s3(car_id: str, db: Session) -> StreamingResponse:
+def get_car_image_from_s3(car_id: str, db: Session, size: str = "full") -> StreamingResponse:
     """
     Retrieve and stream car image from S3 based on car_id.
-    Returns the actual image file.
+    Returns the actual image file; a missing thumb/preview falls back to the original.
     """
     try:
         # Get car information from database
@@ -66,6 +69,22 @@ def get_car_image_from_s3(car_id: str, db: Session) -> StreamingResponse:
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="No image associated with this car"
             )
+
+        if car.image_status == IMAGE_BLUR_PENDING:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Image is waiting for license plate blurring",
+                headers={
+                    "Retry-After": str(int(get_blur_retry_queue().interval_seconds)),
+                    "X-Error-Code": "image_pending",
+                },
+            )
+        if car.image_status == IMAGE_UNAVAILABLE:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Image was not stored: license plates could not be blurred",
+                headers={"X-Error-Code": "image_unavailable"},
+            )
         
         if not aws_bucket_name:
             raise HTTPException(
@@ -74,8 +93,16 @@ def get_car_image_from_s3(car_id: str, db: Session) -> StreamingResponse:
             )
         
         # Get image object from S3
+        s3_client = get_aws_clients().s3
         try:
-            response = s3_client.get_object(Bucket=aws_bucket_name, Key=car.s3_image_key)
+            try:
+                key = derivative_key(car.s3_image_key, size if car.has_derivatives else "full")
+                response = s3_client.get_object(Bucket=aws_bucket_name, Key=key)
+            except ClientError as e:
+                if size == "full" or e.response['Error']['Code'] != 'NoSuchKey':
+                    raise
+                # Derivatives not generated (yet) for this image
+                response = s3_client.get_object(Bucket=aws_bucket_name, Key=car.s3_image_key)
             image_content = response['Body'].read()
             content_type = response.get('ContentType', 'image/png')
             
@@ -120,6 +147,7 @@ async def get_car_identifications(
     make: Optional[str] = None,
     car_type: Optional[str] = None,
     confidence: Optional[str] = None,
+    size: ImageSize = Query("full", description=_SIZE_DESCRIPTION),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -139,7 +167,8 @@ async def get_car_identifications(
         make=make,
         car_type=car_type,
         confidence=confidence,
-        user_id=current_user.id
+        user_id=current_user.id,
+        size=size,
     )
     
     return {
@@ -154,6 +183,7 @@ async def get_popular_cars(
     request: Request,
     page: int = Query(1, ge=1, description="Page number"),
     per_page: int = Query(20, ge=1, le=50, description="Items per page"),
+    size: ImageSize = Query("full", description=_SIZE_DESCRIPTION),
     db: Session = Depends(get_db),
 ):
     """Get the most popular cars sorted by number of likes."""
@@ -179,18 +209,9 @@ async def get_popular_cars(
         s3_bucket=aws_bucket_name or "carid-images",
     )
 
+    base_url = str(request.base_url).rstrip('/')
     cars = []
     for car, likes in results:
-        try:
-            image_url = storage_service.s3_client.generate_presigned_url(
-                'get_object',
-                Params={'Bucket': storage_service.bucket, 'Key': car.s3_image_key},
-                ExpiresIn=3600,
-            )
-        except Exception:
-            base_url = str(request.base_url).rstrip('/')
-            image_url = f"{base_url}/api/v1/cars/identifications/{car.id}/image"
-
         cars.append({
             'id': car.id,
             'make': car.make,
@@ -198,7 +219,8 @@ async def get_popular_cars(
             'car_type': car.car_type,
             'year_estimate': car.year_estimate,
             'confidence': car.confidence,
-            'image_url': image_url,
+            'image_url': storage_service.image_url(car, size, base_url),
+            'image_status': car.image_status,
             'likes': likes,
             'identification_data': car.identification_data,
         })
@@ -228,6 +250,7 @@ async def get_user_liked_cars(
     request: Request,
     page: int = Query(1, ge=1),
     per_page: int = Query(8, ge=1, le=50),
+    size: ImageSize = Query("full", description=_SIZE_DESCRIPTION),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
@@ -251,18 +274,9 @@ async def get_user_liked_cars(
         s3_bucket=aws_bucket_name or "carid-images",
     )
 
+    base_url = str(request.base_url).rstrip('/')
     results = []
     for car in rows:
-        try:
-            image_url = storage_service.s3_client.generate_presigned_url(
-                'get_object',
-                Params={'Bucket': storage_service.bucket, 'Key': car.s3_image_key},
-                ExpiresIn=3600,
-            )
-        except Exception:
-            base_url = str(request.base_url).rstrip('/')
-            image_url = f"{base_url}/api/v1/cars/identifications/{car.id}/image"
-
         results.append({
             'id': car.id,
             'make': car.make,
@@ -270,7 +284,8 @@ async def get_user_liked_cars(
             'car_type': car.car_type,
             'year_estimate': car.year_estimate,
             'confidence': car.confidence,
-            'image_url': image_url,
+            'image_url': storage_service.image_url(car, size, base_url),
+            'image_status': car.image_status,
             'identification_data': car.identification_data,
         })
 
@@ -413,14 +428,18 @@ async def delete_car_identification(
     # Delete dependent rows first to satisfy FK constraints
     db.query(LikedCar).filter(LikedCar.car_id == identification_id).delete()
     db.query(CarPopularity).filter(CarPopularity.id == identification_id).delete()
+    db.query(PendingBlur).filter(PendingBlur.identification_id == identification_id).delete()
 
     db.delete(car)
     db.commit()
 
-    # Delete image from S3 only after DB commit succeeds
+    # Delete image (and its thumb/preview derivatives) from S3 only after DB commit succeeds
     if s3_key:
         try:
-            s3_client.delete_object(Bucket=aws_bucket_name or "carid-images", Key=s3_key)
+            get_aws_clients().s3.delete_objects(
+                Bucket=aws_bucket_name or "carid-images",
+                Delete={'Objects': [{'Key': key} for key in all_keys(s3_key)], 'Quiet': True},
+            )
         except Exception as e:
             print(f"Warning: failed to delete S3 object {s3_key}: {e}")
 
@@ -429,6 +448,7 @@ async def search_cars(
     q: str,
     page: int = Query(1, ge=1),
     per_page: int = Query(8, ge=1, le=50),
+    size: ImageSize = Query("full", description=_SIZE_DESCRIPTION),
     db: Session = Depends(get_db),
     current_user: Optional[User] = Depends(get_current_user_optional),
 ):
@@ -440,7 +460,7 @@ async def search_cars(
     )
 
     offset = (page - 1) * per_page
-    data = storage_service.search_cars(q, limit=per_page, offset=offset)
+    data = storage_service.search_cars(q, limit=per_page, offset=offset, size=size)
 
     # Get liked car IDs for current user
     liked_ids = set()
@@ -515,13 +535,14 @@ async def get_available_identification_fields():
 @router.get("/identifications/{identification_id}/image", response_class=StreamingResponse)
 async def get_car_image(
     identification_id: int,
+    size: ImageSize = Query("full", description="thumb, preview or full"),
     db: Session = Depends(get_db)
 ):
     """
     Get the actual car image file from S3 for a specific car identification.
     Returns the image directly for display in browser or download.
     """
-    return get_car_image_from_s3(str(identification_id), db)
+    return get_car_image_from_s3(str(identification_id), db, size)
 
 
 @router.get("/nearby")
@@ -530,6 +551,7 @@ async def get_nearby_cars(
     latitude: float = Query(..., description="Center latitude"),
     longitude: float = Query(..., description="Center longitude"),
     radius_km: float = Query(25, ge=0.1, le=2000, description="Search radius in kilometers (max 2000)"),
+    size: ImageSize = Query("full", description=_SIZE_DESCRIPTION),
     db: Session = Depends(get_db)
 ):
     """Get car identifications within a given radius of a location. Returns at most 50 nearest cars."""
@@ -567,10 +589,14 @@ async def get_nearby_cars(
         s3_bucket=aws_bucket_name or "carid-images"
     )
 
+    base_url = str(request.base_url).rstrip('/')
     cars = []
     for record in results:
-        # Skip records whose S3 object is missing or inaccessible.
-        if record.s3_image_key:
+        # Skip records whose S3 object is missing or inaccessible; images still waiting
+        # for plate blurring are listed without a URL.
+        if record.image_status == IMAGE_UNAVAILABLE:
+            continue
+        if record.s3_image_key and record.image_status is None:
             try:
                 storage_service.s3_client.head_object(
                     Bucket=storage_service.bucket, Key=record.s3_image_key
@@ -578,15 +604,6 @@ async def get_nearby_cars(
             except Exception:
                 continue
 
-        try:
-            image_url = storage_service.s3_client.generate_presigned_url(
-                'get_object',
-                Params={'Bucket': storage_service.bucket, 'Key': record.s3_image_key},
-                ExpiresIn=3600
-            ) if record.s3_image_key else None
-        except Exception:
-            image_url = None
-
         cars.append({
             'id': record.id,
             'latitude': record.latitude,
@@ -596,7 +613,8 @@ async def get_nearby_cars(
             'car_type': record.car_type,
             'year_estimate': record.year_estimate,
             'confidence': record.confidence,
-            'image_url': image_url,
+            'image_url': storage_service.image_url(record, size, base_url) if record.s3_image_key else None,
+            'image_status': record.image_status,
             'identification_data': record.identification_data,
             'created_at': record.created_at.isoformat() if record.created_at else None,
         })
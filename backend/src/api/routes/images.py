@@ -7,13 +7,13 @@ from fastapi.responses import StreamingResponse
 
 from services.license_plate_service import LicensePlateBlurService
 from utils.rate_limit import limiter
+from utils.upload_intake import read_image_upload
 
 logger = logging.getLogger("carid.images")
 
 router = APIRouter()
 
 _ALLOWED_TYPES = {"image/jpeg", "image/jpg", "image/png"}
-_MAX_SIZE = 10 * 1024 * 1024  # 10 MB
 
 
 def _get_blur_service() -> LicensePlateBlurService:
@@ -42,10 +42,7 @@ async def blur_license_plates(
             detail=f"Invalid file type. Supported types: {', '.join(sorted(_ALLOWED_TYPES))}",
         )
 
-    if image.size and image.size > _MAX_SIZE:
-        raise HTTPException(status_code=400, detail="File too large. Maximum size is 10 MB.")
-
-    image_data = await image.read()
+    image_data = await read_image_upload(image)
 
     blur_service = _get_blur_service()
     blur_result = await blur_service.blur_license_plates(image_data, image.content_type)
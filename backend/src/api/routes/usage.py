@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from api.routes.users import get_current_user
+from models.user import User
+from services.usage_accounting import usage_report
+from utils.database import get_db
+
+router = APIRouter()
+
+
+@router.get("/identify", summary="Identify cost and latency per stage, user type and day (admin only)")
+async def identify_usage(
+    days: int = Query(7, ge=1, le=90),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Daily per-request cost/latency percentiles and per-stage token, call and
+    latency totals for identify requests, split by user type.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return usage_report(db, days)
@@ -10,8 +10,9 @@ from models.car import CarIdentification
 from models.refresh_token import RefreshToken
 from models.liked_car import LikedCar
 from models.car_popularity import CarPopularity
-from services.s3_service import S3Service
+from utils.aws_clients import get_aws_clients
 from utils.database import get_db
+from utils.image_derivatives import all_keys
 from utils.rate_limit import limiter
 from passlib.context import CryptContext
 import jwt
@@ -26,6 +27,9 @@ security_logger = logging.getLogger("carid.security")
 SECRET_KEY = os.getenv("AUTH_SECRET_KEY")
 ALGORITHM = "HS256"
 
+# delete_objects accepts at most 1000 keys per call
+_S3_DELETE_BATCH = 1000
+
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
     """Validate JWT token and return current user."""
     try:
@@ -265,12 +269,16 @@ async def delete_account(
 
         security_logger.info("Account deleted: user_id=%s username=%s", user_id, current_user.username)
 
-        # 8. Clean up S3 images (after commit so failures don't rollback)
+        # 8. Clean up S3 images and their thumb/preview derivatives (after commit so failures don't rollback)
         if s3_keys:
             try:
-                s3_service = S3Service()
-                for key in s3_keys:
-                    await s3_service.delete_image(key)
+                s3_client = get_aws_clients().s3
+                keys = [key for s3_key in s3_keys for key in all_keys(s3_key)]
+                for start in range(0, len(keys), _S3_DELETE_BATCH):
+                    s3_client.delete_objects(
+                        Bucket=os.getenv("AWS_BUCKET_NAME") or "carid-images",
+                        Delete={'Objects': [{'Key': key} for key in keys[start:start + _S3_DELETE_BATCH]], 'Quiet': True},
+                    )
             except Exception as e:
                 print(f"Warning: S3 cleanup failed for user {user_id}: {e}")
 
@@ -0,0 +1,112 @@
+"""
+Generate the WebP thumb/preview derivatives (see utils/image_derivatives.py) for car
+images stored before derivatives existed, and set has_derivatives on their rows so
+list endpoints start linking them. Safe to re-run: only rows without the flag are
+visited unless --force is given, and a row whose thumbnail already exists in S3 is
+just flagged.
+
+    cd backend/src
+    python backfill_derivatives.py [--limit N] [--since-id ID] [--force] [--dry-run]
+"""
+
+import argparse
+import os
+import time
+
+from botocore.exceptions import ClientError
+from dotenv import load_dotenv
+
+from models.car import CarIdentification
+from services.storage_service import CarStorageService
+from utils.database import SessionLocal
+from utils.image_derivatives import derivative_key
+from utils.image_executor import get_image_executor
+
+# Load environment variables
+load_dotenv()
+
+_BATCH_SIZE = 200
+
+
+def _has_derivatives(storage: CarStorageService, s3_key: str) -> bool:
+    try:
+        storage.s3_client.head_object(Bucket=storage.bucket, Key=derivative_key(s3_key, "thumb"))
+        return True
+    except ClientError:
+        return False
+
+
+def backfill(limit: int = 0, since_id: int = 0, force: bool = False, dry_run: bool = False) -> dict:
+    """Walk car_identifications in id order and upload missing derivatives. Returns counts."""
+    db = SessionLocal()
+    storage = CarStorageService(db_session=db, s3_bucket=os.getenv("AWS_BUCKET_NAME") or "carid-images")
+    counts = {"scanned": 0, "flagged": 0, "generated": 0, "missing_original": 0, "failed": 0}
+    last_id = since_id
+    try:
+        while True:
+            query = db.query(CarIdentification.id, CarIdentification.s3_image_key).filter(CarIdentification.id > last_id)
+            if not force:
+                query = query.filter(CarIdentification.has_derivatives.is_(False))
+            rows = (
+                query
+                .order_by(CarIdentification.id)
+                .limit(_BATCH_SIZE)
+                .all()
+            )
+            if not rows:
+                break
+            for record_id, s3_key in rows:
+                last_id = record_id
+                if limit and counts["scanned"] >= limit:
+                    return counts
+                counts["scanned"] += 1
+
+                if not force and _has_derivatives(storage, s3_key):
+                    # Uploaded before the flag existed
+                    if not dry_run:
+                        storage.update_identification_record(record_id, has_derivatives=True)
+                    counts["flagged"] += 1
+                    continue
+                if dry_run:
+                    print(f"would generate: {record_id} {s3_key}")
+                    counts["generated"] += 1
+                    continue
+
+                try:
+                    obj = storage.s3_client.get_object(Bucket=storage.bucket, Key=s3_key)
+                    image_data = obj["Body"].read()
+                except ClientError as e:
+                    print(f"⚠️  {record_id}: original not readable ({e.response['Error']['Code']}): {s3_key}")
+                    counts["missing_original"] += 1
+                    continue
+
+                if storage.upload_derivatives(s3_key, image_data, record_id):
+                    counts["generated"] += 1
+                else:
+                    print(f"❌ {record_id}: derivative generation failed: {s3_key}")
+                    counts["failed"] += 1
+            print(f"… up to id {last_id}: {counts}")
+    finally:
+        db.close()
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=0, help="stop after scanning N rows (0 = all)")
+    parser.add_argument("--since-id", type=int, default=0, help="resume after this car_identifications.id")
+    parser.add_argument("--force", action="store_true", help="regenerate even for rows already flagged or with a thumbnail")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be generated")
+    args = parser.parse_args()
+
+    get_image_executor().start()
+    t0 = time.perf_counter()
+    try:
+        counts = backfill(args.limit, args.since_id, args.force, args.dry_run)
+    finally:
+        get_image_executor().shutdown()
+    print(f"✅ Done in {time.perf_counter() - t0:.1f}s: {counts}")
+
+
+if __name__ == "__main__":
+    main()
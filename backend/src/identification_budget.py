@@ -0,0 +1,79 @@
+"""
+identification_budget.py
+Per-stage image resolution, JPEG quality and max_tokens for Claude calls.
+
+Image tokens scale with pixel area (≈ width × height / 750) and output tokens with
+the number and kind of requested fields, so sending every stage a 1024 px image
+and a 1000-token cap overpays for badge detection and small field sets. plan_budget
+sizes each call from what it has to produce; the anthropic_usage log and the
+anthropic.<stage>.<budget>.* token series in /metrics show how close the plans run
+to real usage, so the estimates below can be tuned from data.
+
+TOKEN_BUDGET_PLANNER=false restores the fixed 1024 px / q85 / 200 + 1000 token calls.
+"""
+
+import math
+import os
+from dataclasses import dataclass
+from typing import Iterable, Tuple
+
+# Rough output-token cost of each field in the JSON answer (key, quotes and value)
+_FIELD_OUTPUT_TOKENS = {
+    'make': 8,
+    'model': 10,
+    'year': 8,
+    'length': 8,
+    'car_type': 8,
+    'body_type': 8,
+    'car_rarity': 8,
+    'description': 120,
+    'features': 150,
+}
+_UNKNOWN_FIELD_OUTPUT_TOKENS = 30
+# {"is_car", "confidence", braces}; also covers the not-a-car answer's short description
+_BASE_OUTPUT_TOKENS = 60
+_OUTPUT_HEADROOM = 1.5
+_MIN_IDENTIFY_TOKENS = 150
+_MAX_IDENTIFY_TOKENS = 1000
+
+# Fields that depend on fine detail (trim, wheels, badging) get the full-resolution image
+_DETAIL_FIELDS = {'description', 'features', 'year'}
+
+
+@dataclass(frozen=True)
+class StageBudget:
+    name: str                    # recorded with token usage, e.g. "identify_detail"
+    max_size: Tuple[int, int]
+    quality: int
+    max_tokens: int
+
+
+LEGACY_FIND_MAKE = StageBudget("legacy", (1024, 1024), 85, 200)
+LEGACY_IDENTIFY = StageBudget("legacy", (1024, 1024), 85, 1000)
+
+
+def _planner_enabled() -> bool:
+    return os.getenv("TOKEN_BUDGET_PLANNER", "true").lower() != "false"
+
+
+def find_make_budget() -> StageBudget:
+    """Badges stay legible at 768 px; the answer is a ~20-token JSON object (100 leaves room for code fences)."""
+    if not _planner_enabled():
+        return LEGACY_FIND_MAKE
+    side = int(os.getenv("FIND_MAKE_IMAGE_MAX_SIDE", 768))
+    return StageBudget("find_make", (side, side), 80, 100)
+
+
+def identify_budget(requested_fields: Iterable[str]) -> StageBudget:
+    """Full resolution only for detail fields; max_tokens from the fields' estimated sizes."""
+    if not _planner_enabled():
+        return LEGACY_IDENTIFY
+    fields = set(requested_fields)
+    estimate = _BASE_OUTPUT_TOKENS + sum(
+        _FIELD_OUTPUT_TOKENS.get(field, _UNKNOWN_FIELD_OUTPUT_TOKENS) for field in fields
+    )
+    max_tokens = min(_MAX_IDENTIFY_TOKENS, max(_MIN_IDENTIFY_TOKENS, math.ceil(estimate * _OUTPUT_HEADROOM)))
+    if fields & _DETAIL_FIELDS:
+        return StageBudget("identify_detail", (1024, 1024), 85, max_tokens)
+    side = int(os.getenv("IDENTIFY_BASIC_IMAGE_MAX_SIDE", 768))
+    return StageBudget("identify_basic", (side, side), 80, max_tokens)
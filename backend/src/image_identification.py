@@ -1,10 +1,22 @@
 import anthropic
-import base64
+import asyncio
 import json
-from typing import Dict, List, Optional
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, Union
+import dataclasses
 from dataclasses import dataclass
-from PIL import Image
-import io
+from identification_budget import StageBudget, find_make_budget, identify_budget, LEGACY_IDENTIFY
+from utils import metrics
+from utils.circuit_breaker import CircuitOpenError, get_breaker
+from utils.hedging import get_hedge_policy
+from utils.prepared_image import PreparedImage
+from utils.usage_tracker import StageUsage, claude_cost, record
+
+logger = logging.getLogger("carid.anthropic")
 
 @dataclass
 class CarIdentificationResult:
@@ -21,123 +33,357 @@ class CarIdentificationResult:
     make_source: Optional[str] = None
     car_rarity: Optional[str] = None
 
-class AnthropicCarIdentifier:
-    HAIKU_MODEL = "claude-sonnet-4-6"
+# Bump whenever prompts or result parsing change so cached identifications are invalidated
+PROMPT_VERSION = "3"
+
+FIELD_DESCRIPTIONS = {
+    'make': 'manufacturer/brand name',
+    'model': 'specific model name',
+    'description': 'detailed physical description',
+    'year': 'estimated year or year range',
+    'length': 'estimated length in feet',
+    'car_type': 'type (sedan, SUV, truck, coupe, convertible, hatchback, etc.)',
+    'body_type': 'body style (coupe, sedan, hatchback, wagon, etc.)',
+    'features': 'notable visible features as an array — include things like body modifications, trim level indicators, roof type, spoilers, wheel style, and exterior design elements; do NOT include license plates, registration stickers, or any other personally identifying information',
+    'car_rarity': 'rarity tier of this car model — exactly one of: common|uncommon|rare|epic|legendary. common=everyday mass-market cars (e.g. Toyota Corolla), uncommon=less common but not rare, rare=limited production or older classics, epic=exotic or high-performance sports cars, legendary=ultra-rare supercars or one-of-a-kind vehicles'
+}
+
+# Static instructions go in the system prompt, marked for Anthropic prompt caching, so only
+# the short per-request text (requested fields, make hint) and the image are processed fresh.
+# The cache only applies once the cached prefix reaches the model's minimum cacheable length;
+# usage.cache_read_input_tokens in the anthropic_usage log shows whether it is being hit.
+FIND_MAKE_SYSTEM_PROMPT = """Look only at car badges, grille logos, or emblems in the image.
+Identify the manufacturer brand (e.g., Toyota, Mercedes, Ford).
+Respond with valid JSON only.
+If a brand is visible: {"make": "BrandName", "confidence": "high|medium|low"}
+If no badge or logo is visible: {"make": null, "confidence": "low"}"""
+
+IDENTIFY_SYSTEM_PROMPT = """Analyze the image carefully and determine if it shows a car or vehicle.
+
+If it IS a car, respond with a JSON object containing "is_car": true, "confidence": "high|medium|low",
+and every field the user requests. Field meanings:
+""" + "\n".join(f'- "{field}": {text}' for field, text in FIELD_DESCRIPTIONS.items()) + """
+
+If it is NOT a car, respond with:
+{
+    "is_car": false,
+    "confidence": "high",
+    "description": "brief description of what you see instead"
+}
+
+Guidelines:
+- Use "unknown" for fields you cannot determine
+- Be specific but concise
+- Confidence should reflect your certainty about the car identification
+- For features, include notable equipment, design elements, or modifications
+- Do NOT include license plates, registration stickers, VINs, or any other personally identifying information in any field
+
+Respond only with valid JSON."""
+
+
+# Fields whose absence means the fast model did not really identify the car
+_CASCADE_KEY_FIELDS = ('make', 'model')
+
+
+def _is_unknown(value) -> bool:
+    return value is None or (isinstance(value, str) and value.strip().lower() in ("", "unknown"))
+
+
+def _is_anthropic_failure(exc: Exception) -> bool:
+    """400s are rejected requests (e.g. an oversized image), not an unhealthy API."""
+    return not isinstance(exc, anthropic.BadRequestError)
+
+
+def _cached_system(text: str) -> list:
+    return [{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}]
+
+
+@lru_cache(maxsize=512)
+def _identify_instructions(requested_fields: Tuple[str, ...], make_hint: Optional[str]) -> str:
+    """Per-request part of the identify prompt, memoized per (fields, make hint)."""
+    make_constraint = f'The car in this image is a {make_hint}. ' if make_hint else ''
+    fields = ", ".join(f'"{field}"' for field in requested_fields)
+    return f'{make_constraint}If it is a car, include these fields: {fields}.'
+
+
+class IdentifierBackend(ABC):
+    """
+    What the identify pipeline needs from a car identifier.
+
+    Implementations: AnthropicCarIdentifier (production) and
+    local_identification.LocalCarIdentifier (offline stand-in for load tests).
+    """
+
+    @property
+    @abstractmethod
+    def cache_version(self) -> str:
+        """Identifies the backend/models/prompts behind a result; part of every cache key."""
+
+    @abstractmethod
+    async def find_make(self, image_data: Union[bytes, PreparedImage]) -> dict:
+        """{"make": str | None, "confidence": "high|medium|low"}; never raises."""
+
+    @abstractmethod
+    async def identify_car(
+        self,
+        image_data: Union[bytes, PreparedImage],
+        requested_fields: List[str] = None,
+        make_hint: Optional[str] = None,
+        make_confidence: Optional[str] = None,
+    ) -> CarIdentificationResult:
+        """Raises ValueError for unparseable answers and RuntimeError for backend failures."""
+
+    async def close(self) -> None:
+        """Release any pooled connections."""
+
 
-    def __init__(self, api_key: str, model: str = "claude-sonnet-4-6"):
-        self.client = anthropic.Anthropic(api_key=api_key)
+class AnthropicCarIdentifier(IdentifierBackend):
+    FAST_MODEL = "claude-haiku-4-5"
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "claude-sonnet-4-6",
+        timeout: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+        fast_model: Optional[str] = None,
+        cascade: Optional[bool] = None,
+    ):
+        """
+        Uses the async Anthropic client so calls never block the event loop.
+        Build one instance per process and share it — the underlying HTTP
+        connection pool and the concurrency cap are per-instance.
+
+        Model cascade: both stages run on fast_model first and escalate to model
+        only when the answer is low-confidence or its key fields are unknown.
+        With the cascade off, find_make uses fast_model and identify_car uses model.
+        """
+        self.timeout = timeout or float(os.getenv("ANTHROPIC_TIMEOUT_SECONDS", 30))
+        # Badge detection is a short answer — give up on it sooner than full identification
+        self.find_make_timeout = float(os.getenv("ANTHROPIC_FIND_MAKE_TIMEOUT_SECONDS", 15))
+        self.client = anthropic.AsyncAnthropic(
+            api_key=api_key,
+            timeout=self.timeout,
+            max_retries=int(os.getenv("ANTHROPIC_MAX_RETRIES", 2)),
+        )
         self.model = model
+        self.fast_model = fast_model or os.getenv("ANTHROPIC_FAST_MODEL", self.FAST_MODEL)
+        if cascade is None:
+            cascade = os.getenv("ANTHROPIC_MODEL_CASCADE", "true").lower() != "false"
+        self.cascade = cascade and self.fast_model != self.model
+        # Caps in-flight Claude calls per worker; excess callers wait their turn
+        self._semaphore = asyncio.Semaphore(
+            max_concurrency or int(os.getenv("ANTHROPIC_MAX_CONCURRENCY", 16))
+        )
+
+    @property
+    def cache_version(self) -> str:
+        """Identifies the models and prompts behind a result; part of every cache key."""
+        cascade = "cascade" if self.cascade else "direct"
+        return f"{self.fast_model}|{self.model}|{cascade}|prompt-v{PROMPT_VERSION}"
+
+    async def close(self) -> None:
+        """Release the pooled HTTP connections held by the client."""
+        await self.client.close()
+
+    async def _create_message(
+        self, stage: str, budget: StageBudget, timeout: Optional[float] = None, **kwargs
+    ):
+        """
+        messages.create under the concurrency cap with a per-call timeout; logs token usage.
+        A call running past its stage/model's recent tail latency is hedged (see utils.hedging);
+        each attempt takes its own concurrency slot and is billed on its own.
+        Raises CircuitOpenError without calling out while the Anthropic breaker is open.
+        """
+        model = kwargs.get("model")
+        policy = get_hedge_policy(f"anthropic.{stage}.{model}")
+        # Start times of attempts that hold a slot and are waiting on the API
+        in_flight: Dict[object, float] = {}
+
+        async def _attempt():
+            async with self._semaphore:
+                attempt = object()
+                in_flight[attempt] = time.perf_counter()
+                try:
+                    response = await self.client.messages.create(timeout=timeout or self.timeout, **kwargs)
+                finally:
+                    started = in_flight.pop(attempt)
+                # Recorded here rather than for the winner only: a hedge that also completes is billed too
+                self._record_usage(stage, model, budget, response, (time.perf_counter() - started) * 1000)
+                return response
+
+        async def _send():
+            response = await policy.run(_attempt)
+            # Losing attempts are cancelled but their prompts were already sent (and billed)
+            for started in list(in_flight.values()):
+                self._record_abandoned(stage, model, response, (time.perf_counter() - started) * 1000)
+            return response
+
+        return await get_breaker("anthropic").call_async(_send, is_failure=_is_anthropic_failure)
+
+    @staticmethod
+    def _record_abandoned(stage: str, model: Optional[str], winner, duration_ms: float) -> None:
+        """
+        Add the estimated cost of a cancelled hedge attempt to the request's usage tracker:
+        the same prompt as the winning attempt, no output.
+        """
+        usage = getattr(winner, "usage", None)
+        if usage is None:
+            return
+        tokens = {
+            "input_tokens": usage.input_tokens,
+            "output_tokens": 0,
+            "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", None) or 0,
+            "cache_read_input_tokens": getattr(usage, "cache_read_input_tokens", None) or 0,
+        }
+        metrics.increment(f"anthropic.{stage}.hedge_abandoned")
+        cost_usd = claude_cost(model, **tokens)
+        record(StageUsage(stage=stage, model=model, duration_ms=duration_ms, cost_usd=cost_usd, **tokens))
+        logger.info(
+            "anthropic_hedge_abandoned",
+            extra={"stage": stage, "model": model, "duration_ms": round(duration_ms, 1),
+                   "estimated_cost_usd": round(cost_usd, 6), **tokens},
+        )
+
+    @staticmethod
+    def _record_usage(
+        stage: str, model: Optional[str], budget: StageBudget, response, duration_ms: float = 0.0
+    ) -> None:
+        """
+        Log per-call token usage (including prompt-cache writes and reads) against the
+        budget that was planned, keep per-budget token distributions for tuning, and
+        add the call's tokens, wall time and cost to the request's usage tracker.
+        """
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+        tokens = {
+            "input_tokens": usage.input_tokens,
+            "output_tokens": usage.output_tokens,
+            # Absent on Usage objects from SDKs predating prompt caching
+            "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", None) or 0,
+            "cache_read_input_tokens": getattr(usage, "cache_read_input_tokens", None) or 0,
+        }
+        for name, value in tokens.items():
+            metrics.increment(f"anthropic.{stage}.{name}", value)
+        metrics.observe(f"anthropic.{stage}.{budget.name}.input_tokens", usage.input_tokens)
+        metrics.observe(f"anthropic.{stage}.{budget.name}.output_tokens", usage.output_tokens)
+        stop_reason = getattr(response, "stop_reason", None)
+        if stop_reason == "max_tokens":
+            metrics.increment(f"anthropic.{stage}.{budget.name}.max_tokens_hit")
+        cost_usd = claude_cost(model, **tokens)
+        record(StageUsage(stage=stage, model=model, duration_ms=duration_ms, cost_usd=cost_usd, **tokens))
+        logger.info(
+            "anthropic_usage",
+            extra={
+                "stage": stage,
+                "model": model,
+                "budget": budget.name,
+                "max_tokens": budget.max_tokens,
+                "image_max_side": budget.max_size[0],
+                "stop_reason": stop_reason,
+                "duration_ms": round(duration_ms, 1),
+                "cost_usd": round(cost_usd, 6),
+                **tokens,
+            },
+        )
     
-    def _prepare_image(self, image_data: bytes, max_size: tuple = (1024, 1024)) -> str:
-        """Resize and encode image for API"""
-        image = Image.open(io.BytesIO(image_data))
-        
-        # Resize if needed
-        if image.size[0] > max_size[0] or image.size[1] > max_size[1]:
-            image.thumbnail(max_size, Image.Resampling.LANCZOS)
-        
-        # Convert to RGB if needed
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # Convert to base64
-        buffer = io.BytesIO()
-        image.save(buffer, format='JPEG', quality=85)
-        return base64.b64encode(buffer.getvalue()).decode()
+    async def _prepare_image(self, image_data: Union[bytes, PreparedImage], budget: StageBudget) -> str:
+        """Resize and encode image for API at the budget's size/quality (in the image pool, memoized)"""
+        return await PreparedImage.wrap(image_data).claude_base64(budget.max_size, budget.quality)
     
     def _build_prompt(self, requested_fields: List[str], make_hint: Optional[str] = None) -> str:
-        """Build structured prompt for car identification"""
-        field_descriptions = {
-            'make': 'manufacturer/brand name',
-            'model': 'specific model name',
-            'description': 'detailed physical description',
-            'year': 'estimated year or year range',
-            'length': 'estimated length in feet',
-            'car_type': 'type (sedan, SUV, truck, coupe, convertible, hatchback, etc.)',
-            'body_type': 'body style (coupe, sedan, hatchback, wagon, etc.)',
-            'features': 'notable visible features as an array — include things like body modifications, trim level indicators, roof type, spoilers, wheel style, and exterior design elements; do NOT include license plates, registration stickers, or any other personally identifying information',
-            'car_rarity': 'rarity tier of this car model — exactly one of: common|uncommon|rare|epic|legendary. common=everyday mass-market cars (e.g. Toyota Corolla), uncommon=less common but not rare, rare=limited production or older classics, epic=exotic or high-performance sports cars, legendary=ultra-rare supercars or one-of-a-kind vehicles'
-        }
-        
-        requested_descriptions = [f'"{field}": {field_descriptions.get(field, field)}' 
-                                for field in requested_fields]
-        
-        make_constraint = f'The car in this image is a {make_hint}. ' if make_hint else ''
+        """Per-request prompt text; the static instructions live in IDENTIFY_SYSTEM_PROMPT."""
+        return _identify_instructions(tuple(requested_fields), make_hint)
+    
+    @staticmethod
+    def _record_cascade(stage: str, escalation_reason: Optional[str]) -> None:
+        """Count fast-model answers vs escalations; escalated / calls is the escalation rate."""
+        metrics.increment(f"model_cascade.{stage}.calls")
+        if escalation_reason:
+            metrics.increment(f"model_cascade.{stage}.escalated")
+            logger.info("model_cascade_escalated", extra={"stage": stage, "reason": escalation_reason})
 
-        return f"""
-        {make_constraint}Analyze this image carefully and determine if it shows a car or vehicle.
-        
-        If it IS a car, respond with a JSON object containing:
-        {{
-            "is_car": true,
-            "confidence": "high|medium|low",
-            {', '.join(requested_descriptions)}
-        }}
-        
-        If it is NOT a car, respond with:
-        {{
-            "is_car": false,
-            "confidence": "high",
-            "description": "brief description of what you see instead"
-        }}
-        
-        Guidelines:
-        - Use "unknown" for fields you cannot determine
-        - Be specific but concise
-        - Confidence should reflect your certainty about the car identification
-        - For features, include notable equipment, design elements, or modifications
-        - Do NOT include license plates, registration stickers, VINs, or any other personally identifying information in any field
-        
-        Respond only with valid JSON.
+    async def find_make(self, image_data: Union[bytes, PreparedImage]) -> dict:
         """
-    
-    async def find_make(self, image_data: bytes) -> dict:
-        """Detect car manufacturer brand from badge/logo in image."""
+        Detect car manufacturer brand from badge/logo in image. Failures give an unknown make,
+        except CircuitOpenError, which propagates (identify_car would be refused too).
+        """
+        budget = find_make_budget()
         try:
-            base64_image = self._prepare_image(image_data)
-            prompt = """Look only at car badges, grille logos, or emblems in this image.
-Identify the manufacturer brand (e.g., Toyota, Mercedes, Ford).
-Respond with valid JSON only.
-If a brand is visible: {"make": "BrandName", "confidence": "high|medium|low"}
-If no badge or logo is visible: {"make": null, "confidence": "low"}"""
+            base64_image = await self._prepare_image(image_data, budget)
+        except Exception:
+            return {"make": None, "confidence": "low"}
 
-            response = self.client.messages.create(
-                model=self.HAIKU_MODEL,
-                max_tokens=200,
-                temperature=0.05,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "image",
-                                "source": {
-                                    "type": "base64",
-                                    "media_type": "image/jpeg",
-                                    "data": base64_image
-                                }
-                            },
-                            {
-                                "type": "text",
-                                "text": prompt
-                            }
-                        ]
-                    }
-                ]
-            )
+        if not self.cascade:
+            try:
+                return await self._find_make_with(self.fast_model, base64_image, budget)
+            except CircuitOpenError:
+                raise
+            except Exception:
+                return {"make": None, "confidence": "low"}
 
-            result_text = response.content[0].text.strip()
-            if result_text.startswith("```"):
-                result_text = result_text.split("```", 2)[1]
-                if result_text.startswith("json"):
-                    result_text = result_text[4:]
-                result_text = result_text.strip()
-            return json.loads(result_text)
+        # {"make": null} is a definite "no badge visible", not an uncertain answer —
+        # only a badge read with low confidence (or an unreadable reply) escalates
+        reason = None
+        try:
+            make_result = await self._find_make_with(self.fast_model, base64_image, budget)
+            if make_result.get("make") is not None and (
+                make_result.get("confidence") == "low" or _is_unknown(make_result.get("make"))
+            ):
+                reason = "low_confidence"
+        except CircuitOpenError:
+            raise
         except Exception:
-            return {"make": None, "confidence": "low"}
+            make_result = {"make": None, "confidence": "low"}
+            reason = "fast_model_error"
+        self._record_cascade("find_make", reason)
+        if reason is None:
+            return make_result
+        try:
+            return await self._find_make_with(self.model, base64_image, budget)
+        except CircuitOpenError:
+            raise
+        except Exception:
+            return make_result
+
+    async def _find_make_with(self, model: str, base64_image: str, budget: StageBudget) -> dict:
+        """One badge-detection call; raises on API or JSON errors."""
+        response = await self._create_message(
+            "find_make",
+            budget,
+            timeout=self.find_make_timeout,
+            model=model,
+            max_tokens=budget.max_tokens,
+            temperature=0.05,
+            system=_cached_system(FIND_MAKE_SYSTEM_PROMPT),
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "image",
+                            "source": {
+                                "type": "base64",
+                                "media_type": "image/jpeg",
+                                "data": base64_image
+                            }
+                        }
+                    ]
+                }
+            ]
+        )
+
+        result_text = response.content[0].text.strip()
+        if result_text.startswith("```"):
+            result_text = result_text.split("```", 2)[1]
+            if result_text.startswith("json"):
+                result_text = result_text[4:]
+            result_text = result_text.strip()
+        return json.loads(result_text)
 
     async def identify_car(self,
-                          image_data: bytes,
+                          image_data: Union[bytes, PreparedImage],
                           requested_fields: List[str] = None,
                           make_hint: Optional[str] = None,
                           make_confidence: Optional[str] = None) -> CarIdentificationResult:
@@ -146,21 +392,70 @@ If no badge or logo is visible: {"make": null, "confidence": "low"}"""
         if requested_fields is None:
             requested_fields = ['make', 'model', 'description', 'car_type']
         
+        budget = identify_budget(requested_fields)
         try:
             # Prepare image
-            base64_image = self._prepare_image(image_data)
-            
-            # Only inject make hint when confidence is high or medium
-            effective_make_hint = make_hint if make_confidence in ("high", "medium") else None
+            base64_image = await self._prepare_image(image_data, budget)
+        except Exception as e:
+            raise RuntimeError(f"Error calling Anthropic API: {e}")
 
-            # Build prompt
-            prompt = self._build_prompt(requested_fields, effective_make_hint)
-            
+        # Only inject make hint when confidence is high or medium
+        effective_make_hint = make_hint if make_confidence in ("high", "medium") else None
+
+        # Build prompt
+        prompt = self._build_prompt(requested_fields, effective_make_hint)
+
+        if not self.cascade:
+            return await self._identify_with(self.model, base64_image, prompt, effective_make_hint, budget)
+
+        try:
+            result = await self._identify_with(
+                self.fast_model, base64_image, prompt, effective_make_hint, budget
+            )
+            reason = self._escalation_reason(result, requested_fields)
+        except CircuitOpenError:
+            # An open breaker is not a fast-model failure: the full model would be refused too
+            raise
+        except (ValueError, RuntimeError):
+            reason = "fast_model_error"
+        self._record_cascade("identify_car", reason)
+        if reason is None:
+            return result
+        return await self._identify_with(self.model, base64_image, prompt, effective_make_hint, budget)
+
+    @staticmethod
+    def _escalation_reason(result: CarIdentificationResult, requested_fields: List[str]) -> Optional[str]:
+        """Why a fast-model identification is not good enough to return, or None."""
+        if result.confidence == "low":
+            return "low_confidence"
+        if result.is_car:
+            for field in _CASCADE_KEY_FIELDS:
+                if field in requested_fields and _is_unknown(getattr(result, field)):
+                    return f"unknown_{field}"
+        return None
+
+    async def _identify_with(
+        self,
+        model: str,
+        base64_image: str,
+        prompt: str,
+        effective_make_hint: Optional[str],
+        budget: StageBudget,
+    ) -> CarIdentificationResult:
+        """
+        One identification call on the given model. An answer cut off by a planned
+        max_tokens below the legacy cap is retried once with the legacy cap.
+        """
+        result_text = None
+        try:
             # Call Anthropic API
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=1000,
+            response = await self._create_message(
+                "identify_car",
+                budget,
+                model=model,
+                max_tokens=budget.max_tokens,
                 temperature=0.1,  # Lower temperature for more consistent responses
+                system=_cached_system(IDENTIFY_SYSTEM_PROMPT),
                 messages=[
                     {
                         "role": "user",
@@ -197,7 +492,14 @@ If no badge or logo is visible: {"make": null, "confidence": "low"}"""
             return result
             
         except json.JSONDecodeError as e:
+            if response.stop_reason == "max_tokens" and budget.max_tokens < LEGACY_IDENTIFY.max_tokens:
+                retry_budget = dataclasses.replace(
+                    budget, name=f"{budget.name}_retry", max_tokens=LEGACY_IDENTIFY.max_tokens
+                )
+                return await self._identify_with(model, base64_image, prompt, effective_make_hint, retry_budget)
             raise ValueError(f"Failed to parse API response as JSON: {e}. Raw response: {result_text!r}")
+        except CircuitOpenError:
+            raise
         except Exception as e:
             raise RuntimeError(f"Error calling Anthropic API: {e}")
     
@@ -77,6 +77,9 @@ car_identifications_table_creation_query = """CREATE TABLE IF NOT EXISTS car_ide
     year_estimate VARCHAR(20),
     car_rarity VARCHAR(20),
     user_modified BOOLEAN NOT NULL DEFAULT false,
+    image_phash VARCHAR(16),
+    has_derivatives BOOLEAN NOT NULL DEFAULT false,
+    image_status VARCHAR(20),
     latitude DOUBLE PRECISION,
     longitude DOUBLE PRECISION,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -146,7 +149,55 @@ user_badges_table_creation_query = """CREATE TABLE IF NOT EXISTS user_badges (
     CONSTRAINT uq_user_badge UNIQUE (user_id, badge_id)
     )"""
 
+identification_cache_table_creation_query = """CREATE TABLE IF NOT EXISTS identification_cache (
+    cache_key     VARCHAR(64)  PRIMARY KEY,
+    cache_version VARCHAR(200) NOT NULL,
+    make_result   JSON         NOT NULL,
+    result        JSON         NOT NULL,
+    created_at    TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    expires_at    TIMESTAMP WITH TIME ZONE NOT NULL
+    )"""
+
+identification_stage_usage_table_creation_query = """CREATE TABLE IF NOT EXISTS identification_stage_usage (
+    id                          SERIAL PRIMARY KEY,
+    identification_id           INTEGER REFERENCES car_identifications(id) ON DELETE SET NULL,
+    request_id                  VARCHAR(64),
+    user_id                     UUID REFERENCES users(id) ON DELETE SET NULL,
+    user_type                   VARCHAR(20),
+    stage                       VARCHAR(50)  NOT NULL,
+    model                       VARCHAR(100),
+    input_tokens                INTEGER      NOT NULL DEFAULT 0,
+    output_tokens               INTEGER      NOT NULL DEFAULT 0,
+    cache_read_input_tokens     INTEGER      NOT NULL DEFAULT 0,
+    cache_creation_input_tokens INTEGER      NOT NULL DEFAULT 0,
+    api_calls                   INTEGER      NOT NULL DEFAULT 1,
+    duration_ms                 DOUBLE PRECISION NOT NULL DEFAULT 0,
+    cost_usd                    DOUBLE PRECISION NOT NULL DEFAULT 0,
+    created_at                  TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )"""
+
+detection_cache_table_creation_query = """CREATE TABLE IF NOT EXISTS detection_cache (
+    cache_key     VARCHAR(64)  PRIMARY KEY,
+    operation     VARCHAR(50)  NOT NULL,
+    cache_version VARCHAR(500) NOT NULL,
+    response      JSON         NOT NULL,
+    created_at    TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    expires_at    TIMESTAMP WITH TIME ZONE NOT NULL
+    )"""
+
+pending_blurs_table_creation_query = """CREATE TABLE IF NOT EXISTS pending_blurs (
+    identification_id INTEGER PRIMARY KEY REFERENCES car_identifications(id) ON DELETE CASCADE,
+    image_data        BYTEA       NOT NULL,
+    content_type      VARCHAR(50) NOT NULL,
+    attempts          INTEGER     NOT NULL DEFAULT 0,
+    created_at        TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    )"""
+
 # Deleting tables if they already exist (including old boat-named tables from before rename)
+engine.delete_table('pending_blurs')
+engine.delete_table('detection_cache')
+engine.delete_table('identification_stage_usage')
+engine.delete_table('identification_cache')
 engine.delete_table('user_badges')
 engine.delete_table('badges')
 engine.delete_table('liked_boats')
@@ -203,6 +254,10 @@ engine.create_table(liked_cars_table_creation_query)
 engine.create_table(user_camera_stats_table_creation_query)
 engine.create_table(badges_table_creation_query)
 engine.create_table(user_badges_table_creation_query)
+engine.create_table(identification_cache_table_creation_query)
+engine.create_table(identification_stage_usage_table_creation_query)
+engine.create_table(detection_cache_table_creation_query)
+engine.create_table(pending_blurs_table_creation_query)
 
 # Create indexes for better performance using individual calls
 index_queries = [
@@ -220,6 +275,10 @@ index_queries = [
     "CREATE INDEX IF NOT EXISTS idx_liked_cars_user_id ON liked_cars (user_id);",
     "CREATE INDEX IF NOT EXISTS idx_liked_cars_car_id ON liked_cars (car_id);",
     "CREATE INDEX IF NOT EXISTS idx_car_search_vector ON car_identifications USING GIN (search_vector);",
+    "CREATE INDEX IF NOT EXISTS idx_identification_cache_expires_at ON identification_cache (expires_at);",
+    "CREATE INDEX IF NOT EXISTS idx_stage_usage_identification_id ON identification_stage_usage (identification_id);",
+    "CREATE INDEX IF NOT EXISTS idx_stage_usage_created_stage ON identification_stage_usage (created_at, stage);",
+    "CREATE INDEX IF NOT EXISTS idx_detection_cache_expires_at ON detection_cache (expires_at);",
 ]
 
 for index_query in index_queries:
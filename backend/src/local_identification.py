@@ -0,0 +1,137 @@
+"""
+local_identification.py
+Offline stand-in for AnthropicCarIdentifier, for load-testing the identify pipeline.
+
+Answers are deterministic per image (derived from its content hash) and follow the
+same schema as real identifications; latency is drawn from a log-normal distribution
+and a configurable fraction of calls fail, so throughput and tail behaviour of the
+whole FastAPI pipeline can be measured without network access or API credit.
+
+Select with IDENTIFIER_BACKEND=local.
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import random
+from typing import List, Optional, Union
+
+from image_identification import CarIdentificationResult, IdentifierBackend
+from utils.prepared_image import PreparedImage
+from utils.usage_tracker import StageUsage, record
+
+logger = logging.getLogger("carid.local_identifier")
+
+# (make, model, year, car_type, body_type, car_rarity)
+_CATALOG = [
+    ("Toyota", "Corolla", "2018-2022", "sedan", "sedan", "common"),
+    ("Honda", "Civic", "2016-2021", "sedan", "sedan", "common"),
+    ("Ford", "F-150", "2015-2020", "truck", "pickup", "common"),
+    ("Subaru", "Outback", "2015-2019", "wagon", "wagon", "uncommon"),
+    ("Mazda", "MX-5 Miata", "2016-2023", "convertible", "roadster", "uncommon"),
+    ("Porsche", "911", "2012-2019", "coupe", "coupe", "epic"),
+    ("Jaguar", "E-Type", "1961-1975", "coupe", "coupe", "rare"),
+    ("Bugatti", "Chiron", "2016-2022", "coupe", "coupe", "legendary"),
+]
+_CONFIDENCES = ("high", "high", "high", "medium", "low")
+
+
+class LocalCarIdentifier(IdentifierBackend):
+    def __init__(
+        self,
+        latency_p50_ms: Optional[float] = None,
+        latency_sigma: Optional[float] = None,
+        error_rate: Optional[float] = None,
+        not_car_rate: Optional[float] = None,
+        seed: Optional[int] = None,
+    ):
+        """
+        latency_p50_ms / latency_sigma: median and log-space spread of per-call latency
+        (sigma 0.5 gives p99 ≈ 3.2 × p50). error_rate: fraction of identify_car calls that
+        raise RuntimeError. not_car_rate: fraction of images answered with is_car=false.
+        """
+        self.latency_p50_ms = latency_p50_ms if latency_p50_ms is not None else float(
+            os.getenv("LOCAL_IDENTIFIER_LATENCY_P50_MS", 800)
+        )
+        self.latency_sigma = latency_sigma if latency_sigma is not None else float(
+            os.getenv("LOCAL_IDENTIFIER_LATENCY_SIGMA", 0.5)
+        )
+        self.error_rate = error_rate if error_rate is not None else float(
+            os.getenv("LOCAL_IDENTIFIER_ERROR_RATE", 0)
+        )
+        self.not_car_rate = not_car_rate if not_car_rate is not None else float(
+            os.getenv("LOCAL_IDENTIFIER_NOT_CAR_RATE", 0.05)
+        )
+        if seed is None and os.getenv("LOCAL_IDENTIFIER_SEED"):
+            seed = int(os.getenv("LOCAL_IDENTIFIER_SEED"))
+        self._random = random.Random(seed)
+
+    @property
+    def cache_version(self) -> str:
+        return "local|v1"
+
+    async def _simulate_call(self, stage: str, scale: float = 1.0) -> None:
+        delay_ms = self.latency_p50_ms * scale * math.exp(self._random.gauss(0, self.latency_sigma))
+        await asyncio.sleep(delay_ms / 1000)
+        # Zero-cost usage row so stage accounting can be exercised offline
+        record(StageUsage(stage=stage, model="local", duration_ms=delay_ms))
+
+    @staticmethod
+    def _digest(image_data: Union[bytes, PreparedImage]) -> int:
+        if isinstance(image_data, PreparedImage):
+            return int(image_data.content_hash[:16], 16)
+        return int(hashlib.sha256(image_data).hexdigest()[:16], 16)
+
+    def _is_car(self, digest: int) -> bool:
+        return (digest % 10_000) / 10_000 >= self.not_car_rate
+
+    async def find_make(self, image_data: Union[bytes, PreparedImage]) -> dict:
+        # Badge detection is the short call — model it as a fraction of full identification
+        await self._simulate_call("find_make", scale=0.4)
+        digest = self._digest(image_data)
+        if not self._is_car(digest) or digest % 3 == 0:
+            return {"make": None, "confidence": "low"}
+        return {"make": _CATALOG[(digest >> 8) % len(_CATALOG)][0], "confidence": "high"}
+
+    async def identify_car(
+        self,
+        image_data: Union[bytes, PreparedImage],
+        requested_fields: List[str] = None,
+        make_hint: Optional[str] = None,
+        make_confidence: Optional[str] = None,
+    ) -> CarIdentificationResult:
+        if requested_fields is None:
+            requested_fields = ['make', 'model', 'description', 'car_type']
+
+        await self._simulate_call("identify_car")
+        if self._random.random() < self.error_rate:
+            raise RuntimeError("Error calling local identifier: injected failure")
+
+        digest = self._digest(image_data)
+        if not self._is_car(digest):
+            return CarIdentificationResult(
+                is_car=False, confidence="high", description="a scene without a car (local stand-in)",
+            )
+
+        make, model, year, car_type, body_type, rarity = _CATALOG[(digest >> 8) % len(_CATALOG)]
+        values = {
+            "make": make,
+            "model": model,
+            "description": f"{year} {make} {model} {body_type}",
+            "year": year,
+            "length": f"{14 + digest % 5} ft",
+            "car_type": car_type,
+            "body_type": body_type,
+            "features": ["alloy wheels", "LED headlights"],
+            "car_rarity": rarity,
+        }
+        result = CarIdentificationResult(
+            is_car=True,
+            confidence=_CONFIDENCES[(digest >> 4) % len(_CONFIDENCES)],
+            **{field: value for field, value in values.items() if field in requested_fields},
+        )
+        effective_make_hint = make_hint if make_confidence in ("high", "medium") else None
+        result.make_source = "logo_detection" if effective_make_hint and result.make else "inferred"
+        return result
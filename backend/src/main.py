@@ -14,7 +14,8 @@ from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from utils.rate_limit import limiter
 from utils.logging_config import configure_logging
-from api.routes import auth, cars, users, images, car_id, car_statistics, camera_stats, badges, webhooks
+from utils.upload_intake import UploadSizeLimitMiddleware, max_request_bytes
+from api.routes import auth, cars, users, images, car_id, car_statistics, camera_stats, badges, webhooks, usage
 
 # Configure structured JSON logging before any loggers are created
 configure_logging()
@@ -31,6 +32,17 @@ app = FastAPI(
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+# Body caps for image uploads (innermost, so rejections are still logged and get CORS headers)
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    limits={
+        "/api/v1/cars/identify": max_request_bytes(),
+        "/api/v1/cars/identify/stream": max_request_bytes(),
+        "/api/v1/cars/identify/batch": max_request_bytes(car_id.BATCH_MAX_IMAGES),
+        "/api/v1/images/blur": max_request_bytes(),
+    },
+)
+
 # CORS – restrict to known origins in production
 allowed_origins = os.getenv("CORS_ORIGINS", "https://api.boatid.org").split(",")
 app.add_middleware(
@@ -103,12 +115,37 @@ app.include_router(users.router, prefix="/api/v1/users", tags=["users"])
 app.include_router(images.router, prefix="/api/v1/images", tags=["images"])
 app.include_router(camera_stats.router, prefix="/api/v1/camera-stats", tags=["camera-stats"])
 app.include_router(badges.router, prefix="/api/v1/badges", tags=["badges"])
+app.include_router(usage.router, prefix="/api/v1/usage", tags=["usage"])
 app.include_router(webhooks.router, prefix="/webhooks", tags=["webhooks"])
 
 @app.on_event("startup")
 async def on_startup():
+    import asyncio
     from utils.database import create_tables
+    from services.blur_retry_queue import get_blur_retry_queue
+    from utils.image_executor import get_image_executor
+    from utils.aws_clients import get_aws_clients
     create_tables()
+    # Shared, pooled AWS clients for every service (see utils.aws_clients)
+    app.state.aws_clients = get_aws_clients()
+    app.state.aws_clients.start()
+    # Spawn the image worker processes now so the first uploads do not pay for it
+    get_image_executor().start()
+    # Retries plate blurring (then the S3 upload) for images identified while Rekognition was down,
+    # including jobs queued before a restart or by other workers (they live in pending_blurs)
+    app.state.blur_retry_task = asyncio.create_task(get_blur_retry_queue().run())
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    blur_retry_task = getattr(app.state, "blur_retry_task", None)
+    if blur_retry_task is not None:
+        blur_retry_task.cancel()
+    await car_id.close_car_identifier()
+    from utils.image_executor import get_image_executor
+    get_image_executor().shutdown()
+    from utils.aws_clients import get_aws_clients
+    get_aws_clients().close()
 
 
 @app.get("/")
@@ -119,12 +156,18 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "carid-backend"}
 
+@app.get("/metrics")
+async def metrics_snapshot():
+    """In-process counters and latency percentiles for this worker."""
+    from utils import metrics
+    return metrics.snapshot()
+
 @app.get("/health/detailed")
 async def detailed_health_check():
     """Detailed health check including database connectivity"""
     from utils.database import SessionLocal
     from sqlalchemy import text
-    import boto3
+    from utils.aws_clients import get_aws_clients
     
     health_status = {
         "status": "healthy",
@@ -145,7 +188,7 @@ async def detailed_health_check():
     
     # S3 health check
     try:
-        s3_client = boto3.client('s3')
+        s3_client = get_aws_clients().s3
         bucket_name = os.getenv("AWS_BUCKET_NAME")
         s3_client.head_bucket(Bucket=bucket_name)
         health_status["checks"]["s3"] = "healthy"
@@ -153,6 +196,18 @@ async def detailed_health_check():
         health_status["checks"]["s3"] = "unhealthy"
         health_status["status"] = "degraded"
     
+    # Circuit breakers for external dependencies (per worker)
+    from utils.circuit_breaker import OPEN, snapshot_all
+    from services.blur_retry_queue import get_blur_retry_queue
+    breakers = snapshot_all()
+    health_status["checks"]["circuit_breakers"] = breakers
+    try:
+        health_status["checks"]["blur_retry_queue"] = get_blur_retry_queue().pending_count()
+    except Exception:
+        health_status["checks"]["blur_retry_queue"] = "unknown"
+    if any(breaker["state"] == OPEN for breaker in breakers.values()):
+        health_status["status"] = "degraded"
+
     # Anthropic API health check
     try:
         anthropic_key = os.getenv("ANTHROPIC_API_KEY")
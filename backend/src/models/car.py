@@ -3,6 +3,10 @@ from utils.database import Base  # ← Importing shared base from utils.database
 from sqlalchemy.dialects.postgresql import JSON, UUID, TSVECTOR
 from datetime import datetime
 
+# car_identifications.image_status values; NULL means the image was (or is being) uploaded
+IMAGE_BLUR_PENDING = "blur_pending"    # held back until plates can be blurred (services.blur_retry_queue)
+IMAGE_UNAVAILABLE = "unavailable"      # blurring never succeeded; the image was not stored
+
 class CarIdentification(Base):
     __tablename__ = "car_identifications"
     
@@ -28,6 +32,15 @@ class CarIdentification(Base):
     # Track whether user edited the identification data
     user_modified = Column(Boolean, default=False, nullable=False, server_default='false')
     
+    # 64-bit perceptual hash (dHash, hex) for near-duplicate lookups
+    image_phash = Column(String(16), nullable=True)
+
+    # WebP thumb/preview uploaded (utils.image_derivatives); until then list endpoints link the original
+    has_derivatives = Column(Boolean, default=False, nullable=False, server_default='false')
+
+    # Why there is no image at s3_image_key: IMAGE_BLUR_PENDING | IMAGE_UNAVAILABLE, NULL otherwise
+    image_status = Column(String(20), nullable=True)
+
     # Location data
     latitude = Column(Float, nullable=True)
     longitude = Column(Float, nullable=True)
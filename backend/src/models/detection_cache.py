@@ -0,0 +1,20 @@
+from sqlalchemy import Column, String, DateTime, func
+from sqlalchemy.dialects.postgresql import JSON
+from utils.database import Base
+
+
+class DetectionCacheEntry(Base):
+    """One Rekognition response (plate-relevant fields only) for one normalized image."""
+    __tablename__ = "detection_cache"
+
+    # sha256 of (normalized image bytes hash, operation, cache version)
+    cache_key = Column(String(64), primary_key=True)
+    operation = Column(String(50), nullable=False)         # detect_labels | detect_text
+    # Request parameters + payload resolution the entry was produced with
+    cache_version = Column(String(500), nullable=False)
+    response = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<DetectionCacheEntry(cache_key={self.cache_key[:12]}, operation={self.operation})>"
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, String, DateTime, func
+from sqlalchemy.dialects.postgresql import JSON
+from utils.database import Base
+
+
+class IdentificationCacheEntry(Base):
+    __tablename__ = "identification_cache"
+
+    # sha256 of (normalized image bytes, requested fields, cache version)
+    cache_key = Column(String(64), primary_key=True)
+    # Model names + prompt version the entry was produced with
+    cache_version = Column(String(200), nullable=False)
+    make_result = Column(JSON, nullable=False)      # find_make output
+    result = Column(JSON, nullable=False)           # CarIdentificationResult fields
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<IdentificationCacheEntry(cache_key={self.cache_key[:12]}, version={self.cache_version})>"
@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, func
+from sqlalchemy.dialects.postgresql import UUID
+from utils.database import Base
+
+
+class IdentificationStageUsage(Base):
+    """One external call (or the whole pipeline, stage="pipeline") made for one identify request."""
+    __tablename__ = "identification_stage_usage"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # Null when nothing was stored (not a car, store_results=false)
+    identification_id = Column(
+        Integer, ForeignKey("car_identifications.id", ondelete="SET NULL"), nullable=True, index=True
+    )
+    request_id = Column(String(64), nullable=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    user_type = Column(String(20), nullable=True)
+    stage = Column(String(50), nullable=False)
+    model = Column(String(100), nullable=True)
+    input_tokens = Column(Integer, nullable=False, default=0)
+    output_tokens = Column(Integer, nullable=False, default=0)
+    cache_read_input_tokens = Column(Integer, nullable=False, default=0)
+    cache_creation_input_tokens = Column(Integer, nullable=False, default=0)
+    api_calls = Column(Integer, nullable=False, default=1)
+    duration_ms = Column(Float, nullable=False, default=0)
+    cost_usd = Column(Float, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<IdentificationStageUsage(stage={self.stage}, model={self.model}, cost_usd={self.cost_usd})>"
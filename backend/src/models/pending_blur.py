@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, LargeBinary, DateTime, ForeignKey, func
+from utils.database import Base
+
+
+class PendingBlur(Base):
+    """An upload held back from S3 until its license plates can be blurred (services.blur_retry_queue)."""
+    __tablename__ = "pending_blurs"
+
+    identification_id = Column(
+        Integer, ForeignKey('car_identifications.id', ondelete='CASCADE'), primary_key=True,
+    )
+    # Raw upload bytes: they must never reach S3 before blurring
+    image_data = Column(LargeBinary, nullable=False)
+    content_type = Column(String(50), nullable=False)
+    attempts = Column(Integer, nullable=False, default=0, server_default='0')
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<PendingBlur(identification_id={self.identification_id}, attempts={self.attempts})>"
@@ -0,0 +1,205 @@
+"""
+blur_retry_queue.py
+Deferred license-plate blurring for uploads identified while Rekognition was unavailable.
+
+When the Rekognition circuit breaker is open, the identify pipeline stores the
+identification row right away but holds the image back: an unblurred photo must
+never reach S3. The row is inserted with image_status IMAGE_BLUR_PENDING and the
+raw upload is queued in the pending_blurs table. A background loop started with
+every worker retries blurring once the breaker lets calls through again, uploads
+the redacted image under the s3_key the row already points to, and only then
+deletes the job and clears image_status.
+
+Jobs live in the database, so they survive restarts and any worker can finish
+them; each job is claimed with SELECT ... FOR UPDATE SKIP LOCKED, so two workers
+never retry the same image. The queue is bounded; an image that cannot be queued
+or exhausts its attempts is given up on rather than stored unblurred: its row
+keeps the identification and gets image_status IMAGE_UNAVAILABLE.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import exists
+from sqlalchemy.orm import Session
+
+from image_identification import CarIdentificationResult
+from models.car import IMAGE_BLUR_PENDING, IMAGE_UNAVAILABLE, CarIdentification
+from models.pending_blur import PendingBlur
+from services.license_plate_service import BlurResult, LicensePlateBlurService
+from services.storage_service import CarStorageService
+from utils import metrics
+from utils.circuit_breaker import OPEN, get_breaker
+from utils.database import SessionLocal
+from utils.prepared_image import PreparedImage
+
+logger = logging.getLogger("carid.blur_retry")
+
+_DEFAULT_MAX_JOBS = 100
+_DEFAULT_INTERVAL_SECONDS = 15
+_DEFAULT_MAX_ATTEMPTS = 20
+# A pending row without a job this old lost it to a crash between insert and enqueue
+_ORPHAN_AGE = timedelta(minutes=5)
+
+
+class BlurRetryQueue:
+    def __init__(self):
+        self.max_jobs = int(os.getenv("BLUR_RETRY_QUEUE_SIZE", _DEFAULT_MAX_JOBS))
+        self.interval_seconds = float(os.getenv("BLUR_RETRY_INTERVAL_SECONDS", _DEFAULT_INTERVAL_SECONDS))
+        self.max_attempts = int(os.getenv("BLUR_RETRY_MAX_ATTEMPTS", _DEFAULT_MAX_ATTEMPTS))
+
+    def pending_count(self) -> int:
+        """Jobs waiting across all workers."""
+        db = SessionLocal()
+        try:
+            return db.query(PendingBlur).count()
+        finally:
+            db.close()
+
+    def enqueue(self, db: Session, identification_id: int, image_data: bytes, content_type: str) -> bool:
+        """
+        Queue the raw upload of a row inserted with IMAGE_BLUR_PENDING. Returns False when
+        the queue is full or the job could not be stored; the caller must then give up on
+        the image (IMAGE_UNAVAILABLE), never upload it unblurred.
+        """
+        try:
+            if db.query(PendingBlur).count() >= self.max_jobs:
+                metrics.increment("blur_retry.rejected")
+                logger.error("blur_retry_queue_full", extra={"identification_id": identification_id})
+                return False
+            db.add(PendingBlur(identification_id=identification_id, image_data=image_data, content_type=content_type))
+            db.commit()
+        except Exception as exc:
+            db.rollback()
+            metrics.increment("blur_retry.rejected")
+            logger.error("blur_retry_enqueue_failed: %s", exc, extra={"identification_id": identification_id})
+            return False
+        metrics.increment("blur_retry.enqueued")
+        return True
+
+    def recover(self) -> None:
+        """
+        Startup check: report the jobs left by earlier runs (the loop picks them up) and give
+        up on pending rows whose job was never stored.
+        """
+        db = SessionLocal()
+        try:
+            orphaned = (
+                db.query(CarIdentification)
+                .filter(
+                    CarIdentification.image_status == IMAGE_BLUR_PENDING,
+                    CarIdentification.created_at < datetime.utcnow() - _ORPHAN_AGE,
+                    ~exists().where(PendingBlur.identification_id == CarIdentification.id),
+                )
+                .update({"image_status": IMAGE_UNAVAILABLE}, synchronize_session=False)
+            )
+            db.commit()
+            logger.info("blur_retry_recovered", extra={"pending": db.query(PendingBlur).count(), "orphaned": orphaned})
+        except Exception as exc:
+            db.rollback()
+            logger.warning("Blur retry recovery failed: %s", exc)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _blurred(result: BlurResult) -> bool:
+        """True when Rekognition actually examined the image (plates found or confirmed absent)."""
+        return result.detection_method not in ("deferred", "error") and not result.error
+
+    @staticmethod
+    def _claim(db: Session) -> Optional[tuple]:
+        """Lock the oldest job no other worker holds: (job, row), or None when there is none."""
+        job = (
+            db.query(PendingBlur)
+            .order_by(PendingBlur.identification_id)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if job is None:
+            return None
+        record = db.query(CarIdentification).filter(CarIdentification.id == job.identification_id).one()
+        return job, record
+
+    def _settle(self, db: Session, job: PendingBlur, record: CarIdentification, error: Optional[str]) -> bool:
+        """Record one attempt and release the job's lock; returns whether the pass may go on."""
+        job.attempts += 1
+        log_extra = {"identification_id": record.id, "s3_key": record.s3_image_key, "attempts": job.attempts}
+        if error is not None and job.attempts < self.max_attempts:
+            db.commit()
+            return False
+
+        record.image_status = None if error is None else IMAGE_UNAVAILABLE
+        db.delete(job)
+        db.commit()
+        if error is None:
+            metrics.increment("blur_retry.completed")
+            logger.info("blur_retry_completed", extra=log_extra)
+        else:
+            metrics.increment("blur_retry.gave_up")
+            logger.error("blur_retry_gave_up", extra={**log_extra, "error": error})
+        return True
+
+    async def _retry_one(self, blur_service: LicensePlateBlurService, storage: CarStorageService) -> bool:
+        """Blur and upload the oldest unclaimed job; returns whether the pass should go on."""
+        db = SessionLocal()
+        try:
+            claimed = await asyncio.to_thread(self._claim, db)
+            if claimed is None:
+                return False
+            job, record = claimed
+            try:
+                blur_result = await blur_service.blur_license_plates(
+                    PreparedImage(job.image_data, job.content_type), job.content_type
+                )
+                if not self._blurred(blur_result):
+                    error = blur_result.error or "blurring deferred"
+                elif await asyncio.to_thread(
+                    storage.upload_image_to_s3,
+                    s3_key=record.s3_image_key,
+                    image_data=blur_result.image_data,
+                    image_filename=record.image_filename,
+                    result=CarIdentificationResult(is_car=record.is_car, confidence=record.confidence),
+                    identification_id=record.id,
+                ):
+                    error = None
+                else:
+                    error = "S3 upload failed"
+            except Exception as exc:
+                error = str(exc)
+            return await asyncio.to_thread(self._settle, db, job, record, error)
+        finally:
+            # Rolls back (releasing the lock) if the attempt could not be recorded
+            await asyncio.to_thread(db.close)
+
+    async def drain_once(self) -> None:
+        """Retry queued jobs, oldest first, until one fails again (Rekognition or S3 still down)."""
+        if get_breaker("rekognition").state == OPEN:
+            return
+
+        blur_service = LicensePlateBlurService(aws_region=os.getenv("AWS_REGION", "us-west-2"))
+        storage = CarStorageService(db_session=None, s3_bucket=os.getenv("AWS_BUCKET_NAME") or "carid-images")
+        while await self._retry_one(blur_service, storage):
+            pass
+
+    async def run(self) -> None:
+        """Background loop; started on app startup and cancelled on shutdown."""
+        await asyncio.to_thread(self.recover)
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.drain_once()
+            except Exception as exc:
+                logger.warning("Blur retry pass failed: %s", exc)
+
+
+_blur_retry_queue: Optional[BlurRetryQueue] = None
+
+
+def get_blur_retry_queue() -> BlurRetryQueue:
+    global _blur_retry_queue
+    if _blur_retry_queue is None:
+        _blur_retry_queue = BlurRetryQueue()
+    return _blur_retry_queue
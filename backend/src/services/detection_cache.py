@@ -0,0 +1,146 @@
+"""
+detection_cache.py
+Two-tier cache of Rekognition detections (detect_labels / detect_text) keyed by image
+content hash, so re-uploads, batch reprocessing and /images/blur diagnostics redo only
+the local pixel work.
+
+Tier 1 is a per-process LRU; tier 2 is the detection_cache Postgres table, shared by
+every worker. Keys include a cache version built from the request parameters and the
+payload resolution, so changing either misses old entries; expires_at bounds their
+lifetime (expired rows are ignored on read and overwritten on the next write).
+
+Only the fields the blur service reads are stored (labels with their instance boxes,
+text detections with their boxes). Detected text can include plate numbers, hence the
+shorter default TTL than the identification cache.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from models.detection_cache import DetectionCacheEntry
+from utils import metrics
+from utils.database import SessionLocal
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger("carid.detection_cache")
+
+_DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+_DEFAULT_MEMORY_SIZE = 2048
+
+
+def cache_version(operation: str, params: dict, max_side: int) -> str:
+    """Operation + request parameters (minus the image) + payload resolution."""
+    return f"{operation}:{json.dumps(params, sort_keys=True)}:max_side={max_side}"
+
+
+def trim_response(operation: str, response: dict) -> dict:
+    """Keep only what LicensePlateBlurService reads from a Rekognition response."""
+    if operation == "detect_labels":
+        return {"Labels": [
+            {
+                "Name": label.get("Name"),
+                "Confidence": label.get("Confidence", 0),
+                "Instances": [
+                    {"BoundingBox": instance["BoundingBox"]}
+                    for instance in label.get("Instances", []) if instance.get("BoundingBox")
+                ],
+            }
+            for label in response.get("Labels", [])
+        ]}
+    if operation == "detect_text":
+        return {"TextDetections": [
+            {
+                "Type": detection.get("Type"),
+                "DetectedText": detection.get("DetectedText", ""),
+                "Confidence": detection.get("Confidence", 0),
+                "Geometry": {"BoundingBox": detection.get("Geometry", {}).get("BoundingBox")},
+            }
+            for detection in response.get("TextDetections", [])
+        ]}
+    return response
+
+
+class DetectionCache:
+    def __init__(self, ttl_seconds: Optional[int] = None, memory_size: Optional[int] = None):
+        self.ttl_seconds = ttl_seconds or int(os.getenv("DETECTION_CACHE_TTL_SECONDS", _DEFAULT_TTL_SECONDS))
+        self.enabled = os.getenv("DETECTION_CACHE_ENABLED", "true").lower() != "false"
+        self._memory = TTLCache(
+            maxsize=memory_size or int(os.getenv("DETECTION_CACHE_SIZE", _DEFAULT_MEMORY_SIZE)),
+            ttl_seconds=self.ttl_seconds,
+        )
+
+    @staticmethod
+    def key_for(content_hash: str, operation: str, version: str) -> str:
+        return hashlib.sha256("|".join([content_hash, operation, version]).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return the cached response on a hit, checking memory then Postgres. Blocking."""
+        if not self.enabled:
+            return None
+
+        cached = self._memory.get(key)
+        if cached is not None:
+            metrics.increment("detection_cache.memory_hit")
+            return copy.deepcopy(cached)
+
+        db = SessionLocal()
+        try:
+            row = (
+                db.query(DetectionCacheEntry)
+                .filter(
+                    DetectionCacheEntry.cache_key == key,
+                    DetectionCacheEntry.expires_at > datetime.now(timezone.utc),
+                )
+                .first()
+            )
+        except Exception as exc:
+            logger.warning("Detection cache lookup failed: %s", exc)
+            row = None
+        finally:
+            db.close()
+
+        if row is None:
+            metrics.increment("detection_cache.miss")
+            return None
+
+        self._memory.put(key, copy.deepcopy(row.response))
+        metrics.increment("detection_cache.db_hit")
+        return row.response
+
+    def put(self, key: str, operation: str, version: str, response: dict) -> None:
+        """Store a fresh response in both tiers. Blocking; failures are logged, never raised."""
+        if not self.enabled:
+            return
+
+        self._memory.put(key, copy.deepcopy(response))
+        db = SessionLocal()
+        try:
+            db.merge(DetectionCacheEntry(
+                cache_key=key,
+                operation=operation,
+                cache_version=version,
+                response=response,
+                expires_at=datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds),
+            ))
+            db.commit()
+        except Exception as exc:
+            db.rollback()
+            logger.warning("Detection cache write failed: %s", exc)
+        finally:
+            db.close()
+
+
+_detection_cache: Optional[DetectionCache] = None
+
+
+def get_detection_cache() -> DetectionCache:
+    """Process-wide cache instance (the memory tier must be shared across requests)."""
+    global _detection_cache
+    if _detection_cache is None:
+        _detection_cache = DetectionCache()
+    return _detection_cache
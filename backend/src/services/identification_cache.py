@@ -0,0 +1,119 @@
+"""
+identification_cache.py
+Two-tier cache of Claude identification results keyed by image content hash.
+
+Tier 1 is a per-process LRU; tier 2 is the identification_cache Postgres table,
+shared by every worker. Keys include the identifier's cache_version, so changing
+a model or prompt naturally misses old entries; expires_at bounds their lifetime
+(expired rows are ignored on read and overwritten on the next write).
+"""
+
+import copy
+import dataclasses
+import hashlib
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from image_identification import CarIdentificationResult
+from models.identification_cache import IdentificationCacheEntry
+from utils import metrics
+from utils.prepared_image import PreparedImage
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger("carid.identification_cache")
+
+_DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+_DEFAULT_MEMORY_SIZE = 1024
+
+CachedIdentification = Tuple[dict, CarIdentificationResult]
+
+
+class IdentificationCache:
+    def __init__(self, ttl_seconds: Optional[int] = None, memory_size: Optional[int] = None):
+        self.ttl_seconds = ttl_seconds or int(os.getenv("IDENTIFICATION_CACHE_TTL_SECONDS", _DEFAULT_TTL_SECONDS))
+        self.enabled = os.getenv("IDENTIFICATION_CACHE_ENABLED", "true").lower() != "false"
+        self._memory = TTLCache(
+            maxsize=memory_size or int(os.getenv("IDENTIFICATION_CACHE_SIZE", _DEFAULT_MEMORY_SIZE)),
+            ttl_seconds=self.ttl_seconds,
+        )
+
+    @staticmethod
+    def key_for(image: PreparedImage, requested_fields: List[str], cache_version: str) -> str:
+        """Content hash + requested fields (order-insensitive) + model/prompt version."""
+        material = "|".join([image.content_hash, ",".join(sorted(requested_fields)), cache_version])
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def get(self, db: Session, key: str) -> Optional[CachedIdentification]:
+        """Return (make_result, result) on a hit, checking memory then Postgres."""
+        if not self.enabled:
+            return None
+
+        cached = self._memory.get(key)
+        if cached is not None:
+            metrics.increment("identification_cache.memory_hit")
+            # Callers may annotate the result; never hand out the instance held by the LRU
+            return copy.deepcopy(cached)
+
+        try:
+            row = (
+                db.query(IdentificationCacheEntry)
+                .filter(
+                    IdentificationCacheEntry.cache_key == key,
+                    IdentificationCacheEntry.expires_at > datetime.now(timezone.utc),
+                )
+                .first()
+            )
+        except Exception as exc:
+            db.rollback()
+            logger.warning("Identification cache lookup failed: %s", exc)
+            row = None
+
+        if row is None:
+            metrics.increment("identification_cache.miss")
+            return None
+
+        cached = (dict(row.make_result), CarIdentificationResult(**row.result))
+        self._memory.put(key, copy.deepcopy(cached))
+        metrics.increment("identification_cache.db_hit")
+        return cached
+
+    def put(
+        self,
+        db: Session,
+        key: str,
+        cache_version: str,
+        make_result: dict,
+        result: CarIdentificationResult,
+    ) -> None:
+        """Store a fresh identification in both tiers. Failures are logged, never raised."""
+        if not self.enabled:
+            return
+
+        self._memory.put(key, copy.deepcopy((make_result, result)))
+        try:
+            db.merge(IdentificationCacheEntry(
+                cache_key=key,
+                cache_version=cache_version,
+                make_result=make_result,
+                result=dataclasses.asdict(result),
+                expires_at=datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds),
+            ))
+            db.commit()
+        except Exception as exc:
+            db.rollback()
+            logger.warning("Identification cache write failed: %s", exc)
+
+
+_identification_cache: Optional[IdentificationCache] = None
+
+
+def get_identification_cache() -> IdentificationCache:
+    """Process-wide cache instance (the memory tier must be shared across requests)."""
+    global _identification_cache
+    if _identification_cache is None:
+        _identification_cache = IdentificationCache()
+    return _identification_cache
@@ -1,21 +1,32 @@
-import io
+import asyncio
 import logging
 import os
 import re
+import time
 from dataclasses import dataclass, field
-from typing import List
+from typing import List, Optional, Union
 
-import boto3
 from botocore.exceptions import ClientError
-from PIL import Image, ImageFilter
+from services.detection_cache import cache_version, get_detection_cache, trim_response
+from utils.aws_clients import get_aws_clients
+from utils.circuit_breaker import CircuitOpenError, get_breaker
+from utils import image_ops
+from utils.hedging import get_hedge_policy
+from utils.image_executor import get_image_executor
+from utils.prepared_image import PreparedImage
+from utils.usage_tracker import StageUsage, record, rekognition_cost
 
 logger = logging.getLogger("carid.license_plate")
 
 _DEFAULT_BLUR_RADIUS = 20
 # Rekognition inline-bytes hard limit is 5 MB
 _REKOGNITION_MAX_BYTES = 5 * 1024 * 1024
+# Longest side sent to Rekognition; plates stay legible at 1920 px and boxes are relative anyway
+_DEFAULT_REKOGNITION_MAX_SIDE = 1920
 # Rekognition may use either label name depending on the model version/region
 _LICENSE_PLATE_LABEL_NAMES = {"License Plate", "Vehicle Registration Plate"}
+# detect_labels returns only these instead of every label in the scene (smaller, faster responses)
+_DETECT_LABELS_SETTINGS = {"GeneralLabels": {"LabelInclusionFilters": sorted(_LICENSE_PLATE_LABEL_NAMES)}}
 # Regex that matches typical license plate text: 4-10 uppercase alphanumeric chars (spaces allowed)
 _PLATE_TEXT_RE = re.compile(r'^[A-Z0-9][A-Z0-9 \-\.]{2,9}[A-Z0-9]$')
 
@@ -24,57 +35,106 @@ _PLATE_TEXT_RE = re.compile(r'^[A-Z0-9][A-Z0-9 \-\.]{2,9}[A-Z0-9]$')
 class BlurResult:
     image_data: bytes
     plates_detected: int
-    detection_method: str          # "detect_labels", "detect_text_fallback", "none", "error"
+    detection_method: str          # "detect_labels", "detect_text_fallback", "none", "error", "deferred"
     all_labels: List[str] = field(default_factory=list)   # "Name:Confidence" from detect_labels
     text_lines_found: List[str] = field(default_factory=list)  # LINE texts from detect_text fallback
     error: str = ""
 
 
+def _is_rekognition_failure(exc: Exception) -> bool:
+    """Client-side rejections (bad image, bad parameters) do not count against Rekognition's health."""
+    if isinstance(exc, ClientError):
+        status = exc.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 500)
+        code = exc.response.get("Error", {}).get("Code", "")
+        return status >= 500 or code in ("ThrottlingException", "ProvisionedThroughputExceededException")
+    return True
+
+
 class LicensePlateBlurService:
-    def __init__(self, aws_region: str):
-        self._rekognition = boto3.client("rekognition", region_name=aws_region)
+    def __init__(self, aws_region: Optional[str] = None, rekognition_client=None):
+        # Shared client from the app-wide registry, with Rekognition's bounded timeouts and retries
+        self._rekognition = rekognition_client or get_aws_clients().client("rekognition", region=aws_region)
         self._blur_radius = int(os.getenv("BLUR_RADIUS", _DEFAULT_BLUR_RADIUS))
+        # "blur" (Gaussian-like, BLUR_RADIUS = sigma) or "pixelate" (BLUR_RADIUS = block size)
+        self._redaction_mode = os.getenv("PLATE_REDACTION_MODE", "blur").lower()
+        self._rekognition_max_side = int(os.getenv("REKOGNITION_MAX_SIDE", _DEFAULT_REKOGNITION_MAX_SIDE))
 
-    def _prepare_for_rekognition(self, image_data: bytes) -> bytes:
+    async def _call_rekognition(self, operation: str, **kwargs) -> dict:
         """
-        Rekognition has a 5 MB inline-bytes limit.
-        If the image exceeds this, compress it to JPEG at progressively lower
-        quality until it fits, then return the compressed bytes.
-        The original image_data is never modified.
+        Run a Rekognition API call in a worker thread, hedged against tail latency.
+        boto3 calls cannot be interrupted, so a losing attempt finishes in its thread
+        and its response is discarded. Raises CircuitOpenError while the breaker is open.
+        Successful calls are added to the request's usage tracker.
         """
-        if len(image_data) <= _REKOGNITION_MAX_BYTES:
-            return image_data
-
-        img = Image.open(io.BytesIO(image_data)).convert("RGB")
-        for quality in (85, 70, 55, 40):
-            buf = io.BytesIO()
-            img.save(buf, format="JPEG", quality=quality)
-            compressed = buf.getvalue()
-            if len(compressed) <= _REKOGNITION_MAX_BYTES:
-                logger.debug(
-                    "Image compressed to %d bytes (quality=%d) for Rekognition",
-                    len(compressed),
-                    quality,
-                )
-                return compressed
+        method = getattr(self._rekognition, operation)
+        policy = get_hedge_policy(f"rekognition.{operation}")
+        t0 = time.perf_counter()
+        response = await get_breaker("rekognition").call_async(
+            lambda: policy.run(lambda: asyncio.to_thread(method, **kwargs)),
+            is_failure=_is_rekognition_failure,
+        )
+        record(StageUsage(
+            stage=f"rekognition.{operation}",
+            duration_ms=(time.perf_counter() - t0) * 1000,
+            cost_usd=rekognition_cost(),
+        ))
+        return response
+
+    async def _prepare_for_rekognition(self, image: PreparedImage) -> bytes:
+        """
+        Bytes to send to Rekognition, which gains nothing from more than ~2 MP and caps
+        inline images at 5 MB. An upload already within REKOGNITION_MAX_SIDE and the byte
+        limit is sent as-is; anything larger is downscaled straight to that side and encoded
+        once (image_ops.rekognition_payload, in the image process pool). Memoized on the
+        PreparedImage, so the detect_text fallback and blur_with_known_text reuse it.
+        """
+        await image.prepare()
+        if max(image.header.size) <= self._rekognition_max_side and len(image.upright_bytes) <= _REKOGNITION_MAX_BYTES:
+            return image.upright_bytes
+        return await image.derive_async(
+            "rekognition_bytes", image_ops.rekognition_payload,
+            image.original, self._rekognition_max_side, _REKOGNITION_MAX_BYTES,
+        )
 
-        # Last resort: halve the resolution
-        w, h = img.size
-        img = img.resize((w // 2, h // 2), Image.LANCZOS)
-        buf = io.BytesIO()
-        img.save(buf, format="JPEG", quality=70)
-        return buf.getvalue()
+    async def _detect(self, image: PreparedImage, rekognition_bytes: bytes, operation: str, **params) -> dict:
+        """
+        Rekognition operation(Image=rekognition_bytes, **params) for this image, made at most
+        once per PreparedImage (so blur_with_known_text reuses blur_license_plates' detect_text)
+        and cached across requests by content hash (see services.detection_cache).
+        """
+        return await image.memoize_async(
+            f"rekognition.{operation}",
+            lambda: self._cached_detection(image, rekognition_bytes, operation, params),
+        )
 
-    def _boxes_from_detect_labels(self, rekognition_bytes: bytes) -> tuple[list, list, str]:
+    async def _cached_detection(self, image: PreparedImage, rekognition_bytes: bytes, operation: str, params: dict) -> dict:
+        cache = get_detection_cache()
+        version = cache_version(operation, params, self._rekognition_max_side)
+        key = cache.key_for(image.content_hash, operation, version)
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            return cached
+        response = trim_response(
+            operation, await self._call_rekognition(operation, Image={"Bytes": rekognition_bytes}, **params),
+        )
+        await asyncio.to_thread(cache.put, key, operation, version, response)
+        return response
+
+    async def _boxes_from_detect_labels(self, image: PreparedImage, rekognition_bytes: bytes) -> tuple[list, list, str]:
         """
-        Call detect_labels and return (bounding_boxes, all_label_strings, error_msg).
+        Call detect_labels (restricted to the license-plate labels) and return
+        (bounding_boxes, all_label_strings, error_msg).
         Confidence threshold intentionally low (20) to maximise recall.
         """
         try:
-            response = self._rekognition.detect_labels(
-                Image={"Bytes": rekognition_bytes},
+            response = await self._detect(
+                image, rekognition_bytes, "detect_labels",
                 MinConfidence=20,
+                Features=["GENERAL_LABELS"],
+                Settings=_DETECT_LABELS_SETTINGS,
             )
+        except CircuitOpenError:
+            raise
         except ClientError as exc:
             return [], [], f"detect_labels ClientError: {exc}"
         except Exception as exc:
@@ -95,16 +155,16 @@ class LicensePlateBlurService:
 
         return bounding_boxes, all_labels, ""
 
-    def _boxes_from_detect_text(self, rekognition_bytes: bytes) -> tuple[list, list, str]:
+    async def _boxes_from_detect_text(self, image: PreparedImage, rekognition_bytes: bytes) -> tuple[list, list, str]:
         """
         Fallback: call detect_text and return bounding boxes for LINE detections
         that match a license-plate-like alphanumeric pattern.
         Also returns the raw LINE texts found for diagnostic purposes.
         """
         try:
-            response = self._rekognition.detect_text(
-                Image={"Bytes": rekognition_bytes},
-            )
+            response = await self._detect(image, rekognition_bytes, "detect_text")
+        except CircuitOpenError:
+            raise
         except ClientError as exc:
             return [], [], f"detect_text ClientError: {exc}"
         except Exception as exc:
@@ -124,38 +184,61 @@ class LicensePlateBlurService:
 
         return bounding_boxes, line_texts, ""
 
-    def _apply_blur(self, image_data: bytes, bounding_boxes: list, content_type: str) -> bytes:
-        """Apply Gaussian blur to all bounding box regions on the original full-res image."""
-        img = Image.open(io.BytesIO(image_data)).convert("RGBA")
-        width, height = img.size
-
-        for box in bounding_boxes:
-            left = max(0, int(box["Left"] * width))
-            top = max(0, int(box["Top"] * height))
-            right = min(width, int((box["Left"] + box["Width"]) * width))
-            bottom = min(height, int((box["Top"] + box["Height"]) * height))
-
-            region = img.crop((left, top, right, bottom))
-            blurred = region.filter(ImageFilter.GaussianBlur(radius=self._blur_radius))
-            img.paste(blurred, (left, top))
-
+    async def _apply_blur(self, image: PreparedImage, bounding_boxes: list, content_type: str) -> bytes:
+        """
+        Redact all bounding box regions (merged, region-only; see utils.region_blur) on the
+        full-res upright pixels and encode once, in the image process pool, and record the
+        result as the image's final output.
+        """
         output_format = "JPEG" if content_type in ("image/jpeg", "image/jpg") else "PNG"
-        img = img.convert("RGB" if output_format == "JPEG" else "RGBA")
-        buf = io.BytesIO()
-        img.save(buf, format=output_format)
-        return buf.getvalue()
+        # Blur is always redrawn from the clean original, so keep earlier passes' boxes
+        applied_boxes = image.derive("blurred_boxes", list)
+        applied_boxes.extend(bounding_boxes)
+        blurred = await get_image_executor().run(
+            image_ops.blur_regions, image.original, list(applied_boxes), output_format,
+            self._blur_radius, self._redaction_mode,
+        )
+        image.set_output(blurred)
+        return image.output_bytes
 
     async def blur_license_plates(
-        self, image_data: bytes, content_type: str = "image/jpeg"
+        self, image_data: Union[bytes, PreparedImage], content_type: str = "image/jpeg"
     ) -> BlurResult:
         """
         Detect license plates and blur them. Returns a BlurResult with full diagnostics.
-        Falls back to detect_text when detect_labels finds nothing.
+        detect_labels and detect_text run concurrently; text matches are used only when
+        detect_labels finds no plate. Detections of an image seen before come from the
+        detection cache, leaving only the local redaction work.
+        Accepts raw bytes or a PreparedImage shared with the rest of the pipeline.
+
+        While the Rekognition circuit breaker is open, returns immediately with
+        detection_method="deferred": the image has NOT been checked for plates and
+        must not be stored until blurring is retried (see services.blur_retry_queue).
         """
-        rekognition_bytes = self._prepare_for_rekognition(image_data)
+        image = PreparedImage.wrap(image_data, content_type)
+        try:
+            return await self._detect_and_blur(image, content_type)
+        except CircuitOpenError as exc:
+            return BlurResult(
+                image_data=image.upright_bytes, plates_detected=0,
+                detection_method="deferred", error=str(exc),
+            )
+
+    async def _detect_and_blur(
+        self, image_data: Union[bytes, PreparedImage], content_type: str
+    ) -> BlurResult:
+        image = PreparedImage.wrap(image_data, content_type)
+        rekognition_bytes = await self._prepare_for_rekognition(image)
+        image_data = image.upright_bytes
+
+        # One Rekognition round: detect_text is requested alongside detect_labels rather than
+        # after it, so the fallback (and a later blur_with_known_text) costs no extra latency
+        (boxes, all_labels, err), (text_boxes, line_texts, text_err) = await asyncio.gather(
+            self._boxes_from_detect_labels(image, rekognition_bytes),
+            self._boxes_from_detect_text(image, rekognition_bytes),
+        )
 
         # --- Primary: detect_labels ---
-        boxes, all_labels, err = self._boxes_from_detect_labels(rekognition_bytes)
         logger.info("detect_labels returned %d label(s): %s", len(all_labels), all_labels)
 
         if err:
@@ -163,7 +246,7 @@ class LicensePlateBlurService:
 
         if boxes:
             try:
-                blurred = self._apply_blur(image_data, boxes, content_type)
+                blurred = await self._apply_blur(image, boxes, content_type)
                 return BlurResult(
                     image_data=blurred,
                     plates_detected=len(boxes),
@@ -179,10 +262,9 @@ class LicensePlateBlurService:
 
         # --- Fallback: detect_text ---
         logger.info(
-            "detect_labels found no plate boxes (all labels: %s) — trying detect_text fallback",
+            "detect_labels found no plate boxes (all labels: %s) — using detect_text fallback",
             all_labels,
         )
-        text_boxes, line_texts, text_err = self._boxes_from_detect_text(rekognition_bytes)
         logger.info("detect_text LINE results: %s", line_texts)
 
         if text_err:
@@ -190,7 +272,7 @@ class LicensePlateBlurService:
 
         if text_boxes:
             try:
-                blurred = self._apply_blur(image_data, text_boxes, content_type)
+                blurred = await self._apply_blur(image, text_boxes, content_type)
                 return BlurResult(
                     image_data=blurred,
                     plates_detected=len(text_boxes),
@@ -216,16 +298,20 @@ class LicensePlateBlurService:
         )
 
     async def blur_with_known_text(
-        self, image_data: bytes, plate_texts: list
+        self, image_data: Union[bytes, PreparedImage], plate_texts: list
     ) -> BlurResult:
         """
         Targeted fallback: use Rekognition detect_text to locate and blur regions
         that match known plate text strings identified by Claude.
         Matches are normalised (spaces/dashes stripped) before comparison.
+        Given the PreparedImage already passed to blur_license_plates (or an image whose
+        detections are cached), no Rekognition call is made.
         """
-        rekognition_bytes = self._prepare_for_rekognition(image_data)
+        image = PreparedImage.wrap(image_data)
+        rekognition_bytes = await self._prepare_for_rekognition(image)
+        image_data = image.output_bytes
         try:
-            response = self._rekognition.detect_text(Image={"Bytes": rekognition_bytes})
+            response = await self._detect(image, rekognition_bytes, "detect_text")
         except Exception as exc:
             return BlurResult(
                 image_data=image_data, plates_detected=0,
@@ -249,7 +335,7 @@ class LicensePlateBlurService:
 
         if bounding_boxes:
             try:
-                blurred = self._apply_blur(image_data, bounding_boxes, "image/jpeg")
+                blurred = await self._apply_blur(image, bounding_boxes, image.content_type)
                 return BlurResult(
                     image_data=blurred,
                     plates_detected=len(bounding_boxes),
@@ -0,0 +1,177 @@
+"""
+near_duplicate_index.py
+In-memory multi-index Hamming lookup over the perceptual hashes of stored identifications.
+
+Finds earlier uploads of the same car (burst shots, recompressed re-uploads)
+within a small Hamming distance in well under a millisecond, so the identify
+pipeline can reuse or pre-fill their results instead of calling Claude again.
+
+Each worker keeps its own index. It is loaded from car_identifications on first
+use and then topped up incrementally (rows with a higher id) every few minutes,
+which picks up identifications stored by other workers.
+"""
+
+import logging
+import os
+import threading
+import time
+from functools import lru_cache
+from itertools import combinations
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from models.car import CarIdentification
+from utils import metrics
+from utils.perceptual_hash import from_hex, hamming_distance
+
+logger = logging.getLogger("carid.near_duplicate")
+
+_DEFAULT_MAX_DISTANCE = 6
+_DEFAULT_REFRESH_SECONDS = 300
+
+# (identification_id, user_id) pairs sharing one exact hash
+_Entry = Tuple[int, Optional[UUID]]
+
+
+class MultiIndexHashTable:
+    """
+    Multi-index hashing over 64-bit hashes: four tables, one per 16-bit chunk.
+
+    By the pigeonhole principle, two hashes within distance r agree to within
+    r // 4 bits on at least one chunk, so a query only probes each table with its
+    chunk flipped in up to r // 4 bits and verifies the few candidates it finds.
+    """
+
+    _CHUNKS = 4
+    _CHUNK_BITS = 16
+    _CHUNK_MASK = (1 << _CHUNK_BITS) - 1
+
+    def __init__(self):
+        self._tables: List[Dict[int, List[Tuple[int, _Entry]]]] = [{} for _ in range(self._CHUNKS)]
+        self.size = 0
+
+    def _chunks(self, value: int) -> List[int]:
+        return [(value >> (i * self._CHUNK_BITS)) & self._CHUNK_MASK for i in range(self._CHUNKS)]
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _flip_masks(cls, radius: int) -> Tuple[int, ...]:
+        """XOR masks flipping every combination of up to radius bits within a chunk."""
+        masks = [0]
+        for bits in range(1, radius + 1):
+            for positions in combinations(range(cls._CHUNK_BITS), bits):
+                masks.append(sum(1 << position for position in positions))
+        return tuple(masks)
+
+    def add(self, value: int, entry: _Entry) -> None:
+        self.size += 1
+        for table, chunk in zip(self._tables, self._chunks(value)):
+            table.setdefault(chunk, []).append((value, entry))
+
+    def search(self, value: int, max_distance: int) -> List[Tuple[int, _Entry]]:
+        """All (distance, entry) pairs within max_distance, nearest first."""
+        radius = max_distance // self._CHUNKS
+        seen = set()
+        matches = []
+        for table, chunk in zip(self._tables, self._chunks(value)):
+            for mask in self._flip_masks(radius):
+                for candidate, entry in table.get(chunk ^ mask, ()):
+                    if entry in seen:
+                        continue
+                    seen.add(entry)
+                    distance = hamming_distance(value, candidate)
+                    if distance <= max_distance:
+                        matches.append((distance, entry))
+        matches.sort(key=lambda match: match[0])
+        return matches
+
+
+class NearDuplicateIndex:
+    def __init__(self):
+        # "user" = only the uploader's own cars, "global" = any stored car, "off" = disabled
+        self.scope = os.getenv("NEAR_DUPLICATE_SCOPE", "user").lower()
+        self.max_distance = int(os.getenv("NEAR_DUPLICATE_MAX_DISTANCE", _DEFAULT_MAX_DISTANCE))
+        self.refresh_seconds = int(os.getenv("NEAR_DUPLICATE_REFRESH_SECONDS", _DEFAULT_REFRESH_SECONDS))
+        self._table = MultiIndexHashTable()
+        # Highest id read from the database; only _refresh advances it, so rows other workers
+        # insert below an id this worker stored are still picked up
+        self._max_loaded_id = 0
+        # Ids indexed by add() that _refresh has not read back yet (skipped when it does)
+        self._added_ids: set = set()
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.scope in ("user", "global")
+
+    def _refresh(self, db: Session) -> None:
+        """Load rows added since the last refresh (all rows on first call)."""
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.refresh_seconds:
+            return
+        rows = (
+            db.query(CarIdentification.id, CarIdentification.user_id, CarIdentification.image_phash)
+            .filter(
+                CarIdentification.id > self._max_loaded_id,
+                CarIdentification.is_car.is_(True),
+                CarIdentification.image_phash.isnot(None),
+            )
+            .all()
+        )
+        with self._lock:
+            for row_id, user_id, phash in rows:
+                if row_id not in self._added_ids:
+                    self._table.add(from_hex(phash), (row_id, user_id))
+                self._max_loaded_id = max(self._max_loaded_id, row_id)
+            self._added_ids = {row_id for row_id in self._added_ids if row_id > self._max_loaded_id}
+            self._loaded_at = time.monotonic()
+        if rows:
+            logger.info("near_duplicate_index_refreshed", extra={"added": len(rows), "size": self._table.size})
+
+    def add(self, identification_id: int, user_id: Optional[UUID], phash: int) -> None:
+        """Index a freshly stored identification so later uploads can match it immediately."""
+        with self._lock:
+            self._table.add(phash, (identification_id, user_id))
+            self._added_ids.add(identification_id)
+
+    def find(self, db: Session, phash: int, user_id: Optional[UUID]) -> Optional[CarIdentification]:
+        """
+        Return the nearest stored identification within max_distance, honouring the scope.
+        Rows deleted since they were indexed are skipped.
+        """
+        if not self.enabled:
+            return None
+        try:
+            self._refresh(db)
+        except Exception as exc:
+            db.rollback()
+            logger.warning("Near-duplicate index refresh failed: %s", exc)
+
+        t0 = time.perf_counter()
+        with self._lock:
+            matches = self._table.search(phash, self.max_distance)
+        metrics.observe("near_duplicate.lookup", (time.perf_counter() - t0) * 1000)
+
+        for distance, (identification_id, owner_id) in matches:
+            if self.scope == "user" and owner_id != user_id:
+                continue
+            record = db.query(CarIdentification).filter(CarIdentification.id == identification_id).first()
+            if record is not None:
+                logger.info(
+                    "near_duplicate_found",
+                    extra={"identification_id": identification_id, "distance": distance},
+                )
+                return record
+        return None
+
+
+_near_duplicate_index: Optional[NearDuplicateIndex] = None
+
+
+def get_near_duplicate_index() -> NearDuplicateIndex:
+    global _near_duplicate_index
+    if _near_duplicate_index is None:
+        _near_duplicate_index = NearDuplicateIndex()
+    return _near_duplicate_index
@@ -1,16 +1,16 @@
-import boto3
 from botocore.exceptions import ClientError
 import uuid
 import os
 from typing import Optional
 from dotenv import load_dotenv
+from utils.aws_clients import get_aws_clients
 
 # Load environment variables
 load_dotenv()
 
 class S3Service:
-    def __init__(self):
-        self.s3_client = boto3.client('s3')
+    def __init__(self, s3_client=None):
+        self.s3_client = s3_client or get_aws_clients().s3
         self.bucket_name = os.getenv('S3_BUCKET_NAME')
         
         if not self.bucket_name:
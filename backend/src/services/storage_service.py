@@ -1,4 +1,3 @@
-import boto3
 import json
 import uuid
 import logging
@@ -10,30 +9,29 @@ from sqlalchemy.orm import Session
 from models.car import CarIdentification
 from models.car_details import CarDetails
 from image_identification import CarIdentificationResult
+from utils.aws_clients import get_aws_clients
+from utils.circuit_breaker import CircuitOpenError, get_breaker
+from utils.database import SessionLocal
+from utils.image_derivatives import (
+    DERIVATIVE_CACHE_CONTROL,
+    DERIVATIVE_CONTENT_TYPE,
+    derivative_key,
+    render_derivatives,
+)
+from utils.image_executor import get_image_executor
 from typing import List, Optional, Dict
 from uuid import UUID
 
 logger = logging.getLogger("carid.storage")
 
+_CAR_API_TIMEOUT_SECONDS = float(os.getenv("CAR_API_TIMEOUT_SECONDS", 5))
+
 class CarStorageService:
-    def __init__(self, db_session: Session, s3_bucket: str, aws_region: str = None):
+    def __init__(self, db_session: Session, s3_bucket: str, aws_region: str = None, s3_client=None):
         self.db = db_session
-        
-        # Use provided region, env var, or default to us-west-2
-        region = aws_region or os.getenv('AWS_REGION', os.getenv('AWS_DEFAULT_REGION', 'us-west-2'))
-        
-        # Initialize S3 client with better error handling
-        try:
-            self.s3_client = boto3.client('s3', region_name=region)
-            self.bucket = s3_bucket
-            
-            # Test S3 connection by checking if bucket exists
-            self.s3_client.head_bucket(Bucket=s3_bucket)
-        except Exception as e:
-            print(f"Warning: S3 configuration issue: {e}")
-            # Still create client for graceful degradation
-            self.s3_client = boto3.client('s3', region_name=region)
-            self.bucket = s3_bucket
+        self.bucket = s3_bucket
+        # Shared client from the app-wide registry (utils.aws_clients); cheap to construct per request
+        self.s3_client = s3_client or get_aws_clients().client('s3', region=aws_region)
     
     async def store_identification_result(
         self,
@@ -63,10 +61,11 @@ class CarStorageService:
             image_data=image_data,
             image_filename=image_filename,
             result=result,
+            identification_id=identification_id,
         )
         return identification_id
 
-    def insert_identification_record(
+    def _build_identification_record(
         self,
         s3_key: str,
         image_filename: str,
@@ -74,8 +73,9 @@ class CarStorageService:
         user_id: Optional[UUID] = None,
         latitude: Optional[float] = None,
         longitude: Optional[float] = None,
-    ) -> int:
-        """Insert identification metadata into the DB only (no S3). Returns the new record id."""
+        image_phash: Optional[str] = None,
+        image_status: Optional[str] = None,
+    ) -> CarIdentification:
         identification_json = {
             'is_car': result.is_car,
             'make': result.make,
@@ -89,7 +89,7 @@ class CarStorageService:
             'features': result.features or [],
             'car_rarity': result.car_rarity,
         }
-        db_record = CarIdentification(
+        return CarIdentification(
             user_id=user_id,
             image_filename=image_filename,
             s3_image_key=s3_key,
@@ -101,8 +101,33 @@ class CarStorageService:
             car_type=result.car_type,
             year_estimate=result.year,
             car_rarity=result.car_rarity,
+            image_phash=image_phash,
+            image_status=image_status,
+            latitude=latitude,
+            longitude=longitude,
+        )
+
+    def insert_identification_record(
+        self,
+        s3_key: str,
+        image_filename: str,
+        result: CarIdentificationResult,
+        user_id: Optional[UUID] = None,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+        image_phash: Optional[str] = None,
+        image_status: Optional[str] = None,
+    ) -> int:
+        """Insert identification metadata into the DB only (no S3). Returns the new record id."""
+        db_record = self._build_identification_record(
+            s3_key=s3_key,
+            image_filename=image_filename,
+            result=result,
+            user_id=user_id,
             latitude=latitude,
             longitude=longitude,
+            image_phash=image_phash,
+            image_status=image_status,
         )
         try:
             self.db.add(db_record)
@@ -112,14 +137,55 @@ class CarStorageService:
             self.db.rollback()
             raise RuntimeError(f"Failed to insert identification record: {e}")
 
+    def insert_identification_records(self, records: List[Dict]) -> List[int]:
+        """
+        Bulk variant of insert_identification_record: one flush and one commit for all rows.
+        Each dict holds insert_identification_record's keyword arguments. Returns ids in input order.
+        """
+        db_records = [self._build_identification_record(**record) for record in records]
+        try:
+            self.db.add_all(db_records)
+            self.db.flush()
+            # Read ids before commit expires the instances (avoids one SELECT per row)
+            ids = [db_record.id for db_record in db_records]
+            self.db.commit()
+            return ids
+        except Exception as e:
+            self.db.rollback()
+            raise RuntimeError(f"Failed to insert identification records: {e}")
+
+    def update_identification_record(self, identification_id: int, **values) -> bool:
+        """
+        Set columns on one car_identifications row and commit; uses a short-lived session
+        when the service has none (e.g. the blur retry loop). Returns success.
+        """
+        db = self.db or SessionLocal()
+        try:
+            db.query(CarIdentification).filter(CarIdentification.id == identification_id).update(
+                values, synchronize_session=False,
+            )
+            db.commit()
+            return True
+        except Exception as e:
+            db.rollback()
+            logger.error("identification_update_failed: %s id=%s values=%s", e, identification_id, values)
+            return False
+        finally:
+            if db is not self.db:
+                db.close()
+
     def upload_image_to_s3(
         self,
         s3_key: str,
         image_data: bytes,
         image_filename: str,
         result: CarIdentificationResult,
-    ) -> None:
-        """Upload image bytes to S3 using a pre-determined key. Safe to call in a background task."""
+        identification_id: Optional[int] = None,
+    ) -> bool:
+        """
+        Upload image bytes (then their derivatives) to S3 using a pre-determined key. Safe to
+        call in a background task; returns whether the original was stored.
+        """
         file_extension = image_filename.split('.')[-1].lower()
         try:
             t0 = time.perf_counter()
@@ -146,6 +212,65 @@ class CarStorageService:
         except Exception as e:
             # Non-fatal — DB record exists; image missing but identification data preserved
             logger.error("s3_upload_failed: %s key=%s", e, s3_key)
+            return False
+        self.upload_derivatives(s3_key, image_data, identification_id)
+        return True
+
+    def upload_derivatives(self, s3_key: str, image_data: bytes, identification_id: Optional[int] = None) -> bool:
+        """
+        Render the WebP thumbnail/preview of an image (in the image process pool) and upload
+        them next to the original (see utils.image_derivatives), then set has_derivatives on
+        the identification row so list endpoints start linking them. Blocking; returns success.
+        """
+        try:
+            t0 = time.perf_counter()
+            derivatives = get_image_executor().run_sync(render_derivatives, image_data)
+            render_ms = round((time.perf_counter() - t0) * 1000, 1)
+            for size, data in derivatives.items():
+                self.s3_client.put_object(
+                    Bucket=self.bucket,
+                    Key=derivative_key(s3_key, size),
+                    Body=data,
+                    ContentType=DERIVATIVE_CONTENT_TYPE,
+                    CacheControl=DERIVATIVE_CACHE_CONTROL,
+                )
+            logger.info(
+                "s3_derivatives_uploaded",
+                extra={
+                    "s3_key": s3_key,
+                    "bytes": {size: len(data) for size, data in derivatives.items()},
+                    "render_ms": render_ms,
+                    "duration_ms": round((time.perf_counter() - t0) * 1000, 1),
+                },
+            )
+        except Exception as e:
+            # Non-fatal — list endpoints keep serving the original; backfill_derivatives.py retries
+            logger.error("s3_derivatives_failed: %s key=%s", e, s3_key)
+            return False
+        if identification_id is None:
+            return True
+        return self.update_identification_record(identification_id, has_derivatives=True)
+
+    def image_url(self, record: CarIdentification, size: str = "full", base_url: str = "") -> Optional[str]:
+        """
+        Presigned URL for the requested size of a record's image, or the API image endpoint
+        (under base_url) on failure. Records without derivatives yet get the original; None
+        while the image is not in S3 (record.image_status says why).
+        """
+        if record.image_status is not None:
+            return None
+        if not record.has_derivatives:
+            size = "full"
+        try:
+            return self.s3_client.generate_presigned_url(
+                'get_object',
+                Params={'Bucket': self.bucket, 'Key': derivative_key(record.s3_image_key, size)},
+                ExpiresIn=3600  # 1 hour
+            )
+        except Exception as e:
+            # Graceful fallback if S3 URL generation fails
+            print(f"Warning: Could not generate presigned URL for {record.s3_image_key}: {e}")
+            return f"{base_url}/api/v1/cars/identifications/{record.id}/image?size={size}"
 
     def get_identification_results(
         self, 
@@ -155,7 +280,8 @@ class CarStorageService:
         make: Optional[str] = None,
         car_type: Optional[str] = None,
         confidence: Optional[str] = None,
-        user_id: Optional[UUID] = None
+        user_id: Optional[UUID] = None,
+        size: str = "full",
     ) -> Dict:
         """Get identification results with pagination and filtering"""
         
@@ -187,21 +313,10 @@ class CarStorageService:
         # Format results for frontend
         formatted_results = []
         for record in results:
-            try:
-                # Generate presigned URL for image
-                image_url = self.s3_client.generate_presigned_url(
-                    'get_object',
-                    Params={'Bucket': self.bucket, 'Key': record.s3_image_key},
-                    ExpiresIn=3600  # 1 hour
-                )
-            except Exception as e:
-                # Graceful fallback if S3 URL generation fails
-                print(f"Warning: Could not generate presigned URL for {record.s3_image_key}: {e}")
-                image_url = f"/api/cars/identifications/{record.id}/image"  # Fallback to API endpoint
-            
             formatted_results.append({
                 'id': record.id,
-                'image_url': image_url,
+                'image_url': self.image_url(record, size),
+                'image_status': record.image_status,
                 'filename': record.image_filename,
                 'created_at': record.created_at.isoformat(),
                 'identification_data': record.identification_data,
@@ -225,20 +340,10 @@ class CarStorageService:
         if not record:
             return None
         
-        # Generate presigned URL with error handling
-        try:
-            image_url = self.s3_client.generate_presigned_url(
-                'get_object',
-                Params={'Bucket': self.bucket, 'Key': record.s3_image_key},
-                ExpiresIn=3600
-            )
-        except Exception as e:
-            print(f"Warning: Could not generate presigned URL: {e}")
-            image_url = f"/api/cars/identifications/{record.id}/image"
-        
         return {
             'id': record.id,
-            'image_url': image_url,
+            'image_url': self.image_url(record),
+            'image_status': record.image_status,
             'filename': record.image_filename,
             'created_at': record.created_at.isoformat(),
             'identification_data': record.identification_data,
@@ -246,7 +351,7 @@ class CarStorageService:
             'car_details': self._get_car_details_dict(record.make, record.model),
         }
     
-    def search_cars(self, search_term: str, limit: int = 50, offset: int = 0) -> Dict:
+    def search_cars(self, search_term: str, limit: int = 50, offset: int = 0, size: str = "full") -> Dict:
         """Search cars using PostgreSQL full-text search, sorted by popularity."""
         from sqlalchemy import func, text
         from models.car_popularity import CarPopularity
@@ -283,19 +388,10 @@ class CarStorageService:
 
         results = []
         for record, likes, rank in rows:
-            try:
-                image_url = self.s3_client.generate_presigned_url(
-                    'get_object',
-                    Params={'Bucket': self.bucket, 'Key': record.s3_image_key},
-                    ExpiresIn=3600
-                )
-            except Exception as e:
-                print(f"Warning: Could not generate presigned URL: {e}")
-                image_url = f"/api/cars/identifications/{record.id}/image"
-
             results.append({
                 'id': record.id,
-                'image_url': image_url,
+                'image_url': self.image_url(record, size),
+                'image_status': record.image_status,
                 'make': record.make,
                 'model': record.model,
                 'car_type': record.car_type,
@@ -378,12 +474,41 @@ class CarStorageService:
         )
         return record.to_dict() if record else None
 
+    def _fetch_api_ninjas(self, make: str, model: str, api_key: str) -> dict:
+        """One API-Ninjas lookup. Raises on network errors, 5xx and 429 (breaker failures)."""
+        t0 = time.perf_counter()
+        resp = _http.get(
+            'https://api.api-ninjas.com/v1/cars',
+            params={'make': make, 'model': model},
+            headers={'X-Api-Key': api_key},
+            timeout=_CAR_API_TIMEOUT_SECONDS,
+        )
+        duration_ms = round((time.perf_counter() - t0) * 1000, 1)
+        if resp.status_code >= 500 or resp.status_code == 429:
+            resp.raise_for_status()
+        data = resp.json() if resp.ok else []
+        row_data = data[0] if isinstance(data, list) and data else {}
+        logger.info(
+            "api_ninjas_cars",
+            extra={
+                "make": make,
+                "model": model,
+                "status_code": resp.status_code,
+                "result_found": bool(row_data),
+                "duration_ms": duration_ms,
+            },
+        )
+        return row_data
+
     def get_or_fetch_car_details(self, make: str, model: str) -> Optional[dict]:
         """
         Return car statistics for the given make/model.
         Checks the car_details table first; if absent, calls API-Ninjas and
         persists the result (even when the API returns no data, a row is stored
         with NULL fields to prevent repeat fetches).
+
+        When API-Ninjas fails or its circuit breaker is open, returns None without
+        persisting anything, so the pair is fetched again once the API recovers.
         """
         if not make or not model:
             return None
@@ -402,28 +527,13 @@ class CarStorageService:
         row_data: dict = {}
         if api_key:
             try:
-                t0 = time.perf_counter()
-                resp = _http.get(
-                    'https://api.api-ninjas.com/v1/cars',
-                    params={'make': make, 'model': model},
-                    headers={'X-Api-Key': api_key},
-                    timeout=10,
-                )
-                duration_ms = round((time.perf_counter() - t0) * 1000, 1)
-                data = resp.json() if resp.ok else []
-                row_data = data[0] if isinstance(data, list) and data else {}
-                logger.info(
-                    "api_ninjas_cars",
-                    extra={
-                        "make": make,
-                        "model": model,
-                        "status_code": resp.status_code,
-                        "result_found": bool(row_data),
-                        "duration_ms": duration_ms,
-                    },
-                )
+                row_data = get_breaker("api_ninjas").call(self._fetch_api_ninjas, make, model, api_key)
+            except CircuitOpenError:
+                logger.info("API-Ninjas circuit open — skipping car details for %s %s", make, model)
+                return None
             except Exception as exc:
                 logger.warning("API-Ninjas request failed for %s %s: %s", make, model, exc)
+                return None
         else:
             logger.warning("CAR_API_KEY not configured — skipping car details fetch")
 
@@ -0,0 +1,147 @@
+"""
+usage_accounting.py
+Persists per-stage usage of identify requests and aggregates it for cost/latency reporting.
+
+Each identify request writes one row per external call (find_make, identify_car,
+rekognition.<operation>) plus one "pipeline" row carrying the request's wall time and
+total cost, so per-request percentiles never have to re-sum the stage rows.
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models.identification_stage_usage import IdentificationStageUsage
+from models.user import User
+from utils.usage_tracker import StageUsage
+
+logger = logging.getLogger("carid.usage")
+
+PIPELINE_STAGE = "pipeline"
+
+
+def pipeline_usage(stages: Iterable[StageUsage], duration_ms: float) -> StageUsage:
+    """Request-level row: summed tokens, calls and cost of stages, with the request's wall time."""
+    stages = list(stages)
+    return StageUsage(
+        stage=PIPELINE_STAGE,
+        input_tokens=sum(s.input_tokens for s in stages),
+        output_tokens=sum(s.output_tokens for s in stages),
+        cache_read_input_tokens=sum(s.cache_read_input_tokens for s in stages),
+        cache_creation_input_tokens=sum(s.cache_creation_input_tokens for s in stages),
+        api_calls=sum(s.api_calls for s in stages),
+        duration_ms=duration_ms,
+        cost_usd=sum(s.cost_usd for s in stages),
+    )
+
+
+def record_stage_usage(
+    db: Session,
+    entries: Iterable[Tuple[Optional[int], List[StageUsage]]],
+    user: Optional[User],
+    request_id: Optional[str],
+) -> None:
+    """
+    Insert one row per stage for each (identification_id, stages) entry, in one commit.
+    Accounting must never fail a request: errors are logged, not raised.
+    """
+    rows = [(identification_id, stage) for identification_id, stages in entries for stage in stages]
+    if not rows:
+        return
+    try:
+        db.add_all([
+            IdentificationStageUsage(
+                identification_id=identification_id,
+                request_id=request_id,
+                user_id=user.id if user is not None else None,
+                user_type=user.user_type if user is not None else None,
+                stage=stage.stage,
+                model=stage.model,
+                input_tokens=stage.input_tokens,
+                output_tokens=stage.output_tokens,
+                cache_read_input_tokens=stage.cache_read_input_tokens,
+                cache_creation_input_tokens=stage.cache_creation_input_tokens,
+                api_calls=stage.api_calls,
+                duration_ms=round(stage.duration_ms, 1),
+                cost_usd=stage.cost_usd,
+            )
+            for identification_id, stage in rows
+        ])
+        db.commit()
+    except Exception as exc:
+        db.rollback()
+        logger.warning("Stage usage write failed: %s", exc, extra={"request_id": request_id})
+
+
+def _percentile(pct: float, column):
+    return func.percentile_cont(pct).within_group(column.asc())
+
+
+def usage_report(db: Session, days: int = 7) -> dict:
+    """
+    Daily aggregates since `days` ago, per user type:
+      - stages: per stage/model call counts, tokens, cost and p50/p95 call latency
+      - requests: per-request cost and latency percentiles (from the "pipeline" rows)
+    """
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    day = func.date_trunc("day", IdentificationStageUsage.created_at).label("day")
+    usage = IdentificationStageUsage
+
+    stage_rows = (
+        db.query(
+            day,
+            usage.user_type,
+            usage.stage,
+            usage.model,
+            func.count(usage.id).label("rows"),
+            func.sum(usage.api_calls).label("api_calls"),
+            func.sum(usage.input_tokens).label("input_tokens"),
+            func.sum(usage.output_tokens).label("output_tokens"),
+            func.sum(usage.cache_read_input_tokens).label("cache_read_input_tokens"),
+            func.sum(usage.cache_creation_input_tokens).label("cache_creation_input_tokens"),
+            func.sum(usage.cost_usd).label("cost_usd"),
+            _percentile(0.5, usage.duration_ms).label("p50_ms"),
+            _percentile(0.95, usage.duration_ms).label("p95_ms"),
+        )
+        .filter(usage.created_at >= since, usage.stage != PIPELINE_STAGE)
+        .group_by(day, usage.user_type, usage.stage, usage.model)
+        .order_by(day, usage.user_type, usage.stage)
+        .all()
+    )
+
+    request_rows = (
+        db.query(
+            day,
+            usage.user_type,
+            func.count(usage.id).label("requests"),
+            func.sum(usage.cost_usd).label("cost_usd"),
+            func.avg(usage.cost_usd).label("mean_cost_usd"),
+            _percentile(0.5, usage.cost_usd).label("p50_cost_usd"),
+            _percentile(0.95, usage.cost_usd).label("p95_cost_usd"),
+            _percentile(0.5, usage.duration_ms).label("p50_ms"),
+            _percentile(0.95, usage.duration_ms).label("p95_ms"),
+            _percentile(0.99, usage.duration_ms).label("p99_ms"),
+        )
+        .filter(usage.created_at >= since, usage.stage == PIPELINE_STAGE)
+        .group_by(day, usage.user_type)
+        .order_by(day, usage.user_type)
+        .all()
+    )
+
+    def _row(row) -> dict:
+        data = dict(row._mapping)
+        data["day"] = data["day"].date().isoformat()
+        return {
+            key: round(value, 6) if isinstance(value, float) else value
+            for key, value in data.items()
+        }
+
+    return {
+        "since": since.isoformat(),
+        "days": days,
+        "requests": [_row(row) for row in request_rows],
+        "stages": [_row(row) for row in stage_rows],
+    }
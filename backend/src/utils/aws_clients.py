@@ -0,0 +1,123 @@
+"""
+aws_clients.py
+Process-wide registry of boto3 clients (S3, Rekognition, Secrets Manager, RDS).
+
+Creating a boto3 client costs tens of milliseconds (endpoint and model loading) and
+brings its own connection pool, so building one per request or per service instance
+wastes both. boto3 clients are thread-safe: one per (service, region) is shared by
+every request and worker thread. The registry is built on app startup and closed on
+shutdown (main.py); code that runs before that, such as the database config loader,
+gets it lazily through get_aws_clients().
+
+Every client gets the same tuned botocore Config (pool size, timeouts, retries);
+Rekognition keeps its tighter timeouts so its circuit breaker sees failures quickly.
+"""
+
+import logging
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import boto3
+from botocore.config import Config
+
+logger = logging.getLogger("carid.aws_clients")
+
+_DEFAULT_REGION = "us-west-2"
+# Worker threads (to_thread, hedged Rekognition calls, sync routes) share each client's pool;
+# botocore's default of 10 connections queues requests under load
+_DEFAULT_MAX_POOL_CONNECTIONS = 50
+_DEFAULT_CONNECT_TIMEOUT_SECONDS = 5
+_DEFAULT_READ_TIMEOUT_SECONDS = 30
+_DEFAULT_MAX_ATTEMPTS = 3
+_DEFAULT_REKOGNITION_TIMEOUT_SECONDS = 10
+
+
+class AWSClients:
+    def __init__(self, region: Optional[str] = None):
+        self.region = region or os.getenv("AWS_REGION", os.getenv("AWS_DEFAULT_REGION", _DEFAULT_REGION))
+        self._config = Config(
+            max_pool_connections=int(os.getenv("AWS_MAX_POOL_CONNECTIONS", _DEFAULT_MAX_POOL_CONNECTIONS)),
+            connect_timeout=float(os.getenv("AWS_CONNECT_TIMEOUT_SECONDS", _DEFAULT_CONNECT_TIMEOUT_SECONDS)),
+            read_timeout=float(os.getenv("AWS_READ_TIMEOUT_SECONDS", _DEFAULT_READ_TIMEOUT_SECONDS)),
+            retries={
+                "max_attempts": int(os.getenv("AWS_MAX_ATTEMPTS", _DEFAULT_MAX_ATTEMPTS)),
+                "mode": os.getenv("AWS_RETRY_MODE", "standard"),
+            },
+        )
+        # Bounded timeouts and retries: boto3's defaults (60 s reads, several retries) would
+        # hold a request for minutes before the Rekognition circuit breaker saw a failure
+        self._service_configs: Dict[str, Config] = {
+            "rekognition": Config(
+                connect_timeout=2,
+                read_timeout=float(os.getenv("REKOGNITION_TIMEOUT_SECONDS", _DEFAULT_REKOGNITION_TIMEOUT_SECONDS)),
+                retries={"max_attempts": 2, "mode": "standard"},
+            ),
+        }
+        self._session = boto3.session.Session()
+        self._clients: Dict[Tuple[str, str], object] = {}
+        self._lock = threading.Lock()
+
+    def client(self, service: str, region: Optional[str] = None, **kwargs):
+        """
+        The shared client for service in region (default: AWS_REGION). Extra kwargs
+        (e.g. explicit credentials) are only applied when the client is first created.
+        """
+        key = (service, region or self.region)
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    config = self._config
+                    if service in self._service_configs:
+                        config = config.merge(self._service_configs[service])
+                    client = self._session.client(service, region_name=key[1], config=config, **kwargs)
+                    self._clients[key] = client
+        return client
+
+    @property
+    def s3(self):
+        return self.client("s3")
+
+    @property
+    def rekognition(self):
+        return self.client("rekognition")
+
+    @property
+    def secretsmanager(self):
+        return self.client("secretsmanager")
+
+    @property
+    def rds(self):
+        # IAM auth tokens are signed locally; explicit keys are used when configured (local development)
+        return self.client(
+            "rds",
+            aws_access_key_id=os.getenv("ACCESS_KEY_ID"),
+            aws_secret_access_key=os.getenv("ACCESS_KEY_SECRET"),
+        )
+
+    def start(self) -> None:
+        """Create the request-path clients now rather than on the first request."""
+        for service in ("s3", "rekognition"):
+            self.client(service)
+        logger.info("aws_clients_started", extra={"region": self.region, "clients": len(self._clients)})
+
+    def close(self) -> None:
+        with self._lock:
+            clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            try:
+                client.close()
+            except Exception as exc:
+                logger.warning("Closing AWS client failed: %s", exc)
+
+
+_aws_clients: Optional[AWSClients] = None
+
+
+def get_aws_clients() -> AWSClients:
+    global _aws_clients
+    if _aws_clients is None:
+        _aws_clients = AWSClients()
+    return _aws_clients
@@ -0,0 +1,219 @@
+"""
+circuit_breaker.py
+Per-dependency circuit breakers for external calls (Anthropic, Rekognition, API-Ninjas).
+
+closed     — calls go through; outcomes are kept for a rolling window. Once at least
+             min_calls have been seen and the failure rate reaches the threshold, the
+             breaker opens.
+open       — calls fail immediately with CircuitOpenError for open_seconds, so callers
+             degrade at once instead of each waiting out a timeout.
+half_open  — up to half_open_max_calls probe calls are let through; a success closes
+             the breaker, a failure re-opens it.
+
+State is per worker process and is reported by GET /health/detailed.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple, TypeVar
+
+from utils import metrics
+
+logger = logging.getLogger("carid.circuit_breaker")
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_DEFAULT_FAILURE_RATE = 0.5
+_DEFAULT_MIN_CALLS = 10
+_DEFAULT_WINDOW_SECONDS = 60
+_DEFAULT_OPEN_SECONDS = 30
+_DEFAULT_HALF_OPEN_MAX_CALLS = 1
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable (circuit open)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_rate: Optional[float] = None,
+        min_calls: Optional[int] = None,
+        window_seconds: Optional[float] = None,
+        open_seconds: Optional[float] = None,
+        half_open_max_calls: Optional[int] = None,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate or float(os.getenv("CIRCUIT_FAILURE_RATE", _DEFAULT_FAILURE_RATE))
+        self.min_calls = min_calls or int(os.getenv("CIRCUIT_MIN_CALLS", _DEFAULT_MIN_CALLS))
+        self.window_seconds = window_seconds or float(os.getenv("CIRCUIT_WINDOW_SECONDS", _DEFAULT_WINDOW_SECONDS))
+        self.open_seconds = open_seconds or float(os.getenv("CIRCUIT_OPEN_SECONDS", _DEFAULT_OPEN_SECONDS))
+        self.half_open_max_calls = half_open_max_calls or int(
+            os.getenv("CIRCUIT_HALF_OPEN_MAX_CALLS", _DEFAULT_HALF_OPEN_MAX_CALLS)
+        )
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # State transitions
+    # ------------------------------------------------------------------
+
+    def _transition(self, state: str) -> None:
+        """Caller holds the lock."""
+        if state == self._state:
+            return
+        logger.warning("circuit_state_change", extra={"breaker": self.name, "from": self._state, "to": state})
+        metrics.increment(f"circuit.{self.name}.{state}")
+        self._state = state
+        self._probes_in_flight = 0
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        elif state == CLOSED:
+            self._outcomes.clear()
+
+    def _prune(self, now: float) -> None:
+        while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+            self._outcomes.popleft()
+
+    def _retry_after(self) -> float:
+        return max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and self._retry_after() == 0:
+                return HALF_OPEN
+            return self._state
+
+    def before_call(self) -> None:
+        """Admit a call or raise CircuitOpenError. Pair with record_success / record_failure."""
+        with self._lock:
+            if self._state == OPEN:
+                if self._retry_after() > 0:
+                    metrics.increment(f"circuit.{self.name}.rejected")
+                    raise CircuitOpenError(self.name, self._retry_after())
+                self._transition(HALF_OPEN)
+            if self._state == HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_max_calls:
+                    metrics.increment(f"circuit.{self.name}.rejected")
+                    raise CircuitOpenError(self.name, self.open_seconds)
+                self._probes_in_flight += 1
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._transition(CLOSED)
+                return
+            self._record(True)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._transition(OPEN)
+                return
+            self._record(False)
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            if (
+                self._state == CLOSED
+                and len(self._outcomes) >= self.min_calls
+                and failures / len(self._outcomes) >= self.failure_rate
+            ):
+                self._transition(OPEN)
+
+    def _record(self, ok: bool) -> None:
+        now = time.monotonic()
+        self._outcomes.append((now, ok))
+        self._prune(now)
+
+    # ------------------------------------------------------------------
+    # Call wrappers
+    # ------------------------------------------------------------------
+
+    def _record_exception(self, exc: Exception, is_failure: Optional[Callable[[Exception], bool]]) -> None:
+        # Errors caused by the request itself (bad input) say nothing about the dependency's health
+        if is_failure is None or is_failure(exc):
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def call(
+        self,
+        fn: Callable[..., T],
+        *args,
+        is_failure: Optional[Callable[[Exception], bool]] = None,
+        **kwargs,
+    ) -> T:
+        """Run a blocking call through the breaker."""
+        self.before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as exc:
+            self._record_exception(exc, is_failure)
+            raise
+        self.record_success()
+        return result
+
+    async def call_async(
+        self,
+        call: Callable[[], Awaitable[T]],
+        is_failure: Optional[Callable[[Exception], bool]] = None,
+    ) -> T:
+        """Await call() through the breaker. Cancellation counts as neither outcome."""
+        self.before_call()
+        try:
+            result = await call()
+        except Exception as exc:
+            self._record_exception(exc, is_failure)
+            raise
+        except BaseException:
+            with self._lock:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            raise
+        self.record_success()
+        return result
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self._prune(time.monotonic())
+            calls = len(self._outcomes)
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            return {
+                "state": self._state,
+                "window_calls": calls,
+                "window_failure_rate": round(failures / calls, 3) if calls else 0.0,
+                "retry_after_seconds": round(self._retry_after(), 1) if self._state == OPEN else None,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Process-wide breaker for one dependency (e.g. "anthropic", "rekognition", "api_ninjas")."""
+    with _registry_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def snapshot_all() -> Dict[str, dict]:
+    with _registry_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
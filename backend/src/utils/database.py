@@ -5,9 +5,9 @@ from sqlalchemy.orm import sessionmaker, Session
 from typing import Generator
 import os
 import json
-import boto3
 import psycopg2
 from dotenv import load_dotenv
+from utils.aws_clients import get_aws_clients
 
 load_dotenv()
 
@@ -17,7 +17,7 @@ def _load_db_config() -> dict:
     secret_name = os.getenv("DB_SECRET_NAME")
     if secret_name:
         region = os.getenv("AWS_REGION", "us-west-2")
-        client = boto3.client("secretsmanager", region_name=region)
+        client = get_aws_clients().client("secretsmanager", region=region)
         secret = json.loads(client.get_secret_value(SecretId=secret_name)["SecretString"])
         return {
             "host": secret["host"],
@@ -46,13 +46,7 @@ def _create_iam_connection():
     Tokens expire after 15 min but existing pooled connections remain valid.
     """
     region = os.getenv("AWS_REGION", "us-west-2")
-    rds_client = boto3.client(
-        "rds",
-        region_name=region,
-        aws_access_key_id=os.getenv("ACCESS_KEY_ID"),
-        aws_secret_access_key=os.getenv("ACCESS_KEY_SECRET"),
-    )
-    token = rds_client.generate_db_auth_token(
+    token = get_aws_clients().rds.generate_db_auth_token(
         DBHostname=_DB_CONFIG["host"],
         Port=_DB_CONFIG["port"],
         DBUsername=_DB_CONFIG["user"],
@@ -112,5 +106,9 @@ def create_tables():
     from models.badge import Badge
     from models.user_badge import UserBadge
     from models.subscription import Subscription
+    from models.identification_cache import IdentificationCacheEntry
+    from models.identification_stage_usage import IdentificationStageUsage
+    from models.detection_cache import DetectionCacheEntry
+    from models.pending_blur import PendingBlur
 
     Base.metadata.create_all(bind=engine)
\ No newline at end of file
@@ -0,0 +1,140 @@
+"""
+hedging.py
+Hedged requests for slow external calls (Claude, Rekognition).
+
+A call that has not finished by the policy's percentile of its recent latency
+(p95 by default) gets a duplicate fired alongside it; whichever succeeds first
+wins and the other is cancelled. Hedges draw from one per-process token budget
+that refills as a fraction of all calls, so during a provider incident — when
+every call is slow — hedging tops out at that fraction instead of doubling load.
+
+Latency samples are the metrics series "hedge.<name>", so the trigger point is
+also visible in GET /metrics.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from utils import metrics
+
+logger = logging.getLogger("carid.hedging")
+
+T = TypeVar("T")
+
+_DEFAULT_PERCENTILE = 95.0
+_DEFAULT_MIN_SAMPLES = 20
+_DEFAULT_MIN_DELAY_MS = 200
+_DEFAULT_BUDGET_RATIO = 0.05
+_DEFAULT_BUDGET_BURST = 10
+
+
+class HedgeBudget:
+    """Token bucket: each call deposits ratio tokens (capped at burst); each hedge spends one."""
+
+    def __init__(self, ratio: float, burst: float):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = burst
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+class HedgePolicy:
+    def __init__(
+        self,
+        name: str,
+        budget: HedgeBudget,
+        percentile: Optional[float] = None,
+        min_samples: Optional[int] = None,
+        min_delay_ms: Optional[float] = None,
+        enabled: Optional[bool] = None,
+    ):
+        self.name = name
+        self.budget = budget
+        self.percentile = percentile or float(os.getenv("HEDGE_PERCENTILE", _DEFAULT_PERCENTILE))
+        self.min_samples = min_samples or int(os.getenv("HEDGE_MIN_SAMPLES", _DEFAULT_MIN_SAMPLES))
+        self.min_delay_ms = min_delay_ms or float(os.getenv("HEDGE_MIN_DELAY_MS", _DEFAULT_MIN_DELAY_MS))
+        if enabled is None:
+            enabled = os.getenv("HEDGE_ENABLED", "true").lower() != "false"
+        self.enabled = enabled
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None until enough latency samples exist."""
+        trigger_ms = metrics.percentile(f"hedge.{self.name}", self.percentile, self.min_samples)
+        if trigger_ms is None:
+            return None
+        return max(trigger_ms, self.min_delay_ms) / 1000
+
+    async def run(self, call: Callable[[], Awaitable[T]]) -> T:
+        """
+        Await call(), hedging it with a second call() if it runs past the trigger.
+        call must be safe to issue twice (idempotent reads only).
+        """
+        if not self.enabled:
+            return await call()
+
+        self.budget.deposit()
+        delay = self.hedge_delay()
+        started = time.perf_counter()
+        primary = asyncio.ensure_future(call())
+        tasks = [primary]
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    if self.budget.try_withdraw():
+                        metrics.increment(f"hedge.{self.name}.fired")
+                        tasks.append(asyncio.ensure_future(call()))
+                    else:
+                        metrics.increment(f"hedge.{self.name}.budget_exhausted")
+
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in done if not task.cancelled() and task.exception() is None), None)
+                if winner is not None:
+                    if winner is not primary:
+                        metrics.increment(f"hedge.{self.name}.won")
+                    metrics.observe(f"hedge.{self.name}", (time.perf_counter() - started) * 1000)
+                    return winner.result()
+            # Every attempt failed: surface the primary's error
+            return primary.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()  # mark a losing attempt's error as retrieved
+
+
+_budget: Optional[HedgeBudget] = None
+_policies: Dict[str, HedgePolicy] = {}
+_registry_lock = threading.Lock()
+
+
+def get_hedge_policy(name: str) -> HedgePolicy:
+    """Process-wide policy for one kind of call; all policies share a single hedge budget."""
+    global _budget
+    with _registry_lock:
+        if _budget is None:
+            _budget = HedgeBudget(
+                ratio=float(os.getenv("HEDGE_BUDGET_RATIO", _DEFAULT_BUDGET_RATIO)),
+                burst=float(os.getenv("HEDGE_BUDGET_BURST", _DEFAULT_BUDGET_BURST)),
+            )
+        if name not in _policies:
+            _policies[name] = HedgePolicy(name, _budget)
+        return _policies[name]
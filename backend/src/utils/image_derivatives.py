@@ -0,0 +1,53 @@
+"""
+image_derivatives.py
+Downsized WebP copies of every stored car image, for list screens.
+
+Each original at car-images/<date>/<uuid>.<ext> gets sibling objects
+car-images/<date>/<uuid>.thumb.webp and car-images/<date>/<uuid>.preview.webp,
+written by the same background task that uploads the original (and by
+backfill_derivatives.py for older rows). Keys are derived from s3_image_key;
+car_identifications.has_derivatives records that they were uploaded, and until it
+is set list endpoints link the original instead.
+"""
+
+import os
+from typing import Dict, Literal
+
+from utils import image_ops
+
+ImageSize = Literal["thumb", "preview", "full"]
+
+# Longest side in px of each derivative; "full" is the original upload
+DERIVATIVE_MAX_SIDES: Dict[str, int] = {
+    "thumb": int(os.getenv("THUMBNAIL_MAX_SIDE", 320)),
+    "preview": int(os.getenv("PREVIEW_MAX_SIDE", 1080)),
+}
+DERIVATIVE_QUALITY = int(os.getenv("DERIVATIVE_WEBP_QUALITY", 80))
+DERIVATIVE_CONTENT_TYPE = "image/webp"
+# Derivatives are immutable (a new upload gets a new uuid key), so clients may cache them for good
+DERIVATIVE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def derivative_key(s3_key: str, size: str) -> str:
+    """S3 key of the given size of an original; "full" (or an unknown size) is the original itself."""
+    if size not in DERIVATIVE_MAX_SIDES:
+        return s3_key
+    stem = s3_key.rsplit(".", 1)[0] if "." in s3_key.rsplit("/", 1)[-1] else s3_key
+    return f"{stem}.{size}.webp"
+
+
+def all_keys(s3_key: str) -> list:
+    """The original's key followed by every derivative key (e.g. for deletion)."""
+    return [s3_key] + [derivative_key(s3_key, size) for size in DERIVATIVE_MAX_SIDES]
+
+
+def render_derivatives(image_data: bytes) -> Dict[str, bytes]:
+    """
+    Encode every derivative of one image: {size: webp bytes}. Pure function of bytes,
+    suitable for the image process pool.
+    """
+    sizes = list(DERIVATIVE_MAX_SIDES)
+    encoded = image_ops.webp_derivatives(
+        image_data, tuple(DERIVATIVE_MAX_SIDES[size] for size in sizes), DERIVATIVE_QUALITY,
+    )
+    return dict(zip(sizes, encoded))
@@ -0,0 +1,140 @@
+"""
+image_executor.py
+Process pool for CPU-bound image work (decode, resize, blur, encode).
+
+Pillow holds the GIL for most of its work, so running it on the event loop (or in
+threads) stalls every other request on the worker while one large upload is
+processed. Functions from utils.image_ops are shipped to a pool of worker processes
+as plain bytes instead; the request coroutine awaits the result.
+
+Exported metrics:
+  image_pool.in_flight / image_pool.queue_depth   gauges: submitted tasks / tasks waiting for a process
+  image_pool.queue_wait                           ms between submission and a process picking it up
+  image_pool.<function>                           ms spent running each function in the worker
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional, Tuple
+
+from utils import metrics
+from utils.image_ops import warm_up
+
+logger = logging.getLogger("carid.image_executor")
+
+
+def _timed(fn: Callable, args: tuple) -> Tuple[Any, float, float]:
+    """Runs in the worker: (result, wall-clock start, duration in ms)."""
+    started = time.time()
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, started, (time.perf_counter() - t0) * 1000
+
+
+class ImageExecutor:
+    def __init__(self, workers: Optional[int] = None):
+        # 0 runs image work in threads instead (no extra processes, but GIL-bound)
+        self.workers = workers if workers is not None else int(
+            os.getenv("IMAGE_POOL_WORKERS", os.cpu_count() or 1)
+        )
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._in_flight = 0
+        # run() updates the counter on the event loop, run_sync() from worker threads
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        with self._lock:
+            if self._pool is None and self.workers > 0:
+                # spawn, not fork: the parent runs HTTP client threads that must not be forked mid-call
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    def start(self) -> None:
+        """Start every worker process now rather than on the first upload."""
+        pool = self._get_pool()
+        if pool is not None:
+            for _ in range(self.workers):
+                pool.submit(warm_up)
+            logger.info("image_pool_started", extra={"workers": self.workers})
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _track(self, delta: int) -> None:
+        """Adjust the in-flight count and publish the gauges."""
+        with self._lock:
+            self._in_flight += delta
+            in_flight = self._in_flight
+        metrics.set_gauge("image_pool.in_flight", in_flight)
+        metrics.set_gauge("image_pool.queue_depth", max(0, in_flight - max(self.workers, 1)))
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """Run fn(*args) in a worker process. fn must be a module-level function (picklable)."""
+        pool = self._get_pool()
+        loop = asyncio.get_running_loop()
+        submitted = time.time()
+        self._track(1)
+        try:
+            if pool is not None:
+                result, started, duration_ms = await loop.run_in_executor(pool, _timed, fn, args)
+            else:
+                result, started, duration_ms = await asyncio.to_thread(_timed, fn, args)
+        except BrokenProcessPool:
+            raise self._replace_broken_pool(pool, fn)
+        finally:
+            self._track(-1)
+        self._observe(fn, submitted, started, duration_ms)
+        return result
+
+    def run_sync(self, fn: Callable, *args) -> Any:
+        """Blocking run() for code already off the event loop (sync background tasks, scripts)."""
+        pool = self._get_pool()
+        submitted = time.time()
+        self._track(1)
+        try:
+            if pool is not None:
+                result, started, duration_ms = pool.submit(_timed, fn, args).result()
+            else:
+                result, started, duration_ms = _timed(fn, args)
+        except BrokenProcessPool:
+            raise self._replace_broken_pool(pool, fn)
+        finally:
+            self._track(-1)
+        self._observe(fn, submitted, started, duration_ms)
+        return result
+
+    def _replace_broken_pool(self, pool: ProcessPoolExecutor, fn: Callable) -> RuntimeError:
+        # A worker died (e.g. OOM-killed on a huge image): replace the pool for later calls
+        logger.error("Image process pool broken; restarting it")
+        with self._lock:
+            replace = self._pool is pool
+            if replace:
+                self._pool = None
+        if replace:
+            pool.shutdown(wait=False)
+        return RuntimeError(f"Image processing failed: worker process died running {fn.__name__}")
+
+    @staticmethod
+    def _observe(fn: Callable, submitted: float, started: float, duration_ms: float) -> None:
+        metrics.observe("image_pool.queue_wait", max(0.0, (started - submitted) * 1000))
+        metrics.observe(f"image_pool.{fn.__name__}", duration_ms)
+
+
+_image_executor: Optional[ImageExecutor] = None
+
+
+def get_image_executor() -> ImageExecutor:
+    global _image_executor
+    if _image_executor is None:
+        _image_executor = ImageExecutor()
+    return _image_executor
@@ -0,0 +1,107 @@
+"""
+image_metadata.py
+Byte-level metadata stripping for uploads that need no pixel changes.
+
+Removing EXIF (GPS, camera serials), XMP and text chunks by rewriting the container
+leaves the compressed image data untouched, so an already-upright upload is stored
+without the decode/re-encode round trip and its generation loss.
+"""
+
+import struct
+from typing import Optional
+
+_JPEG_SOI = b"\xff\xd8"
+_JPEG_EOI = b"\xff\xd9"
+_JPEG_SOS = 0xDA
+_JPEG_COM = 0xFE
+_JPEG_APP0 = 0xE0
+_JPEG_APP2 = 0xE2
+_JPEG_APP14 = 0xEE
+# Markers without a length field: TEM and RST0-7
+_JPEG_STANDALONE = {0x01, *range(0xD0, 0xD8)}
+_ICC_PROFILE_ID = b"ICC_PROFILE\x00"
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# eXIf carries EXIF (incl. GPS); text chunks carry free-form metadata; tIME the edit time
+_PNG_DROPPED_CHUNKS = {b"eXIf", b"tEXt", b"zTXt", b"iTXt", b"tIME"}
+
+
+def strip_jpeg_metadata(data: bytes) -> bytes:
+    """
+    Drop every APPn segment except JFIF (APP0), ICC profiles (APP2) and Adobe (APP14,
+    needed to decode CMYK/YCCK), plus comments and anything after EOI (MPF secondary
+    images such as depth maps carry their own EXIF). Raises ValueError on a malformed stream.
+    """
+    if not data.startswith(_JPEG_SOI):
+        raise ValueError("not a JPEG stream")
+    out = bytearray(_JPEG_SOI)
+    pos = 2
+    while True:
+        if pos + 2 > len(data) or data[pos] != 0xFF:
+            raise ValueError(f"expected marker at offset {pos}")
+        marker = data[pos + 1]
+        if marker == 0xFF:           # fill byte
+            pos += 1
+            continue
+        if marker in _JPEG_STANDALONE:
+            out += data[pos:pos + 2]
+            pos += 2
+            continue
+        if marker == _JPEG_SOS:
+            # Entropy-coded data never contains FF D9 (0xFF is byte-stuffed), so the first
+            # occurrence is EOI, even across the several scans of a progressive JPEG
+            end = data.find(_JPEG_EOI, pos)
+            if end < 0:
+                raise ValueError("missing EOI marker")
+            out += data[pos:end + 2]
+            return bytes(out)
+        if pos + 4 > len(data):
+            raise ValueError("truncated segment header")
+        (length,) = struct.unpack(">H", data[pos + 2:pos + 4])
+        segment_end = pos + 2 + length
+        if length < 2 or segment_end > len(data):
+            raise ValueError(f"bad segment length at offset {pos}")
+        if _keep_jpeg_segment(marker, data[pos + 4:segment_end]):
+            out += data[pos:segment_end]
+        pos = segment_end
+
+
+def _keep_jpeg_segment(marker: int, payload: bytes) -> bool:
+    if marker == _JPEG_COM:
+        return False
+    if _JPEG_APP0 <= marker <= 0xEF:
+        if marker == _JPEG_APP2:
+            return payload.startswith(_ICC_PROFILE_ID)
+        return marker in (_JPEG_APP0, _JPEG_APP14)
+    return True
+
+
+def strip_png_metadata(data: bytes) -> bytes:
+    """Drop EXIF, text and timestamp chunks; every other chunk is copied verbatim."""
+    if not data.startswith(_PNG_SIGNATURE):
+        raise ValueError("not a PNG stream")
+    out = bytearray(_PNG_SIGNATURE)
+    pos = len(_PNG_SIGNATURE)
+    while pos < len(data):
+        if pos + 8 > len(data):
+            raise ValueError("truncated chunk header")
+        (length,) = struct.unpack(">I", data[pos:pos + 4])
+        chunk_type = data[pos + 4:pos + 8]
+        chunk_end = pos + 12 + length   # length + type + data + crc
+        if chunk_end > len(data):
+            raise ValueError(f"bad chunk length at offset {pos}")
+        if chunk_type not in _PNG_DROPPED_CHUNKS:
+            out += data[pos:chunk_end]
+        pos = chunk_end
+        if chunk_type == b"IEND":
+            break
+    return bytes(out)
+
+
+def strip_metadata(data: bytes, source_format: str) -> Optional[bytes]:
+    """Metadata-free copy of data without re-encoding, or None when the format is not supported."""
+    if source_format == "JPEG":
+        return strip_jpeg_metadata(data)
+    if source_format == "PNG":
+        return strip_png_metadata(data)
+    return None
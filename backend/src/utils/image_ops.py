@@ -0,0 +1,207 @@
+"""
+image_ops.py
+CPU-bound image transforms as pure functions of encoded bytes.
+
+Nothing here touches shared state and every argument/result is plain bytes, tuples or
+numbers, so each function can run in the image process pool (utils.image_executor).
+PreparedImage memoizes their results per upload.
+"""
+
+import base64
+import hashlib
+import io
+import logging
+import math
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import ExifTags, Image, ImageOps, JpegImagePlugin
+
+from utils.image_metadata import strip_metadata
+from utils.image_resize import downscale, fit_within
+from utils.perceptual_hash import dhash
+from utils.region_blur import redact_regions
+
+logger = logging.getLogger("carid.image_ops")
+
+# Largest image accepted (see utils.upload_intake); also Pillow's decompression-bomb threshold
+# in every process that imports this module, including the image pool workers
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", 64_000_000))
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+# dHash only looks at a 9x8 grid; decoding at most this size keeps it off the full-resolution path
+_HASH_SOURCE_SIZE = (256, 256)
+
+# Rekognition payloads: JPEG quality, and its worst case in bytes per pixel (measured on pure
+# noise with 4:2:0 subsampling; phone photos encode to 0.1–0.3 bytes per pixel)
+_REKOGNITION_JPEG_QUALITY = 85
+_JPEG_MAX_BYTES_PER_PIXEL = 0.8
+
+# (upright_bytes, sha256 hex of upright_bytes, 64-bit perceptual hash, how upright_bytes was made)
+Normalized = Tuple[bytes, str, int, str]
+
+
+def read_orientation(image: Image.Image) -> int:
+    """EXIF orientation tag of an opened image (1 = upright, also when missing or unreadable)."""
+    try:
+        value = image.getexif().get(ExifTags.Base.Orientation, 1)
+    except Exception:
+        return 1
+    return value if value in range(1, 9) else 1
+
+
+def decode_upright(data: bytes, max_size: Optional[Tuple[int, int]] = None) -> Image.Image:
+    """Decode with EXIF orientation applied; JPEGs are decoded at reduced size when max_size allows."""
+    image = Image.open(io.BytesIO(data))
+    if max_size is not None:
+        return downscale(image, max_size, read_orientation(image))
+    image = ImageOps.exif_transpose(image)
+    image.load()
+    return image
+
+
+def upright(data: bytes) -> bytes:
+    """
+    The upload in its own format, upright and without EXIF/text metadata.
+
+    Already upright: the original bytes with metadata segments removed — no decode.
+    Rotated JPEG: re-encoded with the upload's own quantization tables and chroma
+    subsampling, so the only loss is the rounding of one decode/encode cycle.
+    Returns data unchanged if it cannot be processed at all.
+    """
+    return _upright(data)[0]
+
+
+def _upright(data: bytes) -> Tuple[bytes, str]:
+    try:
+        header = Image.open(io.BytesIO(data))
+        source_format = header.format or "JPEG"
+        if read_orientation(header) == 1:
+            try:
+                stripped = strip_metadata(data, source_format)
+            except ValueError as exc:
+                logger.info("Metadata strip failed, re-encoding instead: %s", exc)
+                stripped = None
+            if stripped is not None:
+                return stripped, "passthrough"
+
+        buf = io.BytesIO()
+        options = _jpeg_encoder_options(header) if source_format == "JPEG" else {}
+        decode_upright(data).save(buf, format=source_format, **options)
+        return buf.getvalue(), "jpeg_tables_kept" if source_format == "JPEG" else "reencoded"
+    except Exception as exc:
+        logger.warning("Could not normalize image orientation: %s", exc)
+        return data, "failed"
+
+
+def _jpeg_encoder_options(header: Image.Image) -> Dict[str, Any]:
+    """Encoder settings reproducing the upload's own compression (Pillow's quality="keep")."""
+    options: Dict[str, Any] = {}
+    qtables = getattr(header, "quantization", None)
+    if qtables:
+        options["qtables"] = qtables
+        subsampling = JpegImagePlugin.get_sampling(header)
+        if subsampling != -1:
+            options["subsampling"] = subsampling
+    else:
+        options["quality"] = 95
+    if header.info.get("icc_profile"):
+        options["icc_profile"] = header.info["icc_profile"]
+    return options
+
+
+def content_hash(upright_data: bytes) -> str:
+    """sha256 hex digest of the normalized (upright) bytes — stable key for caches."""
+    return hashlib.sha256(upright_data).hexdigest()
+
+
+def perceptual_hash(data: bytes) -> int:
+    """64-bit dHash of the upright pixels, from a reduced-size decode."""
+    return dhash(decode_upright(data, _HASH_SOURCE_SIZE))
+
+
+def normalize(data: bytes) -> Normalized:
+    """Everything the pipeline needs before its first cache lookup, in one pass."""
+    upright_data, method = _upright(data)
+    return upright_data, content_hash(upright_data), perceptual_hash(data), method
+
+
+def claude_base64(data: bytes, max_size: Tuple[int, int], quality: int) -> str:
+    """Downscaled RGB JPEG, base64-encoded for the Anthropic API."""
+    img = decode_upright(data, max_size)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=quality)
+    return base64.b64encode(buf.getvalue()).decode()
+
+
+def rekognition_payload(data: bytes, max_side: int, max_bytes: int, quality: int = _REKOGNITION_JPEG_QUALITY) -> bytes:
+    """
+    Upright RGB JPEG for Rekognition, encoded once. The image is decoded (at reduced size
+    for JPEGs) straight to max_side, or smaller if even a worst-case encode at quality
+    could exceed max_bytes at that resolution.
+    """
+    header = Image.open(io.BytesIO(data))
+    orientation = read_orientation(header)
+    side = max_side
+    width, height = fit_within(header.size, (side, side))
+    pixel_budget = max_bytes / _JPEG_MAX_BYTES_PER_PIXEL
+    if width * height > pixel_budget:
+        side = int(side * math.sqrt(pixel_budget / (width * height)))
+
+    img = downscale(header, (side, side), orientation)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=quality)
+    if buf.tell() > max_bytes:
+        # Not expected given the estimate; one smaller encode rather than a quality loop
+        logger.warning("Rekognition payload estimate exceeded: %d bytes at %s", buf.tell(), img.size)
+        img = downscale(img, (img.size[0] // 2, img.size[1] // 2))
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def blur_regions(
+    data: bytes, boxes: List[dict], output_format: str, radius: float, mode: str = "blur",
+) -> bytes:
+    """
+    Redact every Rekognition-style relative bounding box (see utils.region_blur) on the
+    upright full-resolution pixels and encode the result once in output_format — for a
+    JPEG upload with its own quantization tables, like upright().
+    """
+    header = Image.open(io.BytesIO(data))
+    options = _jpeg_encoder_options(header) if output_format == "JPEG" and header.format == "JPEG" else {}
+    img = redact_regions(decode_upright(data), boxes, mode, radius)
+    if output_format == "JPEG" and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+
+    buf = io.BytesIO()
+    img.save(buf, format=output_format, **options)
+    return buf.getvalue()
+
+
+def webp_derivatives(data: bytes, max_sides: Tuple[int, ...], quality: int) -> Tuple[bytes, ...]:
+    """
+    WebP encodes of the upright image fitting max_side x max_side, one per entry of
+    max_sides. The image is decoded once (at reduced size for JPEGs) for the largest
+    side; each smaller variant is downscaled from the previous one.
+    """
+    order = sorted(range(len(max_sides)), key=lambda i: max_sides[i], reverse=True)
+    img = decode_upright(data, (max_sides[order[0]],) * 2)
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+
+    encoded: List[bytes] = [b""] * len(max_sides)
+    for i in order:
+        img = downscale(img, (max_sides[i], max_sides[i]))
+        buf = io.BytesIO()
+        img.save(buf, format="WEBP", quality=quality, method=4)
+        encoded[i] = buf.getvalue()
+    return tuple(encoded)
+
+
+def warm_up() -> None:
+    """No-op task used to start pool workers (and import Pillow) ahead of the first request."""
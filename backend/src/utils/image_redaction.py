@@ -1,12 +1,12 @@
-import boto3
 from PIL import Image, ImageFilter
 import io
-import os
 import numpy as np
 from typing import Tuple
 
+from utils.aws_clients import get_aws_clients
+
 def get_rekognition_client():
-    return boto3.client('rekognition', region_name=os.getenv('AWS_REGION', 'us-west-2'))
+    return get_aws_clients().rekognition
 
 def blur_license_plates(image_bytes: bytes) -> bytes:
     """
@@ -0,0 +1,63 @@
+"""
+image_resize.py
+Downscaling that decodes JPEGs at reduced resolution instead of at full size.
+
+libjpeg can scale by 1/2, 1/4 or 1/8 while decoding (Pillow's Image.draft), so a
+12 MP phone photo headed for a 1024 px thumbnail is decoded at ~2000x1500 — a
+quarter of the pixels, time and memory — and only then LANCZOS-resampled to size.
+"""
+
+from typing import Optional, Tuple
+
+from PIL import Image, ImageOps
+
+# EXIF orientations that swap width and height (transpose / rotate 90 / transverse / rotate 270)
+_SWAPPED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+def fit_within(size: Tuple[int, int], max_size: Tuple[int, int]) -> Tuple[int, int]:
+    """Largest size with size's aspect ratio fitting in max_size (never upscales)."""
+    width, height = size
+    scale = min(max_size[0] / width, max_size[1] / height, 1.0)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def draft_for(image: Image.Image, max_size: Tuple[int, int], orientation: int = 1) -> None:
+    """
+    Ask the JPEG decoder of an unloaded image to decode at the smallest DCT scale
+    that still covers max_size once the EXIF orientation is applied. No-op for
+    other formats and already-loaded images.
+    """
+    if image.format != "JPEG" or getattr(image, "im", None) is not None:
+        return
+    box = (max_size[1], max_size[0]) if orientation in _SWAPPED_ORIENTATIONS else max_size
+    image.draft(None, fit_within(image.size, box))
+
+
+def downscale(
+    image: Image.Image, max_size: Tuple[int, int], orientation: Optional[int] = None,
+) -> Image.Image:
+    """
+    Upright image fitting within max_size, resampled with LANCZOS.
+
+    If image has not been loaded yet (straight from Image.open), a JPEG is decoded via
+    draft() at reduced size and its EXIF orientation applied; image itself is consumed.
+    An already-decoded image is assumed upright and never modified: a resized copy is
+    returned, or image itself when it already fits.
+    """
+    if getattr(image, "im", None) is None:
+        if orientation is None:
+            orientation = image.getexif().get(0x0112, 1)
+        draft_for(image, max_size, orientation)
+        if orientation != 1:
+            image = ImageOps.exif_transpose(image)
+        image.load()
+        if image.size[0] > max_size[0] or image.size[1] > max_size[1]:
+            image.thumbnail(max_size, Image.Resampling.LANCZOS)
+        return image
+
+    if image.size[0] <= max_size[0] and image.size[1] <= max_size[1]:
+        return image
+    resized = image.copy()
+    resized.thumbnail(max_size, Image.Resampling.LANCZOS)
+    return resized
@@ -0,0 +1,74 @@
+"""
+In-process counters and latency samples.
+
+Lightweight stand-in for a metrics backend: each worker keeps its own numbers and
+exposes them through GET /metrics. Names are dotted, e.g. "identification_cache.miss".
+"""
+
+import threading
+from collections import defaultdict, deque
+from typing import Deque, Dict, Optional
+
+# Latency percentiles are computed over the most recent samples only
+_SAMPLE_WINDOW = 1000
+
+_lock = threading.Lock()
+_counters: Dict[str, int] = defaultdict(int)
+_gauges: Dict[str, float] = {}
+_samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=_SAMPLE_WINDOW))
+
+
+def increment(name: str, value: int = 1) -> None:
+    """Add value to the named counter."""
+    with _lock:
+        _counters[name] += value
+
+
+def set_gauge(name: str, value: float) -> None:
+    """Set the named gauge to its current value (e.g. a queue depth)."""
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(name: str, value: float) -> None:
+    """Record one sample (typically a duration in ms) for the named series."""
+    with _lock:
+        _samples[name].append(value)
+
+
+def get_counter(name: str) -> int:
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def _percentile(sorted_values: list, pct: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def percentile(name: str, pct: float, min_samples: int = 1) -> Optional[float]:
+    """pct-th percentile of the named series' recent samples, or None with fewer than min_samples."""
+    with _lock:
+        values = sorted(_samples[name]) if name in _samples else []
+    if len(values) < max(min_samples, 1):
+        return None
+    return _percentile(values, pct)
+
+
+def snapshot() -> dict:
+    """Return all counters and gauges plus count/p50/p95/p99 for every sample series."""
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        series = {name: sorted(values) for name, values in _samples.items() if values}
+
+    summaries = {
+        name: {
+            "count": len(values),
+            "p50": round(_percentile(values, 50), 1),
+            "p95": round(_percentile(values, 95), 1),
+            "p99": round(_percentile(values, 99), 1),
+        }
+        for name, values in series.items()
+    }
+    return {"counters": counters, "gauges": gauges, "latency_ms": summaries}
@@ -0,0 +1,30 @@
+import numpy as np
+from PIL import Image
+
+# dHash compares each pixel with its right-hand neighbour on a 9x8 grayscale thumbnail → 64 bits
+_HASH_WIDTH = 9
+_HASH_HEIGHT = 8
+
+
+def dhash(image: Image.Image) -> int:
+    """
+    64-bit difference hash. Survives recompression, small shifts and rescaling,
+    so two shots of the same car a second apart land within a few bits of each other.
+    """
+    small = image.resize((_HASH_WIDTH, _HASH_HEIGHT), Image.Resampling.BOX, reducing_gap=2.0)
+    pixels = np.asarray(small.convert("L"), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def to_hex(value: int) -> str:
+    """Fixed-width hex form stored in car_identifications.image_phash."""
+    return f"{value:016x}"
+
+
+def from_hex(value: str) -> int:
+    return int(value, 16)
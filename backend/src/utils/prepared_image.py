@@ -0,0 +1,148 @@
+import asyncio
+import io
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Union
+
+from PIL import Image
+
+from utils import image_ops, metrics
+from utils.image_executor import get_image_executor
+
+_JPEG_CONTENT_TYPES = ("image/jpeg", "image/jpg")
+
+
+class PreparedImage:
+    """
+    One uploaded image, shared by every stage of the identify pipeline.
+
+    Derived variants (upright bytes, hashes, the base64 JPEG sent to Claude, the
+    Rekognition payload, the final encoded output) are computed on first use and
+    memoized, so no variant is ever built twice for one upload.
+
+    The pixel work itself is done by the pure functions in utils.image_ops. Async
+    accessors run them in the image process pool so a large upload never blocks the
+    event loop; the sync properties compute inline and are meant for code that runs
+    after prepare() (they then only read the memo) or outside a request.
+    """
+
+    def __init__(self, data: bytes, content_type: str = "image/jpeg"):
+        self.original = data
+        self.content_type = content_type or "image/jpeg"
+        self._header: Optional[Image.Image] = None
+        self._output_bytes: Optional[bytes] = None
+        self._derived: Dict[Any, Any] = {}
+        self._pending: Dict[Any, "asyncio.Future[Any]"] = {}
+
+    @classmethod
+    def wrap(cls, image: Union["PreparedImage", bytes], content_type: str = "image/jpeg") -> "PreparedImage":
+        """Return image unchanged if it is already prepared, otherwise wrap the raw bytes."""
+        if isinstance(image, PreparedImage):
+            return image
+        return cls(image, content_type)
+
+    # ------------------------------------------------------------------
+    # Header (no pixel decode)
+    # ------------------------------------------------------------------
+
+    @property
+    def header(self) -> Image.Image:
+        """The upload opened lazily: format, size, EXIF and JPEG tables, pixels never loaded."""
+        if self._header is None:
+            self._header = Image.open(io.BytesIO(self.original))
+        return self._header
+
+    @property
+    def source_format(self) -> str:
+        """Pillow format name of the upload (e.g. "JPEG", "PNG")."""
+        return self.header.format or "JPEG"
+
+    @property
+    def orientation(self) -> int:
+        """EXIF orientation tag (1 = upright, also when missing or unreadable)."""
+        return self.derive("orientation", lambda: image_ops.read_orientation(self.header))
+
+    @property
+    def output_format(self) -> str:
+        """Format for redacted output, chosen from the declared content type."""
+        return "JPEG" if self.content_type in _JPEG_CONTENT_TYPES else "PNG"
+
+    # ------------------------------------------------------------------
+    # Off-loop preparation
+    # ------------------------------------------------------------------
+
+    async def prepare(self) -> None:
+        """
+        Compute upright bytes, content hash and perceptual hash in one image-pool task.
+        Idempotent; call before the sync accessors below are used on the event loop.
+        """
+        if "content_hash" in self._derived:
+            return
+        upright, content_hash, perceptual_hash, method = await self.derive_async(
+            "normalized", image_ops.normalize, self.original,
+        )
+        self._derived.setdefault("upright_bytes", upright)
+        self._derived.setdefault("content_hash", content_hash)
+        self._derived.setdefault("perceptual_hash", perceptual_hash)
+        metrics.increment(f"prepared_image.upright.{method}")
+
+    async def derive_async(self, key: Any, fn: Callable, *args) -> Any:
+        """
+        Memoize fn(*args) under key, running it in the image process pool.
+        Concurrent callers asking for the same key share one pool task.
+        """
+        return await self.memoize_async(key, lambda: get_image_executor().run(fn, *args))
+
+    async def memoize_async(self, key: Any, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Memoize the result of awaiting factory() under key (e.g. a Rekognition response).
+        Concurrent callers share one call; a call that raises is not memoized.
+        """
+        if key in self._derived:
+            return self._derived[key]
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(factory())
+            self._pending[key] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(key, None))
+        value = await asyncio.shield(pending)
+        return self._derived.setdefault(key, value)
+
+    def derive(self, key: Any, factory: Callable[[], Any]) -> Any:
+        """Memoize an arbitrary derived value under key, computed inline."""
+        if key not in self._derived:
+            self._derived[key] = factory()
+        return self._derived[key]
+
+    # ------------------------------------------------------------------
+    # Encoded variants
+    # ------------------------------------------------------------------
+
+    @property
+    def upright_bytes(self) -> bytes:
+        """The upload upright and without metadata (see image_ops.upright)."""
+        return self.derive("upright_bytes", lambda: image_ops.upright(self.original))
+
+    @property
+    def output_bytes(self) -> bytes:
+        """Final bytes to store: the redacted encode when one was set, otherwise upright_bytes."""
+        return self._output_bytes if self._output_bytes is not None else self.upright_bytes
+
+    def set_output(self, data: bytes) -> None:
+        """Record the final encoded output (e.g. after license plates were blurred)."""
+        self._output_bytes = data
+
+    @property
+    def content_hash(self) -> str:
+        """sha256 hex digest of the normalized (upright) bytes — stable key for caches."""
+        return self.derive("content_hash", lambda: image_ops.content_hash(self.upright_bytes))
+
+    @property
+    def perceptual_hash(self) -> int:
+        """64-bit dHash of the upright pixels — near-identical photos differ in only a few bits."""
+        return self.derive("perceptual_hash", lambda: image_ops.perceptual_hash(self.original))
+
+    async def claude_base64(self, max_size: Tuple[int, int] = (1024, 1024), quality: int = 85) -> str:
+        """Downscaled RGB JPEG, base64-encoded for the Anthropic API."""
+        return await self.derive_async(
+            ("claude_base64", tuple(max_size), quality),
+            image_ops.claude_base64, self.original, tuple(max_size), quality,
+        )
@@ -0,0 +1,111 @@
+"""
+region_blur.py
+License-plate redaction that touches only the plate regions.
+
+Boxes are converted to pixels and merged where they overlap, then each merged
+region is cropped, blurred (three-pass box blur ≈ Gaussian) or pixelated with
+vectorized NumPy, and pasted back. The rest of the image is never converted,
+copied or filtered, so redacting a 12 MP photo costs about as much as the
+plates themselves plus the one final encode.
+"""
+
+import math
+from typing import Iterable, List, Tuple
+
+import numpy as np
+from PIL import Image
+
+# (left, top, right, bottom) in pixels, right/bottom exclusive
+PixelBox = Tuple[int, int, int, int]
+
+_BLUR_PASSES = 3
+# Modes whose pixel values can be averaged directly (palette indices, for one, cannot)
+_BLURRABLE_MODES = ("RGB", "RGBA", "L", "LA")
+
+
+def to_pixel_box(box: dict, width: int, height: int) -> PixelBox:
+    """Rekognition relative BoundingBox → pixel box clipped to the image."""
+    left = max(0, int(box["Left"] * width))
+    top = max(0, int(box["Top"] * height))
+    right = min(width, int((box["Left"] + box["Width"]) * width))
+    bottom = min(height, int((box["Top"] + box["Height"]) * height))
+    return left, top, right, bottom
+
+
+def merge_boxes(boxes: Iterable[PixelBox]) -> List[PixelBox]:
+    """Union overlapping or touching boxes until none overlap; empty boxes are dropped."""
+    merged = [box for box in boxes if box[2] > box[0] and box[3] > box[1]]
+    changed = True
+    while changed:
+        changed = False
+        result: List[PixelBox] = []
+        for box in merged:
+            for i, other in enumerate(result):
+                if box[0] <= other[2] and other[0] <= box[2] and box[1] <= other[3] and other[1] <= box[3]:
+                    result[i] = (
+                        min(box[0], other[0]), min(box[1], other[1]),
+                        max(box[2], other[2]), max(box[3], other[3]),
+                    )
+                    changed = True
+                    break
+            else:
+                result.append(box)
+        merged = result
+    return merged
+
+
+def _box_blur_axis(values: np.ndarray, radius: int, axis: int) -> np.ndarray:
+    """Moving average of width 2*radius+1 along axis via a cumulative sum; edges are clamped."""
+    n = values.shape[axis]
+    pad = [(0, 0)] * values.ndim
+    pad[axis] = (radius + 1, radius)
+    sums = np.cumsum(np.pad(values, pad, mode="edge"), axis=axis)
+    upper = np.take(sums, np.arange(2 * radius + 1, 2 * radius + 1 + n), axis=axis)
+    lower = np.take(sums, np.arange(n), axis=axis)
+    return (upper - lower) / (2 * radius + 1)
+
+
+def blur_array(region: np.ndarray, sigma: float) -> np.ndarray:
+    """Approximate Gaussian blur of an (H, W[, C]) uint8 array by three separable box blurs."""
+    # Box width whose three-fold convolution has the requested standard deviation
+    radius = max(1, int(round((math.sqrt(12 * sigma * sigma / _BLUR_PASSES + 1) - 1) / 2)))
+    values = region.astype(np.float64)
+    for _ in range(_BLUR_PASSES):
+        values = _box_blur_axis(values, radius, axis=0)
+        values = _box_blur_axis(values, radius, axis=1)
+    return np.clip(np.rint(values), 0, 255).astype(np.uint8)
+
+
+def pixelate_array(region: np.ndarray, block: int) -> np.ndarray:
+    """Replace each block x block cell of an (H, W[, C]) uint8 array with its mean."""
+    height, width = region.shape[:2]
+    rows = np.arange(0, height, block)
+    cols = np.arange(0, width, block)
+    values = region.astype(np.float64)
+    # Per-cell sums via reduceat on both axes, then divide by each cell's real size
+    sums = np.add.reduceat(np.add.reduceat(values, rows, axis=0), cols, axis=1)
+    cell_h = np.diff(np.append(rows, height))
+    cell_w = np.diff(np.append(cols, width))
+    counts = np.outer(cell_h, cell_w)
+    means = sums / (counts[..., None] if values.ndim == 3 else counts)
+    cells = np.repeat(np.repeat(means, cell_h, axis=0), cell_w, axis=1)
+    return np.clip(np.rint(cells), 0, 255).astype(np.uint8)
+
+
+def redact_regions(image: Image.Image, boxes: Iterable[dict], mode: str = "blur", strength: float = 20) -> Image.Image:
+    """
+    Blur (strength = Gaussian sigma) or pixelate (strength = block size) every box of
+    an already-decoded image, in place where its mode allows. Returns the image, which
+    is a converted copy only for modes that cannot be averaged (e.g. palette).
+    """
+    if image.mode not in _BLURRABLE_MODES:
+        image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+    width, height = image.size
+    for left, top, right, bottom in merge_boxes(to_pixel_box(box, width, height) for box in boxes):
+        region = np.asarray(image.crop((left, top, right, bottom)))
+        if mode == "pixelate":
+            redacted = pixelate_array(region, max(2, int(strength)))
+        else:
+            redacted = blur_array(region, strength)
+        image.paste(Image.fromarray(redacted, image.mode), (left, top))
+    return image
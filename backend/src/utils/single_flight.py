@@ -0,0 +1,60 @@
+"""
+single_flight.py
+In-process request coalescing: concurrent callers with the same key share one execution.
+
+The first caller for a key starts the work as its own task; callers arriving while
+it is in flight await that task instead of starting their own. The work is only
+cancelled when every caller waiting on it has gone away, so one client hanging up
+does not fail the duplicates that joined it.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Generic, Hashable, Tuple, TypeVar
+
+from utils import metrics
+
+T = TypeVar("T")
+
+
+class _Flight(Generic[T]):
+    def __init__(self, task: "asyncio.Task[T]"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight(Generic[T]):
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[Hashable, _Flight[T]] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: Hashable, work: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """
+        Return (result, shared): shared is True when this caller joined an execution
+        started by another. Exceptions from the work propagate to every caller.
+        """
+        flight = self._flights.get(key)
+        shared = flight is not None
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(work()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _task: self._forget(key, flight))
+            metrics.increment(f"single_flight.{self.name}.executed")
+        else:
+            metrics.increment(f"single_flight.{self.name}.coalesced")
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task), shared
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key: Hashable, flight: "_Flight[T]") -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
@@ -0,0 +1,214 @@
+"""
+upload_intake.py
+Bounded intake of uploaded images, before anything is decoded.
+
+Two layers:
+  UploadSizeLimitMiddleware  rejects an upload request whose body exceeds its limit,
+                             from Content-Length up front or while the body streams in,
+                             so an oversized or endless body is never spooled in full.
+  read_image_upload()        reads one multipart file part: sniffs the magic bytes and
+                             pixel dimensions from its header (no decode), rejects
+                             non-images and decompression bombs, then reads the rest in
+                             chunks under a hard byte cap. UploadFile.size is not trusted
+                             (it is often None for multipart parts).
+
+A JPEG's frame header can follow megabytes of metadata (extended XMP, ICC profiles,
+MPF previews). The sniffer steps over each segment by its length field, so only the
+segment headers are parsed; the number of segments before the frame header is
+capped, the bytes they span only by the upload's own byte cap.
+"""
+
+import json
+import logging
+import os
+import struct
+from dataclasses import dataclass
+from typing import Dict, Optional, Union
+
+from fastapi import HTTPException, UploadFile
+
+from utils import metrics
+from utils.image_ops import MAX_IMAGE_PIXELS
+
+logger = logging.getLogger("carid.upload_intake")
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 10 * 1024 * 1024))
+# Form fields, part headers and boundaries around the files of one request
+_MULTIPART_OVERHEAD_BYTES = 64 * 1024
+# Dimensions must appear within this many JPEG segments (APPn metadata, tables)
+_JPEG_MAX_SEGMENTS = 1024
+_CHUNK_BYTES = 64 * 1024
+
+_JPEG_MAGIC = b"\xff\xd8\xff"
+_PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+# Start-of-frame markers carrying the image size (every SOFn except DHT, JPG and DAC)
+_JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+@dataclass
+class ImageHeader:
+    format: str     # Pillow format name: "JPEG" or "PNG"
+    width: int
+    height: int
+
+
+def max_request_bytes(files: int = 1) -> int:
+    """Body limit for a multipart request carrying up to files images."""
+    return files * MAX_UPLOAD_BYTES + _MULTIPART_OVERHEAD_BYTES
+
+
+def _jpeg_size(head: Union[bytes, bytearray]) -> Optional[tuple]:
+    """
+    (width, height) from the first SOFn segment, or None if head ends before it.
+    Other segments are skipped by their length; their payloads are never read.
+    """
+    pos = 2
+    segments = 0
+    while pos + 4 <= len(head):
+        if head[pos] != 0xFF:
+            raise ValueError("corrupt JPEG marker stream")
+        marker = head[pos + 1]
+        if marker == 0xFF:        # fill byte
+            pos += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:    # stand-alone markers
+            pos += 2
+            continue
+        if marker in (0xD9, 0xDA):
+            raise ValueError("no frame header before scan data")
+        segments += 1
+        if segments > _JPEG_MAX_SEGMENTS:
+            raise ValueError(f"no frame header in the first {_JPEG_MAX_SEGMENTS} segments")
+        (length,) = struct.unpack(">H", head[pos + 2:pos + 4])
+        if marker in _JPEG_SOF_MARKERS:
+            if pos + 9 > len(head):
+                return None
+            height, width = struct.unpack(">HH", head[pos + 5:pos + 9])
+            return width, height
+        pos += 2 + length
+    return None
+
+
+def sniff_image_header(head: Union[bytes, bytearray]) -> Optional[ImageHeader]:
+    """
+    Format and dimensions from the leading bytes of a JPEG or PNG. Returns None when
+    more bytes are needed; raises ValueError for anything that is not a JPEG or PNG.
+    """
+    if head.startswith(_PNG_MAGIC):
+        if len(head) < 24:
+            return None
+        if head[12:16] != b"IHDR":
+            raise ValueError("PNG does not start with IHDR")
+        width, height = struct.unpack(">II", head[16:24])
+        return ImageHeader("PNG", width, height)
+    if head.startswith(_JPEG_MAGIC):
+        size = _jpeg_size(head)
+        return ImageHeader("JPEG", *size) if size else None
+    if len(head) < len(_PNG_MAGIC) and (_PNG_MAGIC.startswith(head) or _JPEG_MAGIC.startswith(head[:3])):
+        return None
+    raise ValueError("not a JPEG or PNG image")
+
+
+def _reject(reason: str, detail: str, filename: Optional[str]) -> HTTPException:
+    metrics.increment(f"upload_intake.rejected.{reason}")
+    logger.info("upload_rejected", extra={"reason": reason, "upload_filename": filename})
+    return HTTPException(status_code=400, detail=detail)
+
+
+async def read_image_upload(upload: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> bytes:
+    """
+    The bytes of an uploaded JPEG/PNG, validated before the full part is read:
+    400 for a non-image, an unreadable header, or more than MAX_IMAGE_PIXELS pixels;
+    400 as soon as more than max_bytes have been read.
+    """
+    label = f": {upload.filename}" if upload.filename else ""
+    limit_mb = max_bytes // (1024 * 1024)
+    if upload.size is not None and upload.size > max_bytes:
+        raise _reject("too_large", f"File too large{label}. Maximum size is {limit_mb}MB.", upload.filename)
+
+    await upload.seek(0)
+    data = bytearray()
+    header = None
+    while header is None:
+        chunk = await upload.read(_CHUNK_BYTES)
+        data += chunk
+        try:
+            # Sniffed in place: copying the buffer every chunk is quadratic in the metadata size
+            header = sniff_image_header(data)
+        except ValueError as exc:
+            raise _reject("not_image", f"Invalid image{label} ({exc}).", upload.filename)
+        if header is None and not chunk:
+            raise _reject("no_header", f"Invalid image{label} (image size not found in header).", upload.filename)
+        if header is None and len(data) > max_bytes:
+            raise _reject("too_large", f"File too large{label}. Maximum size is {limit_mb}MB.", upload.filename)
+
+    if header.width == 0 or header.height == 0 or header.width * header.height > MAX_IMAGE_PIXELS:
+        raise _reject(
+            "too_many_pixels",
+            f"Image dimensions too large{label} ({header.width}x{header.height}). "
+            f"Maximum is {MAX_IMAGE_PIXELS // 1_000_000} megapixels.",
+            upload.filename,
+        )
+
+    while len(data) <= max_bytes:
+        chunk = await upload.read(_CHUNK_BYTES)
+        if not chunk:
+            return bytes(data)
+        data += chunk
+    raise _reject("too_large", f"File too large{label}. Maximum size is {limit_mb}MB.", upload.filename)
+
+
+class UploadSizeLimitMiddleware:
+    """
+    ASGI middleware capping the request body of the given paths (exact match) at their
+    byte limits: 413 before reading when Content-Length is over, otherwise 413 as soon as
+    the streamed body crosses the limit.
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get("path", "")) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        try:
+            declared = int(headers.get(b"content-length", b"-1"))
+        except ValueError:
+            declared = -1
+        if declared > limit:
+            metrics.increment("upload_intake.rejected.request_too_large")
+            await self._send_413(send, limit)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    metrics.increment("upload_intake.rejected.request_too_large")
+                    # Surfaces through request.form() as the route's response
+                    raise HTTPException(status_code=413, detail=self._detail(limit))
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    @staticmethod
+    def _detail(limit: int) -> str:
+        return f"Request body too large. Maximum is {limit // (1024 * 1024)}MB."
+
+    async def _send_413(self, send, limit: int) -> None:
+        body = json.dumps({"detail": self._detail(limit)}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,95 @@
+"""
+usage_tracker.py
+Per-request accounting of external calls: tokens, API calls, wall time and cost.
+
+The identify pipeline opens a scope with track_usage(); Claude and Rekognition calls
+made anywhere underneath it (including in tasks spawned from it) add a StageUsage
+via record(). Outside a scope, record() is a no-op.
+"""
+
+import contextvars
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+logger = logging.getLogger("carid.usage")
+
+# USD per million tokens (input, output). Cache reads bill at 10 % of input, cache writes at 125 %.
+_CLAUDE_PRICES_PER_MTOK = {
+    "claude-haiku-4-5": (1.00, 5.00),
+    "claude-sonnet-4-6": (3.00, 15.00),
+}
+_CACHE_READ_MULTIPLIER = 0.1
+_CACHE_WRITE_MULTIPLIER = 1.25
+# detect_labels / detect_text, first pricing tier (USD per image)
+_REKOGNITION_PRICE_PER_CALL = 0.001
+
+
+@dataclass
+class StageUsage:
+    stage: str                     # find_make | identify_car | rekognition.<operation> | pipeline
+    model: Optional[str] = None
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_input_tokens: int = 0
+    cache_creation_input_tokens: int = 0
+    api_calls: int = 1
+    duration_ms: float = 0.0
+    cost_usd: float = 0.0
+
+
+class UsageTracker:
+    def __init__(self):
+        self.stages: List[StageUsage] = []
+
+    def add(self, usage: StageUsage) -> None:
+        self.stages.append(usage)
+
+    @property
+    def total_cost_usd(self) -> float:
+        return sum(stage.cost_usd for stage in self.stages)
+
+
+_current: contextvars.ContextVar[Optional[UsageTracker]] = contextvars.ContextVar("usage_tracker", default=None)
+
+
+@contextmanager
+def track_usage() -> Iterator[UsageTracker]:
+    """Collect every record() made inside the block (and in tasks started from it)."""
+    tracker = UsageTracker()
+    token = _current.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _current.reset(token)
+
+
+def record(usage: StageUsage) -> None:
+    tracker = _current.get()
+    if tracker is not None:
+        tracker.add(usage)
+
+
+def claude_cost(
+    model: Optional[str],
+    input_tokens: int,
+    output_tokens: int,
+    cache_read_input_tokens: int = 0,
+    cache_creation_input_tokens: int = 0,
+) -> float:
+    prices = _CLAUDE_PRICES_PER_MTOK.get(model or "")
+    if prices is None:
+        logger.debug("No price configured for model %s", model)
+        return 0.0
+    input_price, output_price = prices
+    return (
+        input_tokens * input_price
+        + cache_read_input_tokens * input_price * _CACHE_READ_MULTIPLIER
+        + cache_creation_input_tokens * input_price * _CACHE_WRITE_MULTIPLIER
+        + output_tokens * output_price
+    ) / 1_000_000
+
+
+def rekognition_cost(api_calls: int = 1) -> float:
+    return api_calls * _REKOGNITION_PRICE_PER_CALL